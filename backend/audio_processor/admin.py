@@ -1,7 +1,10 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import Session, AnalysisResult
+from .models import Session, AnalysisResult, TranscriptSegment, UserSessionStats, ResumableUpload
 
 admin.site.register(Session)
-admin.site.register(AnalysisResult)
\ No newline at end of file
+admin.site.register(AnalysisResult)
+admin.site.register(TranscriptSegment)
+admin.site.register(UserSessionStats)
+admin.site.register(ResumableUpload)
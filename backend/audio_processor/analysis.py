@@ -0,0 +1,234 @@
+# audio_processor/analysis.py
+
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+CHARS_PER_TOKEN = 4 # Rough average for English text; good enough for budgeting prompts
+QNA_PROMPT_TEMPLATE_VERSION = "qna_v1.1" # Bump when build_qna_prompt/build_qna_context change so cached answers aren't reused
+
+SUMMARY_HEADER = "### SUMMARY"
+NOTES_HEADER = "### DETAILED NOTES"
+SUGGESTIONS_HEADER = "### SUGGESTIONS AND RESOURCES"
+
+OUTPUT_FORMAT = f"""
+        Please format your response using these clear sections:
+
+        {SUMMARY_HEADER}
+        [Insert concise summary here]
+
+        {NOTES_HEADER}
+        [Insert detailed notes here, using bullet points or numbered lists]
+
+        {SUGGESTIONS_HEADER}
+        [Insert suggestions and recommended resources here]
+"""
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def split_into_chunks(text, max_tokens):
+    """
+    Splits text into chunks of at most max_tokens (estimated), breaking between sentences.
+    A single sentence longer than the budget is split on whitespace.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    chunks = []
+    current = []
+    current_chars = 0
+
+    def flush():
+        nonlocal current, current_chars
+        if current:
+            chunks.append(" ".join(current))
+        current = []
+        current_chars = 0
+
+    for sentence in re.split(r"(?<=[.!?])\s+", text.strip()):
+        if not sentence:
+            continue
+        pieces = [sentence]
+        if len(sentence) > max_chars:
+            words = sentence.split()
+            pieces, piece = [], []
+            for word in words:
+                if piece and len(" ".join(piece)) + len(word) + 1 > max_chars:
+                    pieces.append(" ".join(piece))
+                    piece = []
+                piece.append(word)
+            if piece:
+                pieces.append(" ".join(piece))
+        for piece in pieces:
+            if current_chars + len(piece) + 1 > max_chars:
+                flush()
+            current.append(piece)
+            current_chars += len(piece) + 1
+    flush()
+    return chunks
+
+
+def build_analysis_prompt(transcription_text):
+    return f"""
+        You are DeepSeek, an advanced AI assistant skilled at analyzing lecture transcripts and extracting key information.
+        Given the following lecture transcription, perform these tasks:
+        1. Write a concise summary of the main ideas and themes.
+        2. Create detailed notes using bullet points or numbered lists, highlighting important concepts, definitions, and facts.
+        3. Suggest further study topics and recommend relevant resources (such as books, articles, or websites).
+{OUTPUT_FORMAT}
+        ---
+        LECTURE TRANSCRIPTION:
+        {transcription_text}
+        ---
+        """
+
+
+def build_chunk_prompt(chunk_text, part_number, total_parts):
+    return f"""
+        You are DeepSeek, an advanced AI assistant skilled at analyzing lecture transcripts and extracting key information.
+        The following is part {part_number} of {total_parts} of a longer lecture transcription.
+        Considering only this part:
+        1. Write a concise summary of the main ideas covered in this part.
+        2. Create detailed notes using bullet points or numbered lists, highlighting important concepts, definitions, and facts.
+        3. Suggest further study topics and recommend relevant resources (such as books, articles, or websites).
+{OUTPUT_FORMAT}
+        ---
+        LECTURE TRANSCRIPTION (PART {part_number} OF {total_parts}):
+        {chunk_text}
+        ---
+        """
+
+
+def build_reduce_prompt(partial_analyses):
+    parts = "\n\n".join(
+        f"--- PART {i} ---\n{partial}" for i, partial in enumerate(partial_analyses, start=1)
+    )
+    return f"""
+        You are DeepSeek, an advanced AI assistant skilled at analyzing lecture transcripts and extracting key information.
+        A long lecture was analyzed in consecutive parts. Below are the analyses of each part, in order.
+        Combine them into a single analysis of the whole lecture:
+        1. Write one concise summary of the main ideas and themes of the entire lecture.
+        2. Merge the detailed notes in lecture order, removing repetition but keeping every important concept, definition, and fact.
+        3. Merge the suggestions into one list of further study topics and recommended resources without duplicates.
+{OUTPUT_FORMAT}
+        ---
+        PARTIAL ANALYSES:
+        {parts}
+        ---
+        """
+
+
+def build_qna_context(analysis, context_text="", transcript_text=None):
+    """
+    Builds the lecture content given to the LLM for a Q&A question.
+    transcript_text lets callers pass only the relevant transcript excerpts instead of the full transcription.
+    """
+    if transcript_text is None:
+        transcript_text = analysis.transcription_text
+        transcript_label = "Full Transcription"
+    else:
+        transcript_label = "Relevant Transcript Excerpts"
+    if context_text: # If frontend provides specific context, prepend it
+        return f"User provided context: {context_text}\n\n{transcript_label}:\n{transcript_text}"
+    # If no specific context, add summary/notes to enrich context
+    return f"Summary:\n{analysis.summary_text}\n\nNotes:\n{analysis.notes_text}\n\n{transcript_label}:\n{transcript_text}"
+
+
+def build_qna_prompt(lecture_content, user_question):
+    return f"""
+        You are an AI assistant helping a user understand a lecture.
+        Based on the provided lecture content, answer the following question.
+        If the answer is not directly available in the content, state that you cannot answer based on the provided text.
+
+        ---
+        LECTURE CONTENT:
+        {lecture_content}
+        ---
+
+        USER QUESTION: {user_question}
+
+        AI ANSWER:
+        """
+
+
+def strip_reasoning(text):
+    """
+    Removes <think>...</think> blocks that reasoning models such as deepseek-r1 emit before the answer.
+    """
+    return re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
+
+
+def parse_analysis_output(llm_generated_text):
+    """
+    Splits LLM output into (summary, notes, suggestions) using the ### section headers.
+    If no header is found the whole output is returned as notes.
+    """
+    summary_start = llm_generated_text.find(SUMMARY_HEADER)
+    notes_start = llm_generated_text.find(NOTES_HEADER)
+    suggestions_start = llm_generated_text.find(SUGGESTIONS_HEADER)
+
+    summary_end = notes_start if notes_start != -1 else suggestions_start if suggestions_start != -1 else len(llm_generated_text)
+    notes_end = suggestions_start if suggestions_start != -1 else len(llm_generated_text)
+    suggestions_end = len(llm_generated_text)
+
+    summary_text = llm_generated_text[summary_start + len(SUMMARY_HEADER):summary_end].strip() if summary_start != -1 else ""
+    notes_text = llm_generated_text[notes_start + len(NOTES_HEADER):notes_end].strip() if notes_start != -1 else ""
+    suggestions_text = llm_generated_text[suggestions_start + len(SUGGESTIONS_HEADER):suggestions_end].strip() if suggestions_start != -1 else ""
+
+    if not any([summary_text, notes_text, suggestions_text]):
+        print("Warning: Failed to parse LLM output. Using full output as notes.")
+        notes_text = llm_generated_text
+
+    return summary_text, notes_text, suggestions_text
+
+
+def _group_by_budget(texts, max_tokens):
+    """
+    Groups consecutive texts so each group's estimated size stays within max_tokens (at least one text per group).
+    """
+    groups, current, current_tokens = [], [], 0
+    for text in texts:
+        tokens = estimate_tokens(text)
+        if current and current_tokens + tokens > max_tokens:
+            groups.append(current)
+            current, current_tokens = [], 0
+        current.append(text)
+        current_tokens += tokens
+    if current:
+        groups.append(current)
+    return groups
+
+
+def run_analysis(transcription_text, generate):
+    """
+    Produces the final analysis text for a transcript using generate(prompt) -> str.
+
+    Transcripts within ANALYSIS_CHUNK_TOKENS use a single prompt. Longer ones are split into
+    token-budgeted chunks analysed concurrently (at most ANALYSIS_MAX_CONCURRENCY at once),
+    then merged with reduce prompts, hierarchically if the partial results don't fit in one.
+    """
+    chunk_tokens = settings.ANALYSIS_CHUNK_TOKENS
+    if estimate_tokens(transcription_text) <= chunk_tokens:
+        return generate(build_analysis_prompt(transcription_text))
+
+    chunks = split_into_chunks(transcription_text, chunk_tokens)
+    print(f"Transcript too long for one prompt; analysing {len(chunks)} chunks.")
+
+    with ThreadPoolExecutor(max_workers=settings.ANALYSIS_MAX_CONCURRENCY) as executor:
+        partials = list(executor.map(
+            lambda args: strip_reasoning(generate(build_chunk_prompt(*args))),
+            [(chunk, i, len(chunks)) for i, chunk in enumerate(chunks, start=1)],
+        ))
+
+        # Reduce until everything fits into a single merge prompt
+        while True:
+            groups = _group_by_budget(partials, settings.ANALYSIS_REDUCE_TOKENS)
+            if len(groups) == len(partials) > 1:
+                # Every partial is over budget on its own; merge in pairs so each round still halves the count
+                groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+            if len(groups) == 1:
+                return generate(build_reduce_prompt(groups[0]))
+            print(f"Merging {len(partials)} partial analyses in {len(groups)} groups.")
+            partials = list(executor.map(lambda group: strip_reasoning(generate(build_reduce_prompt(group))), groups))
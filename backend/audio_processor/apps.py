@@ -1,6 +1,20 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def restore_search_triggers(sender, using, **kwargs):
+    # A later migration that rebuilds the AnalysisResult table drops the SQLite FTS triggers again
+    from django.db import connections
+    from .search import ensure_search_triggers
+
+    if ensure_search_triggers(connections[using]):
+        print("Recreated the full-text search triggers and rebuilt the search index.")
 
 
 class AudioProcessorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'audio_processor'
+
+    def ready(self):
+        from . import signals # noqa: F401 (connects the signal receivers)
+        post_migrate.connect(restore_search_triggers, sender=self)
@@ -0,0 +1,204 @@
+# audio_processor/audio_decode.py
+
+import queue
+import subprocess
+import threading
+
+import numpy as np
+
+# Whisper expects 16 kHz mono float32 in [-1, 1]
+SAMPLE_RATE = 16000
+BYTES_PER_SAMPLE = 2 # s16le
+INT16_SCALE = 32768.0
+
+# Frame used when looking for a quiet place to cut the audio (100 ms)
+QUIET_FRAME_SECONDS = 0.1
+
+
+def ffmpeg_decode_command(input_path, sample_rate=SAMPLE_RATE, start_seconds=0):
+    """
+    ffmpeg command that writes raw 16-bit mono PCM to stdout instead of a WAV file.
+    start_seconds seeks in the input before decoding (used to resume a transcription).
+    """
+    seek = ["-ss", f"{start_seconds:.3f}"] if start_seconds else []
+    return [
+        "ffmpeg", "-nostdin", "-loglevel", "error", *seek, "-i", input_path,
+        "-vn", "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-ac", "1",
+        "pipe:1"
+    ]
+
+
+def ffmpeg_stream_decode_command(sample_rate=SAMPLE_RATE):
+    """
+    ffmpeg command that decodes a container streamed to its stdin (e.g. MediaRecorder chunks)
+    into raw 16-bit mono PCM on stdout, with minimal probing and buffering so decoded audio
+    follows the input closely.
+    """
+    return [
+        "ffmpeg", "-loglevel", "error", "-fflags", "nobuffer", "-probesize", "32768",
+        "-i", "pipe:0",
+        "-vn", "-f", "s16le", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-ac", "1",
+        "-flush_packets", "1", "pipe:1"
+    ]
+
+
+def _start_ffmpeg(command):
+    print(f"Running ffmpeg command: {' '.join(command)}")
+    return subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+
+def _finish_ffmpeg(process, command_args):
+    stderr = process.stderr.read() if process.stderr else b""
+    return_code = process.wait()
+    if return_code != 0:
+        raise subprocess.CalledProcessError(return_code, command_args, stderr=stderr)
+
+
+def _fill(stream, byte_view):
+    """
+    Reads from the stream until byte_view is full or EOF. Returns the number of bytes read.
+    """
+    filled = 0
+    while filled < len(byte_view):
+        n = stream.readinto(byte_view[filled:])
+        if not n:
+            break
+        filled += n
+    return filled
+
+
+def decode_audio(input_path, sample_rate=SAMPLE_RATE, duration_hint=None, read_seconds=30):
+    """
+    Decodes a media file into a float32 NumPy array without touching disk.
+    If duration_hint (seconds) is known the output buffer is preallocated once,
+    otherwise it grows geometrically.
+    """
+    command = ffmpeg_decode_command(input_path, sample_rate)
+    process = _start_ffmpeg(command)
+    try:
+        capacity = int((duration_hint or read_seconds * 20) * sample_rate) + sample_rate
+        audio = np.empty(capacity, dtype=np.float32)
+        pcm = np.empty(int(read_seconds * sample_rate), dtype=np.int16) # Reused read buffer
+        pcm_bytes = memoryview(pcm).cast('B')
+        total = 0
+
+        while True:
+            n_samples = _fill(process.stdout, pcm_bytes) // BYTES_PER_SAMPLE
+            if n_samples == 0:
+                break
+            if total + n_samples > len(audio):
+                audio.resize(max(len(audio) * 2, total + n_samples), refcheck=False)
+            np.divide(pcm[:n_samples], INT16_SCALE, out=audio[total:total + n_samples], casting='unsafe')
+            total += n_samples
+
+        _finish_ffmpeg(process, command)
+        return audio[:total]
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def iter_audio_blocks(input_path, block_seconds=30, sample_rate=SAMPLE_RATE, max_buffered_blocks=4, start_seconds=0):
+    """
+    Yields float32 blocks of block_seconds while ffmpeg is still decoding.
+    A reader thread fills a bounded queue, so at most max_buffered_blocks blocks
+    are held in memory no matter how long the recording is.
+    """
+    command = ffmpeg_decode_command(input_path, sample_rate, start_seconds)
+    process = _start_ffmpeg(command)
+    blocks = queue.Queue(maxsize=max_buffered_blocks)
+    stop = threading.Event()
+    done = object()
+
+    def put(item):
+        # Give up waiting if the consumer has gone away
+        while not stop.is_set():
+            try:
+                blocks.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def reader():
+        try:
+            pcm = np.empty(int(block_seconds * sample_rate), dtype=np.int16)
+            pcm_bytes = memoryview(pcm).cast('B')
+            while not stop.is_set():
+                n_samples = _fill(process.stdout, pcm_bytes) // BYTES_PER_SAMPLE
+                if n_samples == 0:
+                    break
+                if not put(pcm[:n_samples].astype(np.float32) / INT16_SCALE):
+                    return
+            if not stop.is_set():
+                _finish_ffmpeg(process, command)
+            put(done)
+        except Exception as e:
+            put(e)
+
+    thread = threading.Thread(target=reader, name=f"ffmpeg-reader-{process.pid}", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = blocks.get()
+            if item is done:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+        thread.join(timeout=5)
+
+
+def find_quiet_point(audio, search_from, sample_rate=SAMPLE_RATE):
+    """
+    Returns the sample index of the centre of the lowest-energy frame in audio[search_from:].
+    Cutting there avoids splitting a word in half.
+    """
+    frame = max(1, int(QUIET_FRAME_SECONDS * sample_rate))
+    region = audio[search_from:]
+    n_frames = len(region) // frame
+    if n_frames == 0:
+        return len(audio)
+    energy = np.square(region[:n_frames * frame].reshape(n_frames, frame)).mean(axis=1)
+    quietest = int(np.argmin(energy))
+    return search_from + quietest * frame + frame // 2
+
+
+def iter_transcription_windows(blocks, window_seconds, search_seconds=5, overlap_seconds=0, start_seconds=0, sample_rate=SAMPLE_RATE):
+    """
+    Regroups decoded blocks into windows of roughly window_seconds, each ending at
+    a quiet point. Yields (offset_seconds, audio) so callers can shift segment timestamps;
+    start_seconds is added to every offset when the blocks were decoded from a seek point.
+    With overlap_seconds, each window also repeats the tail of the previous one.
+    """
+    window_samples = int(window_seconds * sample_rate)
+    search_samples = int(search_seconds * sample_rate)
+    overlap_samples = min(int(overlap_seconds * sample_rate), window_samples - search_samples - 1)
+    pending = []
+    pending_samples = 0
+    carried_samples = 0 # Overlap repeated from the previous window
+    offset = 0
+
+    for block in blocks:
+        pending.append(block)
+        pending_samples += len(block)
+        if pending_samples < window_samples + search_samples:
+            continue
+
+        audio = np.concatenate(pending)
+        cut = find_quiet_point(audio[:window_samples + search_samples], window_samples - search_samples, sample_rate)
+        yield start_seconds + offset / sample_rate, audio[:cut]
+        next_start = max(cut - overlap_samples, 0)
+        offset += next_start
+        pending = [audio[next_start:]]
+        pending_samples = len(audio) - next_start
+        carried_samples = cut - next_start
+
+    if pending_samples > carried_samples:
+        yield start_seconds + offset / sample_rate, np.concatenate(pending)
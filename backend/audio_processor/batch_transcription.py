@@ -0,0 +1,141 @@
+# audio_processor/batch_transcription.py
+
+import threading
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+
+from .audio_decode import SAMPLE_RATE
+from .transcription import TranscribedSegment
+from .whisper_pool import get_whisper_model
+
+# Short recordings are transcribed several at a time: their speech is cut into clips of at most
+# CLIP_SECONDS (Whisper's input length), the clips of all recordings are laid end to end, and
+# faster-whisper's BatchedInferencePipeline decodes BATCH_TRANSCRIBE_SIZE clips per forward pass.
+# A clip never spans two recordings, so every segment maps back to exactly one of them.
+
+CLIP_SECONDS = 30
+
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_batched_pipeline():
+    """
+    Returns a BatchedInferencePipeline around this process's default Whisper model.
+    """
+    # Imported here so web processes that never transcribe don't pay for ctranslate2.
+    from faster_whisper import BatchedInferencePipeline
+
+    model = get_whisper_model()
+    with _pipelines_lock:
+        pipeline = _pipelines.get(id(model))
+        if pipeline is None or pipeline.model is not model:
+            # The pool evicted and reloaded the model; don't keep the old one alive
+            _pipelines.clear()
+            pipeline = _pipelines[id(model)] = BatchedInferencePipeline(model=model)
+        return pipeline
+
+
+def pack_speech_clips(speech, total_samples, clip_samples=CLIP_SECONDS * SAMPLE_RATE):
+    """
+    Groups VAD speech spans (sample ranges, already padded by the VAD) into clips of at most
+    clip_samples, so that pauses between spans are only transcribed when they fall inside a clip.
+    Returns [(start, end)].
+    """
+    clips = []
+    for span in speech:
+        start = max(span['start'], 0)
+        end = min(span['end'], total_samples)
+        if clips and end - clips[-1][0] <= clip_samples:
+            clips[-1] = (clips[-1][0], end)
+            continue
+        # The VAD caps spans at CLIP_SECONDS already; this only guards against rounding
+        while end - start > clip_samples:
+            clips.append((start, start + clip_samples))
+            start += clip_samples
+        clips.append((start, end))
+    return clips
+
+
+def detect_languages(audios):
+    """
+    Whisper decodes a batch in one language, so recordings are grouped by the language detected
+    on their first clip. Skipped when BATCH_TRANSCRIBE_LANGUAGE fixes it. Returns one code per audio.
+    """
+    if settings.BATCH_TRANSCRIBE_LANGUAGE:
+        return [settings.BATCH_TRANSCRIBE_LANGUAGE] * len(audios)
+    model = get_whisper_model()
+    if not model.model.is_multilingual:
+        return ['en'] * len(audios)
+    languages = []
+    for audio in audios:
+        language, probability, _ = model.detect_language(audio[:CLIP_SECONDS * SAMPLE_RATE])
+        languages.append(language)
+    return languages
+
+
+def transcribe_batch(audios, offsets=None):
+    """
+    Transcribes several short recordings together. audios are float32 arrays at SAMPLE_RATE;
+    offsets (seconds, default 0) are added to each recording's segment times, for recordings
+    that resume after an earlier partial transcript. Returns a list of TranscribedSegment lists,
+    one per audio, in the same order.
+    """
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    offsets = offsets or [0] * len(audios)
+    results = [[] for _ in audios]
+    vad_options = VadOptions(max_speech_duration_s=CLIP_SECONDS, min_silence_duration_ms=500)
+
+    by_language = defaultdict(list)
+    for position, (audio, language) in enumerate(zip(audios, detect_languages(audios))):
+        if len(audio):
+            by_language[language].append(position)
+
+    pipeline = get_batched_pipeline()
+    for language, positions in by_language.items():
+        # Lay the recordings' clips end to end, remembering where each recording starts
+        parts = []
+        clip_timestamps = []
+        owners = [] # (first sample, last sample, position) of each recording in the combined audio
+        cursor = 0
+        for position in positions:
+            audio = audios[position]
+            clips = pack_speech_clips(get_speech_timestamps(audio, vad_options=vad_options), len(audio))
+            if not clips:
+                continue # Silence only; nothing for Whisper to (mis)transcribe
+            parts.append(audio)
+            clip_timestamps.extend({'start': cursor + start, 'end': cursor + end} for start, end in clips)
+            owners.append((cursor, cursor + len(audio), position))
+            cursor += len(audio)
+        if not clip_timestamps:
+            continue
+
+        segments, info = pipeline.transcribe(
+            np.concatenate(parts),
+            language=language,
+            vad_filter=False,
+            clip_timestamps=clip_timestamps,
+            batch_size=settings.BATCH_TRANSCRIBE_SIZE,
+        )
+        for seg in segments:
+            text = seg.text.strip()
+            if not text:
+                continue
+            # The middle of the segment, since reported times are rounded
+            sample = int((seg.start + seg.end) / 2 * SAMPLE_RATE)
+            for first, last, position in owners:
+                if first <= sample < last:
+                    base = first / SAMPLE_RATE
+                    offset = offsets[position]
+                    results[position].append(TranscribedSegment(
+                        offset + max(seg.start - base, 0),
+                        offset + min(seg.end - base, (last - first) / SAMPLE_RATE),
+                        text,
+                        seg.avg_logprob,
+                    ))
+                    break
+        print(f"Batch-transcribed {len(owners)} recording(s) in '{language}' ({len(clip_timestamps)} clips).")
+    return results
@@ -0,0 +1,326 @@
+# audio_processor/consumers.py
+
+import asyncio
+import hashlib
+import json
+import os
+import uuid
+from datetime import timedelta
+
+import numpy as np
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer, AsyncWebsocketConsumer
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.utils import timezone
+
+from .audio_decode import BYTES_PER_SAMPLE, INT16_SCALE, ffmpeg_stream_decode_command
+from .dedup import store_content_addressed
+from .leases import renew_lease
+from .live_transcription import (
+    LIVE_RECORDING_DIR, LIVE_RECORDING_EXTENSIONS, LiveTranscriber, get_live_executor, run_live_step
+)
+from .media_probe import MediaProbeError, probe_media
+from .models import Session, TranscriptSegment, store_transcript_segments
+from .scheduler import request_dispatch
+from .signals import session_status_group, session_status_payload
+
+IN_PROGRESS_STATUSES = ['PENDING', 'UPLOADED', 'TRANSCRIBING', 'TRANSCRIBED', 'ANALYZING']
+
+
+class SessionStatusConsumer(AsyncJsonWebsocketConsumer):
+    """
+    WebSocket that pushes status transitions for all of the connected user's sessions.
+    On connect the current status of every in-progress session is sent, so clients never miss
+    a transition that happened between their last REST call and the socket opening.
+    Authenticate with ?token=<JWT access token>.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.group_name = session_status_group(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+        for payload in await self.in_progress_sessions(user.id):
+            await self.send_json(payload)
+
+    async def disconnect(self, code):
+        if hasattr(self, 'group_name'):
+            await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # Clients only listen; a ping keeps idle proxies from closing the socket
+        if content.get('type') == 'ping':
+            await self.send_json({'type': 'pong'})
+
+    async def session_status(self, event):
+        await self.send_json(event['session'])
+
+    @database_sync_to_async
+    def in_progress_sessions(self, user_id):
+        sessions = Session.objects.filter(user_id=user_id, status__in=IN_PROGRESS_STATUSES).only(
+            'id', 'status', 'title', 'original_file_name', 'duration_seconds'
+        )
+        return [session_status_payload(session) for session in sessions]
+
+
+class LiveTranscriptionConsumer(AsyncWebsocketConsumer):
+    """
+    Transcribes a LIVE session while it is being recorded. The client streams its MediaRecorder
+    chunks, in order, as binary frames; they are stored as the session's recording and piped
+    through ffmpeg, and the decoded audio is transcribed on a sliding window. Messages sent back:
+      {"type": "partial", "text": ...}          tentative text after the last commit point
+      {"type": "committed", "segments": [...]}  stable segments, already stored
+      {"type": "finalized", "session": {...}}   after the client sends {"type": "stop"}
+    Once finalized the transcript is complete and the session only waits for the LLM stage.
+    A dropped connection finalizes too; the recording can't be resumed on a new socket.
+    Authenticate with ?token=<JWT access token>; ?container=webm|ogg|mp4 names the recording.
+    """
+
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.session_id = self.scope['url_route']['kwargs']['session_id']
+        self.lease_id = uuid.uuid4().hex
+        self.finalizing = False
+        self.step_task = None
+        self.bytes_received = 0
+        self.lease_task = None
+
+        container = self.query_param('container') or 'webm'
+        extension = LIVE_RECORDING_EXTENSIONS.get(container)
+        storage_name = f"{LIVE_RECORDING_DIR}/{self.session_id}{extension}" if extension else None
+        if storage_name is None or not await self.claim_session(user.id, storage_name):
+            # Not the user's, not a LIVE session waiting for audio, or another socket already has it
+            await self.close(code=4409)
+            return
+
+        self.recording_path = default_storage.path(storage_name)
+        self.recording = await self.run_file_io(self.open_recording)
+        self.transcriber = LiveTranscriber()
+        self.decoder = await asyncio.create_subprocess_exec(
+            *ffmpeg_stream_decode_command(),
+            stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL,
+        )
+        self.reader_task = asyncio.create_task(self.read_decoded_audio())
+        # Renewed on a timer of its own, so the session stays leased while the user records even
+        # when live transcription has broken down (the pipeline transcribes the file afterwards)
+        self.lease_task = asyncio.create_task(self.keep_lease())
+        await self.accept()
+
+    def open_recording(self):
+        os.makedirs(os.path.dirname(self.recording_path), exist_ok=True)
+        return open(self.recording_path, 'wb')
+
+    async def run_file_io(self, function, *args):
+        # Disk writes would stall every other socket and stream served by this event loop.
+        # Frames are handled one at a time, so the writes still happen in order.
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+    def query_param(self, name):
+        for pair in self.scope.get('query_string', b'').decode().split('&'):
+            key, _, value = pair.partition('=')
+            if key == name:
+                return value
+        return None
+
+    async def receive(self, text_data=None, bytes_data=None):
+        if bytes_data:
+            if self.finalizing:
+                return
+            self.bytes_received += len(bytes_data)
+            await self.run_file_io(self.recording.write, bytes_data)
+            if not self.transcriber.failed:
+                try:
+                    self.decoder.stdin.write(bytes_data)
+                    await self.decoder.stdin.drain()
+                except (BrokenPipeError, ConnectionResetError):
+                    print(f"Live decoder for session {self.session_id} exited; transcribing after the recording instead.")
+                    self.transcriber.failed = True
+            if (self.bytes_received > settings.LIVE_MAX_BYTES
+                    or self.transcriber.total_seconds > settings.LIVE_MAX_SECONDS):
+                await self.finish()
+                await self.close()
+            return
+
+        try:
+            message = json.loads(text_data or '{}')
+        except ValueError:
+            return
+        if message.get('type') == 'stop':
+            await self.finish()
+            await self.close()
+        elif message.get('type') == 'ping':
+            await self.send_message({'type': 'pong'})
+
+    async def disconnect(self, code):
+        if hasattr(self, 'transcriber') and not self.finalizing:
+            await self.finish(notify=False)
+        if getattr(self, 'lease_task', None) is not None:
+            self.lease_task.cancel()
+
+    async def send_message(self, message):
+        try:
+            await self.send(text_data=json.dumps(message))
+        except Exception:
+            pass # The client is gone; the transcript is stored regardless
+
+    async def read_decoded_audio(self):
+        remainder = b''
+        while True:
+            data = await self.decoder.stdout.read(65536)
+            if not data:
+                break
+            data = remainder + data
+            usable = len(data) - len(data) % BYTES_PER_SAMPLE
+            remainder = data[usable:]
+            samples = np.frombuffer(data[:usable], dtype=np.int16).astype(np.float32) / INT16_SCALE
+            self.transcriber.add_audio(samples)
+            # One step at a time per recording; audio arriving meanwhile is picked up by the next
+            if (self.transcriber.ready() and not self.finalizing
+                    and (self.step_task is None or self.step_task.done())):
+                self.step_task = asyncio.create_task(self.run_step())
+        if await self.decoder.wait() != 0 and self.transcriber.total_samples == 0:
+            self.transcriber.failed = True
+
+    async def run_step(self, final=False):
+        if self.transcriber.failed:
+            return
+        audio, offset, initial_prompt = self.transcriber.snapshot()
+        if len(audio) == 0:
+            return
+        try:
+            segments, commit_until = await asyncio.get_running_loop().run_in_executor(
+                get_live_executor(), run_live_step, audio, offset, initial_prompt, final
+            )
+        except Exception as e:
+            print(f"Live transcription failed for session {self.session_id}: {e}")
+            self.transcriber.failed = True
+            return
+
+        committed, partial_text = self.transcriber.apply(segments, commit_until, len(audio))
+        if committed:
+            await self.store_segments(committed)
+            await self.send_message({'type': 'committed', 'segments': committed})
+        if not final:
+            await self.send_message({'type': 'partial', 'text': partial_text})
+
+    async def keep_lease(self):
+        """
+        Renews the session's lease every SESSION_LEASE_HEARTBEAT_SECONDS until the session is finalized.
+        """
+        while True:
+            await asyncio.sleep(settings.SESSION_LEASE_HEARTBEAT_SECONDS)
+            try:
+                renewed = await database_sync_to_async(renew_lease)(self.session_id, self.lease_id)
+            except Exception as e:
+                # Database hiccup: try again on the next beat; the lease outlives a few missed ones
+                print(f"Lease renewal for live session {self.session_id} failed: {e}")
+                continue
+            if not renewed:
+                if self.finalizing:
+                    return # finalize_session finds the lease gone and leaves the session alone
+                # The reaper gave up on this socket (e.g. it stalled) and re-queued the session
+                print(f"Live session {self.session_id} lost its lease; closing.")
+                self.transcriber.failed = True
+                await self.close(code=4409)
+                return
+
+    async def finish(self, notify=True):
+        """
+        Flushes the decoder, transcribes what is left and hands the session to the pipeline.
+        """
+        if self.finalizing:
+            return
+        self.finalizing = True
+        await self.run_file_io(self.recording.close)
+        try:
+            self.decoder.stdin.close()
+            await asyncio.wait_for(self.reader_task, timeout=settings.MEDIA_PROBE_TIMEOUT_SECONDS)
+        except (asyncio.TimeoutError, BrokenPipeError, ConnectionResetError):
+            self.transcriber.failed = True
+        finally:
+            if self.decoder.returncode is None:
+                self.decoder.kill()
+        if self.step_task is not None:
+            await self.step_task
+        await self.run_step(final=True)
+
+        payload = await self.finalize_session()
+        self.lease_task.cancel()
+        if notify and payload is not None:
+            await self.send_message({'type': 'finalized', 'session': payload})
+
+    @database_sync_to_async
+    def claim_session(self, user_id, storage_name):
+        """
+        Takes the session for this socket: it must be the user's LIVE session, still waiting for
+        its recording. The lease keeps the reaper off it while the socket keeps renewing it.
+        """
+        now = timezone.now()
+        return Session.objects.filter(
+            Q(file_path='') | Q(file_path__isnull=True),
+            pk=self.session_id, user_id=user_id, file_type='LIVE', status='TRANSCRIBING',
+        ).update(
+            file_path=storage_name,
+            lease_owner=self.lease_id,
+            lease_expires=now + timedelta(seconds=settings.SESSION_LEASE_SECONDS),
+        ) == 1
+
+    @database_sync_to_async
+    def store_segments(self, rows):
+        store_transcript_segments(
+            self.session_id, (TranscriptSegment(session_id=self.session_id, **row) for row in rows)
+        )
+
+    @database_sync_to_async
+    def finalize_session(self):
+        session = Session.objects.filter(pk=self.session_id, lease_owner=self.lease_id).first()
+        if session is None:
+            return None # Already re-queued by the reaper
+
+        update_fields = ['status', 'lease_owner', 'lease_expires']
+        if self.bytes_received:
+            # Store the recording like any upload, so exports, retries and dedup work the same
+            hasher = hashlib.sha256()
+            with open(self.recording_path, 'rb') as recording:
+                for block in iter(lambda: recording.read(1024 * 1024), b''):
+                    hasher.update(block)
+            extension = os.path.splitext(self.recording_path)[1]
+            session.content_hash = hasher.hexdigest()
+            session.file_path.name = store_content_addressed(self.recording_path, session.content_hash, extension)
+            try:
+                info = probe_media(session.file_path.path)
+                session.audio_codec = info.audio_codec
+                session.sample_rate = info.sample_rate
+                session.channels = info.channels
+            except MediaProbeError as e:
+                print(f"Could not probe live recording of session {session.id}: {e}")
+            # MediaRecorder files usually carry no duration; the decoder counted it, unless it was
+            # stopped when live transcription broke down
+            session.duration_seconds = None if self.transcriber.failed else (self.transcriber.total_seconds or None)
+            # Only the LLM stage is left, unless live transcription broke down
+            session.checkpoint = '' if self.transcriber.failed else 'TRANSCRIBED'
+            session.status = 'PENDING'
+            update_fields += ['file_path', 'content_hash', 'audio_codec', 'sample_rate', 'channels',
+                              'duration_seconds', 'checkpoint']
+        else:
+            if os.path.exists(self.recording_path):
+                os.remove(self.recording_path)
+            session.status = 'FAILED' # Nothing was recorded
+
+        session.lease_owner = ''
+        session.lease_expires = None
+        session.save(update_fields=update_fields)
+        if session.status == 'PENDING':
+            request_dispatch()
+        return session_status_payload(session)
@@ -0,0 +1,123 @@
+# audio_processor/dedup.py
+
+import hashlib
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .models import Session, AnalysisResult, TranscriptSegment, TranscriptIndex, store_transcript_segments
+
+CONTENT_ADDRESSED_DIR = 'user_uploads/sha256'
+
+
+def content_addressed_name(content_hash, extension):
+    return f"{CONTENT_ADDRESSED_DIR}/{content_hash[:2]}/{content_hash}{extension}"
+
+
+def store_content_addressed(source_path, content_hash, extension):
+    """
+    Moves a fully written file into content-addressed storage (or drops it if identical bytes
+    are already stored) and returns its storage name. source_path must be on the same filesystem.
+    """
+    storage_name = content_addressed_name(content_hash, extension)
+    final_path = default_storage.path(storage_name)
+    if os.path.exists(final_path):
+        os.remove(source_path) # Identical bytes are already stored
+    else:
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        os.replace(source_path, final_path)
+    return storage_name
+
+
+def save_content_addressed(uploaded_file):
+    """
+    Streams an uploaded file to storage while computing its SHA-256.
+    Files are stored under their hash, so identical bytes are kept on disk only once.
+    Returns (content_hash, storage_name).
+    """
+    hasher = hashlib.sha256()
+    upload_dir = os.path.join(settings.MEDIA_ROOT, CONTENT_ADDRESSED_DIR)
+    os.makedirs(upload_dir, exist_ok=True)
+
+    # Write to a temp file next to the final location so the rename below stays on one filesystem
+    fd, temp_path = tempfile.mkstemp(dir=upload_dir, suffix='.part')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            for chunk in uploaded_file.chunks():
+                hasher.update(chunk)
+                temp_file.write(chunk)
+
+        content_hash = hasher.hexdigest()
+        extension = os.path.splitext(uploaded_file.name)[1].lower()
+        return content_hash, store_content_addressed(temp_path, content_hash, extension)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def find_reusable_session(user_id, content_hash, llm_model, prompt_template_version):
+    """
+    Returns one of the user's completed sessions for the same file bytes analysed with the same model
+    and prompt, if any. Only the user's own sessions are considered: an upload that completes
+    instantly would otherwise tell them someone else had already uploaded the same file.
+    """
+    if not content_hash:
+        return None
+    return (
+        Session.objects
+        .filter(
+            user_id=user_id,
+            content_hash=content_hash,
+            status='COMPLETED',
+            analysis_result__llm_model_used=llm_model,
+            analysis_result__prompt_template_version=prompt_template_version,
+        )
+        .select_related('analysis_result')
+        .order_by('-upload_timestamp')
+        .first()
+    )
+
+
+def copy_session_results(source, target):
+    """
+    Completes target by copying source's analysis, transcript segments and retrieval index, without any processing.
+    """
+    source_analysis = source.analysis_result
+    with transaction.atomic():
+        AnalysisResult.objects.update_or_create(
+            session=target,
+            defaults={
+                'transcription_text': source_analysis.transcription_text,
+                'summary_text': source_analysis.summary_text,
+                'notes_text': source_analysis.notes_text,
+                'suggestions_resources_text': source_analysis.suggestions_resources_text,
+                'llm_raw_output': source_analysis.llm_raw_output,
+                'llm_model_used': source_analysis.llm_model_used,
+                'prompt_template_version': source_analysis.prompt_template_version,
+            }
+        )
+        store_transcript_segments(target.id, (
+            TranscriptSegment(
+                session=target,
+                index=seg.index,
+                start=seg.start,
+                end=seg.end,
+                text=seg.text,
+                avg_logprob=seg.avg_logprob,
+            )
+            for seg in source.transcript_segments.order_by('index').iterator()
+        ))
+        source_index = TranscriptIndex.objects.filter(session=source).first()
+        if source_index:
+            TranscriptIndex.objects.update_or_create(
+                session=target,
+                defaults={'data': source_index.data, 'chunk_count': source_index.chunk_count}
+            )
+        target.duration_seconds = source.duration_seconds
+        target.status = 'COMPLETED'
+        target.checkpoint = 'ANALYZED'
+        target.save(update_fields=['duration_seconds', 'status', 'checkpoint'])
@@ -0,0 +1,162 @@
+# audio_processor/leases.py
+
+import os
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Session
+from .scheduler import IN_FLIGHT_STATUSES, request_dispatch
+
+# Each dispatch of a session is one pipeline run with its own id. The run holds the session's lease
+# (lease_owner = run id) from dispatch until the session completes or fails. Stages renew it while
+# they work and extend it when handing over to the next queue. A task whose run no longer holds the
+# lease (a duplicate message, or a run the reaper gave up on) does nothing.
+
+
+class LeaseLost(Exception):
+    """
+    The run's lease was taken over (it expired and the session was re-queued); stop without writing.
+    """
+    pass
+
+
+def _extend_lease(session_id, run_id, seconds):
+    if not run_id:
+        return False
+    expires = timezone.now() + timedelta(seconds=seconds)
+    return Session.objects.filter(pk=session_id, lease_owner=run_id).update(lease_expires=expires) == 1
+
+
+def claim_stage(session_id, run_id):
+    """
+    Renews the run's lease as a stage starts. False if the session belongs to another run (or none).
+    """
+    return _extend_lease(session_id, run_id, settings.SESSION_LEASE_SECONDS)
+
+
+def renew_lease(session_id, run_id):
+    return _extend_lease(session_id, run_id, settings.SESSION_LEASE_SECONDS)
+
+
+def hand_off_lease(session_id, run_id):
+    """
+    Keeps the lease while the session waits in the next stage's queue.
+    """
+    return _extend_lease(session_id, run_id, settings.SESSION_LEASE_QUEUED_SECONDS)
+
+
+def holds_lease(session_id, run_id):
+    return bool(run_id) and Session.objects.filter(pk=session_id, lease_owner=run_id).exists()
+
+
+def release_lease(session_id, run_id):
+    return Session.objects.filter(pk=session_id, lease_owner=run_id).update(lease_owner='', lease_expires=None) == 1
+
+
+class LeaseHeartbeat:
+    """
+    Renews the lease from a background thread while a stage runs, so long transcriptions and LLM
+    calls keep it. check() raises LeaseLost once a renewal finds the lease gone.
+    """
+
+    def __init__(self, session_id, run_id):
+        self.session_id = session_id
+        self.run_id = run_id
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"lease-heartbeat-{session_id}", daemon=True)
+
+    def _run(self):
+        try:
+            while not self._stop.wait(settings.SESSION_LEASE_HEARTBEAT_SECONDS):
+                try:
+                    if not renew_lease(self.session_id, self.run_id):
+                        self.lost = True
+                        return
+                except Exception as e:
+                    # Database hiccup: try again on the next beat; the lease outlives a few missed ones
+                    print(f"Lease heartbeat for session {self.session_id} failed: {e}")
+        finally:
+            connection.close() # The thread's own connection
+
+    def check(self):
+        if self.lost:
+            raise LeaseLost(f"Session {self.session_id} is no longer leased to run {self.run_id}.")
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+        return False
+
+
+def reap_expired_leases():
+    """
+    Re-queues dispatched sessions whose lease ran out (their worker died or the message was lost),
+    or fails them after SESSION_PROCESSING_MAX_ATTEMPTS runs. Returns (requeued, failed).
+    """
+    now = timezone.now()
+    expired = Q(status__in=IN_FLIGHT_STATUSES, dispatched_timestamp__isnull=False) & (
+        Q(lease_expires__isnull=True) | Q(lease_expires__lt=now)
+    )
+    requeued = failed = 0
+    for session_id in list(Session.objects.filter(expired).values_list('id', flat=True)[:500]):
+        with transaction.atomic():
+            session = Session.objects.select_for_update(skip_locked=True).filter(expired, pk=session_id).first()
+            if session is None:
+                continue # Finished or renewed meanwhile
+            print(f"Lease of session {session_id} (run {session.lease_owner or '-'}) expired while {session.status}.")
+            session.lease_owner = ''
+            session.lease_expires = None
+            session.dispatched_timestamp = None
+            if session.processing_attempts >= settings.SESSION_PROCESSING_MAX_ATTEMPTS:
+                session.status = 'FAILED'
+                failed += 1
+            else:
+                session.status = 'PENDING' # Transcription resumes after the last stored segment
+                requeued += 1
+            session.save(update_fields=['status', 'lease_owner', 'lease_expires', 'dispatched_timestamp'])
+
+    live_requeued, live_failed = reap_abandoned_live_sessions(now)
+    requeued += live_requeued
+    failed += live_failed
+    if requeued:
+        request_dispatch()
+    return requeued, failed
+
+
+def reap_abandoned_live_sessions(now):
+    """
+    LIVE sessions are held by their WebSocket rather than a pipeline run. One whose socket went
+    away without finalizing (the server process died) goes to the pipeline with whatever was
+    recorded; one that never got a socket, or recorded nothing, fails. Returns (requeued, failed).
+    """
+    lease_cutoff = now - timedelta(seconds=settings.SESSION_LEASE_SECONDS)
+    abandoned = Q(file_type='LIVE', status='TRANSCRIBING', dispatched_timestamp__isnull=True) & (
+        Q(lease_expires__lt=now) | Q(lease_expires__isnull=True, upload_timestamp__lt=lease_cutoff)
+    )
+    requeued = failed = 0
+    for session_id in list(Session.objects.filter(abandoned).values_list('id', flat=True)[:500]):
+        with transaction.atomic():
+            session = Session.objects.select_for_update(skip_locked=True).filter(abandoned, pk=session_id).first()
+            if session is None:
+                continue
+            print(f"Live session {session_id} was abandoned while recording.")
+            session.lease_owner = ''
+            session.lease_expires = None
+            if session.file_path and os.path.exists(session.file_path.path) and os.path.getsize(session.file_path.path):
+                session.status = 'PENDING' # Transcription resumes after the segments stored live
+                requeued += 1
+            else:
+                session.status = 'FAILED'
+                failed += 1
+            session.save(update_fields=['status', 'lease_owner', 'lease_expires'])
+    return requeued, failed
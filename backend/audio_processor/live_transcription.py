@@ -0,0 +1,197 @@
+# audio_processor/live_transcription.py
+
+import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from celery import current_app
+from django.conf import settings
+
+from .audio_decode import INT16_SCALE, SAMPLE_RATE, find_quiet_point
+from .transcription import TRANSCRIBE_PROMPT_CHARS, TranscribedSegment
+from .whisper_pool import get_whisper_model
+
+LIVE_RECORDING_DIR = 'user_uploads/live'
+LIVE_RECORDING_EXTENSIONS = {'webm': '.webm', 'ogg': '.ogg', 'mp4': '.mp4'}
+LIVE_STEP_TASK_NAME = 'audio_processor.tasks.transcribe_live_window_task'
+
+# Whisper's segment timestamps are approximate; a segment ending this far past a commit point still counts
+COMMIT_TOLERANCE_SECONDS = 0.3
+
+
+def find_commit_point(audio, speech, offset):
+    """
+    Picks where the uncommitted audio can be cut for good: the middle of the latest pause
+    (a VAD gap of at least LIVE_MIN_SILENCE_SECONDS) that is not in the newest
+    LIVE_COMMIT_MARGIN_SECONDS. Text before a pause won't change when more audio arrives.
+    Without a pause for a whole window, cuts at the quietest moment of its second half.
+    Returns a recording time in seconds, or None when nothing is stable yet.
+    """
+    min_gap = settings.LIVE_MIN_SILENCE_SECONDS * SAMPLE_RATE
+    horizon = len(audio) - settings.LIVE_COMMIT_MARGIN_SECONDS * SAMPLE_RATE
+    gaps = [(current['end'], following['start']) for current, following in zip(speech, speech[1:])]
+    gaps.append((speech[-1]['end'], len(audio))) # Trailing silence, if the speaker has paused
+    cuts = [(start + end) // 2 for start, end in gaps if end - start >= min_gap and (start + end) // 2 <= horizon]
+    if cuts:
+        return offset + cuts[-1] / SAMPLE_RATE
+    if len(audio) >= settings.LIVE_WINDOW_SECONDS * SAMPLE_RATE:
+        return offset + find_quiet_point(audio, len(audio) // 2) / SAMPLE_RATE
+    return None
+
+
+def transcribe_live_window(audio, offset, initial_prompt=None, final=False):
+    """
+    Transcribes the uncommitted audio of a live recording (runs in a Celery worker, see run_live_step).
+    Returns (segments, commit_until): segments with recording-relative times, and the time up
+    to which they are stable (None if none are yet). With final, everything is stable.
+    """
+    # Imported here so the ASGI process, which imports this module for the consumer, doesn't need faster-whisper.
+    from faster_whisper.vad import VadOptions, get_speech_timestamps
+
+    duration = len(audio) / SAMPLE_RATE
+    speech = get_speech_timestamps(audio, vad_options=VadOptions(
+        min_silence_duration_ms=int(settings.LIVE_MIN_SILENCE_SECONDS * 1000),
+    ))
+    if not speech:
+        # Only silence, for which Whisper tends to invent text; drop it, except the newest bit
+        # in case a word is just starting
+        keep = 0 if final else settings.LIVE_COMMIT_MARGIN_SECONDS
+        return [], offset + max(duration - keep, 0)
+
+    whisper_model = get_whisper_model()
+    segments, info = whisper_model.transcribe(
+        audio,
+        beam_size=settings.LIVE_BEAM_SIZE,
+        initial_prompt=initial_prompt,
+        condition_on_previous_text=False,
+    )
+    segments = [
+        TranscribedSegment(offset + seg.start, offset + seg.end, seg.text.strip(), seg.avg_logprob)
+        for seg in segments if seg.text.strip()
+    ]
+    # A window that has grown to twice the limit without any usable cut is committed whole
+    if final or len(audio) >= 2 * settings.LIVE_WINDOW_SECONDS * SAMPLE_RATE:
+        return segments, offset + duration
+    return segments, find_commit_point(audio, speech, offset)
+
+
+class LiveTranscriber:
+    """
+    Transcription state of one live recording. Decoded audio is appended with add_audio();
+    each step transcribes the audio after the last commit point again (the sliding window),
+    commits the segments that have become stable and drops their audio.
+    Not thread-safe: call everything except run_live_step from the event loop.
+    """
+
+    def __init__(self, next_index=0):
+        self.audio = np.empty(0, dtype=np.float32) # Uncommitted audio
+        self.offset = 0.0 # Recording time of self.audio[0]
+        self.total_samples = 0
+        self.samples_since_step = 0
+        self.next_index = next_index
+        self.committed_text = ""
+        self.failed = False # Decoding or transcription broke; the pipeline transcribes the file instead
+
+    @property
+    def total_seconds(self):
+        return self.total_samples / SAMPLE_RATE
+
+    def add_audio(self, samples):
+        self.audio = np.concatenate((self.audio, samples))
+        self.total_samples += len(samples)
+        self.samples_since_step += len(samples)
+
+    def ready(self):
+        return self.samples_since_step >= settings.LIVE_STEP_SECONDS * SAMPLE_RATE
+
+    def snapshot(self):
+        """
+        Returns (audio, offset, initial_prompt) for the next step.
+        """
+        self.samples_since_step = 0
+        return self.audio, self.offset, self.committed_text[-TRANSCRIBE_PROMPT_CHARS:] or None
+
+    def apply(self, segments, commit_until, snapshot_samples):
+        """
+        Commits the leading segments that end by commit_until and drops the audio before the cut.
+        Audio added while the step ran is kept. Returns (committed segment dicts, partial text).
+        """
+        committed = []
+        if commit_until is not None:
+            for seg in segments:
+                if seg.end > commit_until + COMMIT_TOLERANCE_SECONDS:
+                    break
+                committed.append(seg)
+        remaining = segments[len(committed):]
+
+        cut_time = self.offset
+        if commit_until is not None:
+            # Never cut into a segment that isn't committed yet
+            cut_time = min(commit_until, remaining[0].start) if remaining else commit_until
+        cut = min(max(int(round((cut_time - self.offset) * SAMPLE_RATE)), 0), snapshot_samples)
+        if cut == 0:
+            committed, remaining = [], segments
+        self.audio = self.audio[cut:]
+        self.offset += cut / SAMPLE_RATE
+
+        rows = []
+        for seg in committed:
+            rows.append({
+                'index': self.next_index,
+                'start': round(seg.start, 3),
+                'end': round(seg.end, 3),
+                'text': seg.text,
+                'avg_logprob': seg.avg_logprob,
+            })
+            self.next_index += 1
+        if committed:
+            self.committed_text = f"{self.committed_text} {' '.join(seg.text for seg in committed)}".strip()
+        return rows, " ".join(seg.text for seg in remaining)
+
+
+def encode_live_audio(audio):
+    """
+    Float samples as base64 s16le, the form a live step's audio takes through the (JSON) broker.
+    The samples were decoded from s16le, so the round trip is exact.
+    """
+    pcm = np.clip(np.round(audio * INT16_SCALE), -INT16_SCALE, INT16_SCALE - 1).astype('<i2')
+    return base64.b64encode(pcm.tobytes()).decode('ascii')
+
+
+def decode_live_audio(data):
+    return np.frombuffer(base64.b64decode(data), dtype='<i2').astype(np.float32) / INT16_SCALE
+
+
+def run_live_step(audio, offset, initial_prompt=None, final=False):
+    """
+    Has a worker on the live queue run transcribe_live_window, so Whisper never runs in the ASGI
+    process, and waits for its result (blocking; call it in a thread). Raises on failure or
+    after LIVE_STEP_TIMEOUT_SECONDS, and the recording is then transcribed by the pipeline instead.
+    """
+    result = current_app.send_task(
+        LIVE_STEP_TASK_NAME, args=[encode_live_audio(audio), offset, initial_prompt, final]
+    )
+    try:
+        segments, commit_until = result.get(timeout=settings.LIVE_STEP_TIMEOUT_SECONDS)
+    finally:
+        result.forget()
+    return [TranscribedSegment(*seg) for seg in segments], commit_until
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_live_executor():
+    """
+    Threads that wait for live transcription steps in this ASGI process, bounded by
+    LIVE_TRANSCRIBE_THREADS so many open recordings can't flood the live queue.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.LIVE_TRANSCRIBE_THREADS, thread_name_prefix='live-transcribe'
+            )
+        return _executor
@@ -0,0 +1,98 @@
+# audio_processor/llm_cache.py
+
+import hashlib
+import re
+
+from django.conf import settings
+from django.core.cache import caches
+
+HITS_KEY = 'llm:stats:hits'
+MISSES_KEY = 'llm:stats:misses'
+
+
+def _cache():
+    return caches[settings.LLM_CACHE_ALIAS]
+
+
+def hash_inputs(*parts):
+    """
+    Stable SHA-256 over the prompt inputs (None is treated as an empty string).
+    """
+    hasher = hashlib.sha256()
+    for part in parts:
+        hasher.update((part or '').encode('utf-8'))
+        hasher.update(b'\x00') # Separator so ('ab', 'c') and ('a', 'bc') differ
+    return hasher.hexdigest()
+
+
+def normalize_question(question):
+    """
+    Makes trivially different phrasings of the same question share a cache entry.
+    """
+    question = re.sub(r"\s+", " ", question.strip().lower())
+    return question.rstrip(" ?!.")
+
+
+def make_cache_key(model, template_version, inputs_hash, question=''):
+    question_hash = hash_inputs(normalize_question(question))[:16] if question else '-'
+    return f"llm:{model}:{template_version}:{inputs_hash}:{question_hash}"
+
+
+def _count(key):
+    cache = _cache()
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        # The counter was evicted between add() and incr(); start it again
+        cache.set(key, 1, timeout=None)
+
+
+def get_cached(key):
+    """
+    Returns the cached response or None, updating the hit/miss counters.
+    """
+    if not settings.LLM_CACHE_ENABLED:
+        return None
+    try:
+        value = _cache().get(key)
+        _count(HITS_KEY if value is not None else MISSES_KEY)
+    except Exception as e:
+        # The cache lives in Redis; while it's unreachable every prompt goes to the LLM
+        print(f"LLM cache unavailable, treating as a miss: {e}")
+        return None
+    return value
+
+
+def set_cached(key, value):
+    if settings.LLM_CACHE_ENABLED and value:
+        try:
+            _cache().set(key, value, timeout=settings.LLM_CACHE_TTL_SECONDS)
+        except Exception as e:
+            print(f"Could not store LLM response in the cache: {e}")
+
+
+def cached_generate(generate, key, bypass=False):
+    """
+    Returns (response, was_cached). With bypass the LLM is always called, but the fresh
+    response still replaces whatever was cached.
+    """
+    if not bypass:
+        cached = get_cached(key)
+        if cached is not None:
+            return cached, True
+    response = generate()
+    set_cached(key, response)
+    return response, False
+
+
+def cache_stats():
+    cache = _cache()
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total, 3) if total else 0.0,
+    }
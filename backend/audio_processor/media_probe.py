@@ -0,0 +1,179 @@
+# audio_processor/media_probe.py
+
+import json
+import os
+import subprocess
+import tempfile
+from typing import NamedTuple, Optional
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .models import Session
+
+AUDIO_ONLY_DIR = 'user_uploads/audio'
+
+
+class MediaProbeError(Exception):
+    """
+    The file has no decodable audio (or isn't media at all).
+    """
+    pass
+
+
+class MediaInfo(NamedTuple):
+    duration: Optional[float]
+    audio_codec: str
+    sample_rate: Optional[int]
+    channels: Optional[int]
+    has_video: bool
+    format_name: str
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def probe_media(path):
+    """
+    Reads container and stream metadata with ffprobe. Raises MediaProbeError if ffprobe can't
+    parse the file or it has no audio stream.
+    """
+    command = [
+        "ffprobe", "-v", "error", "-print_format", "json",
+        "-show_format", "-show_streams", path
+    ]
+    try:
+        completed = subprocess.run(
+            command, capture_output=True, timeout=settings.MEDIA_PROBE_TIMEOUT_SECONDS, check=False
+        )
+    except subprocess.TimeoutExpired:
+        raise MediaProbeError("Timed out reading the media file.")
+    if completed.returncode != 0:
+        message = completed.stderr.decode('utf-8', 'replace').strip().splitlines()
+        raise MediaProbeError(message[-1] if message else "The file is not a readable audio or video file.")
+
+    try:
+        info = json.loads(completed.stdout or b'{}')
+    except ValueError:
+        raise MediaProbeError("Could not read the media file's metadata.")
+
+    streams = info.get('streams', [])
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+    if audio is None:
+        raise MediaProbeError("The file has no audio track.")
+    # Cover art in audio files shows up as a one-frame "video" stream
+    has_video = any(
+        s.get('codec_type') == 'video' and not s.get('disposition', {}).get('attached_pic')
+        for s in streams
+    )
+    container = info.get('format', {})
+    return MediaInfo(
+        duration=_to_float(container.get('duration')) or _to_float(audio.get('duration')),
+        audio_codec=audio.get('codec_name', ''),
+        sample_rate=_to_int(audio.get('sample_rate')),
+        channels=_to_int(audio.get('channels')),
+        has_video=has_video,
+        format_name=container.get('format_name', ''),
+    )
+
+
+def check_audio_decodes(path, seconds=None):
+    """
+    Decodes the first few seconds of audio and discards them, catching files whose headers
+    parse but whose audio doesn't decode (truncated or corrupt uploads).
+    """
+    seconds = seconds or settings.MEDIA_PROBE_TEST_DECODE_SECONDS
+    command = [
+        "ffmpeg", "-nostdin", "-v", "error", "-xerror", "-t", str(seconds), "-i", path,
+        "-vn", "-f", "null", "-"
+    ]
+    try:
+        completed = subprocess.run(
+            command, capture_output=True, timeout=settings.MEDIA_PROBE_TIMEOUT_SECONDS, check=False
+        )
+    except subprocess.TimeoutExpired:
+        raise MediaProbeError("Timed out decoding the media file.")
+    if completed.returncode != 0:
+        raise MediaProbeError("The file's audio could not be decoded.")
+
+
+def inspect_stored_upload(storage_name):
+    """
+    Probes a newly stored upload and checks that its audio decodes. Returns MediaInfo.
+    A rejected file is deleted again unless an existing session already uses the same bytes.
+    MediaProbeError means the file was rejected; anything else is a problem on the server.
+    """
+    path = default_storage.path(storage_name)
+    try:
+        info = probe_media(path)
+        check_audio_decodes(path)
+        return info
+    except Exception:
+        # Also when the check itself failed (e.g. no ffprobe on the server), so no file is orphaned
+        if not Session.objects.filter(file_path=storage_name).exists():
+            default_storage.delete(storage_name)
+        raise
+
+
+def media_info_fields(info):
+    """
+    Session field values for a probed file.
+    """
+    return {
+        'duration_seconds': info.duration,
+        'audio_codec': info.audio_codec,
+        'sample_rate': info.sample_rate,
+        'channels': info.channels,
+        'file_type': 'VIDEO' if info.has_video else 'AUDIO',
+    }
+
+
+def extract_audio_track(session):
+    """
+    Replaces a video session's stored file with a compressed mono speech-quality audio track
+    (Opus at the transcription sample rate), so storage and every later decode skip the video.
+    The track is named after the upload's content hash, so identical uploads share it.
+    Returns the new storage name.
+    """
+    source_name = session.file_path.name
+    if source_name.startswith(f"{AUDIO_ONLY_DIR}/"):
+        return source_name # Already extracted (e.g. a retried task)
+    source_path = session.file_path.path
+    storage_name = f"{AUDIO_ONLY_DIR}/{session.content_hash or session.id}.ogg"
+    final_path = default_storage.path(storage_name)
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+
+    if not os.path.exists(final_path):
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(final_path), suffix='.part.ogg')
+        os.close(fd)
+        command = [
+            "ffmpeg", "-nostdin", "-y", "-v", "error", "-i", source_path,
+            "-map", "0:a:0", "-vn", "-ac", "1", "-ar", "16000",
+            "-c:a", "libopus", "-b:a", settings.INGEST_AUDIO_BITRATE, "-application", "voip",
+            temp_path
+        ]
+        try:
+            subprocess.run(command, capture_output=True, check=True)
+            os.replace(temp_path, final_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    session.file_path.name = storage_name
+    session.save(update_fields=['file_path'])
+
+    # Keep the original while any other session still points at it
+    if not Session.objects.filter(file_path=source_name).exists():
+        default_storage.delete(source_name)
+    return storage_name
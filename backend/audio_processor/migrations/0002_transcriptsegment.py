@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_processor', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptSegment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField(help_text='Position of the segment within the transcript, starting at 0.')),
+                ('start', models.FloatField(help_text='Start time of the segment in seconds from the beginning of the recording.')),
+                ('end', models.FloatField(help_text='End time of the segment in seconds from the beginning of the recording.')),
+                ('text', models.TextField(blank=True, help_text='The transcribed text of this segment.')),
+                ('avg_logprob', models.FloatField(blank=True, help_text="Whisper's average log probability for the segment (confidence).", null=True)),
+                ('session', models.ForeignKey(help_text='The session this segment belongs to.', on_delete=django.db.models.deletion.CASCADE, related_name='transcript_segments', to='audio_processor.session')),
+            ],
+            options={
+                'verbose_name': 'Transcript Segment',
+                'verbose_name_plural': 'Transcript Segments',
+                'ordering': ['session', 'index'],
+                'constraints': [models.UniqueConstraint(fields=('session', 'index'), name='unique_segment_index_per_session')],
+            },
+        ),
+    ]
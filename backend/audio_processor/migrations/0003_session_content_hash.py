@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_processor', '0002_transcriptsegment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the uploaded file, used to reuse results for identical uploads.', max_length=64, null=True),
+        ),
+    ]
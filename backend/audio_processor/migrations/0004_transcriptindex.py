@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 10:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_processor', '0003_session_content_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TranscriptIndex',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.BinaryField(help_text='Compressed NumPy archive holding the postings, chunk lengths and chunk character spans.')),
+                ('chunk_count', models.PositiveIntegerField(default=0, help_text='Number of transcript chunks in the index.')),
+                ('built_timestamp', models.DateTimeField(auto_now=True, help_text='When the index was last built.')),
+                ('session', models.OneToOneField(help_text='The session whose transcript is indexed.', on_delete=django.db.models.deletion.CASCADE, related_name='transcript_index', to='audio_processor.session')),
+            ],
+            options={
+                'verbose_name': 'Transcript Index',
+                'verbose_name_plural': 'Transcript Indexes',
+            },
+        ),
+    ]
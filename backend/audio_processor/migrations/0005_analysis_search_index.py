@@ -0,0 +1,24 @@
+# Full-text search index over AnalysisResult (SQLite FTS5 table + triggers, or a PostgreSQL GIN index)
+
+from django.db import migrations
+
+from audio_processor.search import create_search_index, drop_search_index
+
+
+def create_index(apps, schema_editor):
+    create_search_index(schema_editor)
+
+
+def drop_index(apps, schema_editor):
+    drop_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_processor', '0004_transcriptindex'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
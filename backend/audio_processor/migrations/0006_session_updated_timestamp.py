@@ -0,0 +1,20 @@
+# Generated by Django 5.2.4 on 2026-10-18 14:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_processor', '0005_analysis_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='updated_timestamp',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, help_text='When the session (e.g. its status) last changed. Used for status ETags.'),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:05
+
+from django.db import migrations, models
+
+from audio_processor.models import build_summary_preview
+
+
+def fill_summary_previews(apps, schema_editor):
+    AnalysisResult = apps.get_model('audio_processor', 'AnalysisResult')
+    batch = []
+    for analysis in AnalysisResult.objects.only('id', 'summary_text').iterator(chunk_size=500):
+        analysis.summary_preview = build_summary_preview(analysis.summary_text)
+        batch.append(analysis)
+        if len(batch) >= 500:
+            AnalysisResult.objects.bulk_update(batch, ['summary_preview'])
+            batch = []
+    if batch:
+        AnalysisResult.objects.bulk_update(batch, ['summary_preview'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_processor', '0006_session_updated_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisresult',
+            name='summary_preview',
+            field=models.CharField(blank=True, editable=False, help_text='Short plain-text start of the summary, kept up to date on save for session lists.', max_length=201),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['user', '-upload_timestamp', '-id'], name='session_user_uploaded_idx'),
+        ),
+        migrations.RunPython(fill_summary_previews, migrations.RunPython.noop),
+    ]
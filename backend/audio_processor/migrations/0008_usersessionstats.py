@@ -0,0 +1,36 @@
+# Generated by Django 5.2.4 on 2026-10-18 16:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_processor', '0007_session_list_preview'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='status_changed_timestamp',
+            field=models.DateTimeField(blank=True, help_text='When the session entered its current status. Used for per-stage timing stats.', null=True),
+        ),
+        migrations.CreateModel(
+            name='UserSessionStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status_counts', models.JSONField(default=dict, help_text="Number of the user's sessions in each status, e.g. {'COMPLETED': 3}.")),
+                ('stage_timings', models.JSONField(default=dict, help_text="Per-stage duration histograms: {stage: {'count', 'total_seconds', 'buckets'}}.")),
+                ('updated_timestamp', models.DateTimeField(auto_now=True, help_text='When these statistics last changed.')),
+                ('last_session', models.ForeignKey(blank=True, help_text="The user's most recently uploaded session.", null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='audio_processor.session')),
+                ('user', models.OneToOneField(help_text='The user these statistics belong to.', on_delete=django.db.models.deletion.CASCADE, related_name='session_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Session Stats',
+                'verbose_name_plural': 'User Session Stats',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 17:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_processor', '0008_usersessionstats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisresult',
+            name='pdf_content_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Content hash of the rendered notes PDF artifact, if one has been rendered.', max_length=64, null=True),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 18:10
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_processor', '0009_analysisresult_pdf_content_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumableUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, help_text='Unguessable id used in the upload URL.', primary_key=True, serialize=False)),
+                ('original_file_name', models.CharField(help_text='The original name of the file being uploaded.', max_length=255)),
+                ('content_type', models.CharField(blank=True, help_text='MIME type reported by the client, used to tell audio from video.', max_length=100)),
+                ('title', models.CharField(blank=True, help_text='Title for the session created on finalize.', max_length=255)),
+                ('processing_mode', models.CharField(choices=[('LECTURE', 'Lecture Mode'), ('MEETING', 'Meeting Mode'), ('MEDICAL', 'Medical Notes Mode'), ('INTERVIEW', 'Interview Mode'), ('JOURNAL', 'Thought Journal Mode'), ('PARENTING', 'Parenting Mode')], default='LECTURE', help_text='Processing mode for the session created on finalize.', max_length=20)),
+                ('upload_length', models.BigIntegerField(help_text='Total size of the file in bytes, declared when the upload is created.')),
+                ('upload_offset', models.BigIntegerField(default=0, help_text='Number of bytes received so far; the next chunk must start here.')),
+                ('crc32', models.BigIntegerField(default=0, help_text='Rolling CRC-32 of the bytes received so far.')),
+                ('created_timestamp', models.DateTimeField(auto_now_add=True, help_text='When the upload was created.')),
+                ('updated_timestamp', models.DateTimeField(auto_now=True, help_text='When the last chunk was received.')),
+                ('session', models.OneToOneField(blank=True, help_text='The session created when the upload was finalized.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='resumable_upload', to='audio_processor.session')),
+                ('user', models.ForeignKey(help_text='The user uploading the file.', on_delete=django.db.models.deletion.CASCADE, related_name='resumable_uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Resumable Upload',
+                'verbose_name_plural': 'Resumable Uploads',
+            },
+        ),
+    ]
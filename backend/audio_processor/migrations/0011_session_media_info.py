@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_processor', '0010_resumableupload'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='session',
+            name='duration_seconds',
+            field=models.FloatField(blank=True, help_text='Duration of the audio/video in seconds, probed at upload.', null=True),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='audio_codec',
+            field=models.CharField(blank=True, help_text="Codec of the uploaded file's audio track (e.g. 'aac', 'mp3'), probed at upload.", max_length=32),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='sample_rate',
+            field=models.PositiveIntegerField(blank=True, help_text='Sample rate of the uploaded audio track in Hz, probed at upload.', null=True),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='channels',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Number of channels in the uploaded audio track, probed at upload.', null=True),
+        ),
+    ]
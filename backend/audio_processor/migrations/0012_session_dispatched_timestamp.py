@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 19:40
+
+from django.db import migrations, models
+
+
+def mark_queued_sessions_dispatched(apps, schema_editor):
+    # Unfinished sessions already have a task in the Celery queue; the scheduler must not start them again
+    Session = apps.get_model('audio_processor', 'Session')
+    Session.objects.filter(status__in=['PENDING', 'TRANSCRIBING', 'ANALYZING']).update(
+        dispatched_timestamp=models.F('upload_timestamp')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_processor', '0011_session_media_info'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='dispatched_timestamp',
+            field=models.DateTimeField(blank=True, help_text='When the scheduler handed the session to the processing pipeline. Empty while it waits its turn.', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='session',
+            index=models.Index(fields=['status', 'dispatched_timestamp'], name='session_schedule_idx'),
+        ),
+        migrations.RunPython(mark_queued_sessions_dispatched, migrations.RunPython.noop),
+    ]
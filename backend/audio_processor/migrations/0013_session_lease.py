@@ -0,0 +1,28 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_processor', '0012_session_dispatched_timestamp'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='lease_owner',
+            field=models.CharField(blank=True, help_text='Id of the pipeline run currently processing the session. Empty when none is.', max_length=32),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='lease_expires',
+            field=models.DateTimeField(blank=True, help_text="When the run's lease lapses unless renewed; the reaper re-queues sessions past it.", null=True),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='processing_attempts',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Pipeline runs started for the session since its last manual retry.'),
+        ),
+    ]
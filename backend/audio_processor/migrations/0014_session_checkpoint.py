@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 20:50
+
+from django.db import migrations, models
+
+
+def mark_completed_sessions_analyzed(apps, schema_editor):
+    # Completed sessions have a stored transcript and analysis, so they can be re-analyzed
+    Session = apps.get_model('audio_processor', 'Session')
+    Session.objects.filter(status='COMPLETED').update(checkpoint='ANALYZED')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_processor', '0013_session_lease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='checkpoint',
+            field=models.CharField(blank=True, choices=[('', 'Not started'), ('EXTRACTED', 'Audio prepared'), ('TRANSCRIBED', 'Transcript stored'), ('ANALYZED', 'Analysis stored')], default='', help_text='Last pipeline stage whose output is stored. Retries resume at the stage after it.', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='session',
+            name='reanalyze_requested',
+            field=models.BooleanField(default=False, help_text='Set by a re-analyze request: the next run calls the LLM again, bypassing its cache.'),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='llm_raw_output',
+            field=models.TextField(blank=True, help_text='Unparsed LLM response the fields above were parsed from.'),
+        ),
+        migrations.RunPython(mark_completed_sessions_analyzed, migrations.RunPython.noop),
+    ]
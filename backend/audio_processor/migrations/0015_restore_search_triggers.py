@@ -0,0 +1,20 @@
+# Restores the SQLite FTS triggers dropped when 0007, 0009 and 0014 rebuilt the AnalysisResult table
+
+from django.db import migrations
+
+from audio_processor.search import ensure_search_triggers
+
+
+def restore_triggers(apps, schema_editor):
+    ensure_search_triggers(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_processor', '0014_session_checkpoint'),
+    ]
+
+    operations = [
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
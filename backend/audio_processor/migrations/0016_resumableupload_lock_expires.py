@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_processor', '0015_restore_search_triggers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='resumableupload',
+            name='lock_expires',
+            field=models.DateTimeField(blank=True, help_text='Set while a request is writing a chunk or finalizing; other requests get a conflict until then.', null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_processor', '0016_resumableupload_lock_expires'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='analysisresult',
+            name='pdf_render_hash',
+            field=models.CharField(blank=True, editable=False, help_text='Content hash a background notes PDF render was last requested for.', max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='analysisresult',
+            name='pdf_render_requested',
+            field=models.DateTimeField(blank=True, editable=False, help_text='When that render was requested; another is requested once PDF_RENDER_LOCK_SECONDS have passed.', null=True),
+        ),
+    ]
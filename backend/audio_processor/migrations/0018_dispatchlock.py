@@ -0,0 +1,25 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_processor', '0017_analysisresult_pdf_render_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DispatchLock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('locked_until', models.DateTimeField(blank=True, help_text='Set while a dispatcher runs; lapses in case the worker running it dies.', null=True)),
+                ('dispatch_again', models.BooleanField(default=False, help_text='Set when a dispatch was requested while one was running, so it does another pass.')),
+            ],
+            options={
+                'verbose_name': 'Dispatch Lock',
+                'verbose_name_plural': 'Dispatch Lock',
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 21:55
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+
+
+def backfill_transcribed_seconds(apps, schema_editor):
+    Session = apps.get_model('audio_processor', 'Session')
+    TranscriptSegment = apps.get_model('audio_processor', 'TranscriptSegment')
+    last_end = (
+        TranscriptSegment.objects.filter(session=OuterRef('pk'))
+        .order_by().values('session').annotate(last_end=Max('end')).values('last_end')
+    )
+    with_segments = TranscriptSegment.objects.values('session')
+    Session.objects.filter(pk__in=with_segments).update(transcribed_seconds=Subquery(last_end))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('audio_processor', '0018_dispatchlock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='session',
+            name='transcribed_seconds',
+            field=models.FloatField(default=0, help_text="End time of the last stored transcript segment, kept with the segments so status polls don't aggregate them."),
+        ),
+        migrations.RunPython(backfill_transcribed_seconds, migrations.RunPython.noop),
+    ]
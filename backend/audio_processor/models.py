@@ -3,8 +3,39 @@ from django.db import models
 # Create your models here.
 # audio_processor/models.py
 
+import re
+import uuid
+
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
 from django.conf import settings # To get the AUTH_USER_MODEL for ForeignKey
+from django.utils import timezone
+
+SUMMARY_PREVIEW_LENGTH = 200
+
+
+def build_summary_preview(summary_text, length=SUMMARY_PREVIEW_LENGTH):
+    """
+    Plain-text start of a summary for list views: markdown markers removed, whitespace collapsed,
+    cut at a word boundary.
+    """
+    text = re.sub(r"[#*_`>]+", "", summary_text or "")
+    text = re.sub(r"\s+", " ", text).strip()
+    if len(text) <= length:
+        return text
+    return text[:length].rsplit(' ', 1)[0].rstrip(' ,;:.') + '…'
+
+
+def transcription_progress(duration_seconds, transcribed_seconds):
+    """
+    Fraction (0-1) of the media transcribed so far, from the end of the last stored segment and
+    the probed duration. None when either is unknown.
+    """
+    if not duration_seconds or transcribed_seconds is None:
+        return None
+    return round(min(transcribed_seconds / duration_seconds, 1.0), 3)
+
 
 class Session(models.Model):
     """
@@ -35,6 +66,13 @@ class Session(models.Model):
         null=True,
         help_text="Path to the original audio/video file."
     )
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        null=True,
+        db_index=True,
+        help_text="SHA-256 of the uploaded file, used to reuse results for identical uploads."
+    )
 
     MEDIA_TYPE_CHOICES = [
         ('AUDIO', 'Audio File'),
@@ -51,7 +89,26 @@ class Session(models.Model):
     duration_seconds = models.FloatField(
         null=True,
         blank=True,
-        help_text="Duration of the audio/video in seconds."
+        help_text="Duration of the audio/video in seconds, probed at upload."
+    )
+    transcribed_seconds = models.FloatField(
+        default=0,
+        help_text="End time of the last stored transcript segment, kept with the segments so status polls don't aggregate them."
+    )
+    audio_codec = models.CharField(
+        max_length=32,
+        blank=True,
+        help_text="Codec of the uploaded file's audio track (e.g. 'aac', 'mp3'), probed at upload."
+    )
+    sample_rate = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Sample rate of the uploaded audio track in Hz, probed at upload."
+    )
+    channels = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        help_text="Number of channels in the uploaded audio track, probed at upload."
     )
 
     upload_timestamp = models.DateTimeField(
@@ -90,6 +147,87 @@ class Session(models.Model):
         default='PENDING', # Set initial status to PENDING
         help_text="Current processing status of the session."
     )
+    updated_timestamp = models.DateTimeField(
+        auto_now=True,
+        help_text="When the session (e.g. its status) last changed. Used for status ETags."
+    )
+    status_changed_timestamp = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the session entered its current status. Used for per-stage timing stats."
+    )
+    CHECKPOINT_CHOICES = [
+        ('', 'Not started'),
+        ('EXTRACTED', 'Audio prepared'), # file_path is the audio the transcription reads
+        ('TRANSCRIBED', 'Transcript stored'), # TranscriptSegment rows are complete
+        ('ANALYZED', 'Analysis stored'), # AnalysisResult holds the LLM output
+    ]
+    checkpoint = models.CharField(
+        max_length=16,
+        choices=CHECKPOINT_CHOICES,
+        blank=True,
+        default='',
+        help_text="Last pipeline stage whose output is stored. Retries resume at the stage after it."
+    )
+    reanalyze_requested = models.BooleanField(
+        default=False,
+        help_text="Set by a re-analyze request: the next run calls the LLM again, bypassing its cache."
+    )
+    dispatched_timestamp = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the scheduler handed the session to the processing pipeline. Empty while it waits its turn."
+    )
+    lease_owner = models.CharField(
+        max_length=32,
+        blank=True,
+        help_text="Id of the pipeline run currently processing the session. Empty when none is."
+    )
+    lease_expires = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the run's lease lapses unless renewed; the reaper re-queues sessions past it."
+    )
+    processing_attempts = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Pipeline runs started for the session since its last manual retry."
+    )
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored status so save() can tell a real transition from a re-save
+        instance._loaded_status = instance.__dict__.get('status')
+        return instance
+
+    def _stored_status(self):
+        if self._state.adding:
+            return None, None
+        loaded_status = getattr(self, '_loaded_status', None)
+        if loaded_status is not None:
+            return loaded_status, self.status_changed_timestamp
+        # Status was deferred when this instance was loaded; read what is stored
+        stored = Session.objects.filter(pk=self.pk).values_list('status', 'status_changed_timestamp').first()
+        return stored or (None, None)
+
+    def save(self, *args, **kwargs):
+        update_fields = kwargs.get('update_fields')
+        extra_fields = ['updated_timestamp'] # auto_now is only written when listed
+
+        # Record status transitions as (previous status, when it was entered, now) for the stats receiver
+        self._status_transition = None
+        if update_fields is None or 'status' in update_fields:
+            previous_status, entered_at = self._stored_status()
+            if self.status != previous_status:
+                now = timezone.now()
+                self._status_transition = (previous_status, entered_at, now)
+                self.status_changed_timestamp = now
+                extra_fields.append('status_changed_timestamp')
+
+        if update_fields is not None:
+            kwargs['update_fields'] = [*update_fields, *(f for f in extra_fields if f not in update_fields)]
+        super().save(*args, **kwargs)
+        self._loaded_status = self.status
 
     def __str__(self):
         return f"{self.user.username}'s session: {self.title or self.original_file_name} ({self.status})"
@@ -98,6 +236,12 @@ class Session(models.Model):
         verbose_name = "Session"
         verbose_name_plural = "Sessions"
         ordering = ['-upload_timestamp'] # Order by most recent sessions first
+        indexes = [
+            # Serves the per-user history list, paginated newest first
+            models.Index(fields=['user', '-upload_timestamp', '-id'], name='session_user_uploaded_idx'),
+            # Serves the scheduler's waiting-session and in-flight queries
+            models.Index(fields=['status', 'dispatched_timestamp'], name='session_schedule_idx'),
+        ]
 
 
 class AnalysisResult(models.Model):
@@ -129,6 +273,37 @@ class AnalysisResult(models.Model):
         blank=True,
         help_text="Suggestions and external resources for detailed study."
     )
+    summary_preview = models.CharField(
+        max_length=SUMMARY_PREVIEW_LENGTH + 1,
+        blank=True,
+        editable=False,
+        help_text="Short plain-text start of the summary, kept up to date on save for session lists."
+    )
+    llm_raw_output = models.TextField(
+        blank=True,
+        help_text="Unparsed LLM response the fields above were parsed from."
+    )
+    pdf_content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        null=True,
+        db_index=True,
+        editable=False,
+        help_text="Content hash of the rendered notes PDF artifact, if one has been rendered."
+    )
+    pdf_render_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        null=True,
+        editable=False,
+        help_text="Content hash a background notes PDF render was last requested for."
+    )
+    pdf_render_requested = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text="When that render was requested; another is requested once PDF_RENDER_LOCK_SECONDS have passed."
+    )
 
     # Metadata about the analysis process
     processed_timestamp = models.DateTimeField(
@@ -148,9 +323,246 @@ class AnalysisResult(models.Model):
         help_text="Version of the prompt template used for the LLM (e.g., 'lecture_v1.0')."
     )
 
+    def save(self, *args, **kwargs):
+        self.summary_preview = build_summary_preview(self.summary_text)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'summary_text' in update_fields and 'summary_preview' not in update_fields:
+            kwargs['update_fields'] = [*update_fields, 'summary_preview']
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Analysis for Session: {self.session.title or self.session.original_file_name}"
 
     class Meta:
         verbose_name = "Analysis Result"
-        verbose_name_plural = "Analysis Results"
\ No newline at end of file
+        verbose_name_plural = "Analysis Results"
+
+class TranscriptSegment(models.Model):
+    """
+    One Whisper segment of a session's transcript, written in batches while transcription runs.
+    Lets clients render the transcript progressively and lets a crashed task resume after the last segment.
+    """
+    session = models.ForeignKey(
+        Session,
+        on_delete=models.CASCADE,
+        related_name='transcript_segments', # Access from Session as session.transcript_segments
+        help_text="The session this segment belongs to."
+    )
+    index = models.PositiveIntegerField(
+        help_text="Position of the segment within the transcript, starting at 0."
+    )
+    start = models.FloatField(
+        help_text="Start time of the segment in seconds from the beginning of the recording."
+    )
+    end = models.FloatField(
+        help_text="End time of the segment in seconds from the beginning of the recording."
+    )
+    text = models.TextField(
+        blank=True,
+        help_text="The transcribed text of this segment."
+    )
+    avg_logprob = models.FloatField(
+        null=True,
+        blank=True,
+        help_text="Whisper's average log probability for the segment (confidence)."
+    )
+
+    def __str__(self):
+        return f"Segment {self.index} of Session {self.session_id}"
+
+    class Meta:
+        verbose_name = "Transcript Segment"
+        verbose_name_plural = "Transcript Segments"
+        ordering = ['session', 'index']
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'index'], name='unique_segment_index_per_session'),
+        ]
+
+
+def store_transcript_segments(session_id, segments):
+    """
+    Stores a batch of TranscriptSegment rows and moves the session's transcribed_seconds up to the last one.
+    """
+    segments = list(segments)
+    if not segments:
+        return
+    TranscriptSegment.objects.bulk_create(segments)
+    last_end = max(segment.end for segment in segments)
+    Session.objects.filter(pk=session_id).update(transcribed_seconds=Greatest(F('transcribed_seconds'), last_end))
+
+
+class TranscriptIndex(models.Model):
+    """
+    Serialized BM25 retrieval index over a session's transcript chunks (see retrieval.py).
+    Built once when the session completes and used to pick the transcript excerpts sent with Q&A prompts.
+    """
+    session = models.OneToOneField(
+        Session,
+        on_delete=models.CASCADE,
+        related_name='transcript_index', # Access from Session as session.transcript_index
+        help_text="The session whose transcript is indexed."
+    )
+    data = models.BinaryField(
+        help_text="Compressed NumPy archive holding the postings, chunk lengths and chunk character spans."
+    )
+    chunk_count = models.PositiveIntegerField(
+        default=0,
+        help_text="Number of transcript chunks in the index."
+    )
+    built_timestamp = models.DateTimeField(
+        auto_now=True,
+        help_text="When the index was last built."
+    )
+
+    def __str__(self):
+        return f"Transcript index for Session {self.session_id} ({self.chunk_count} chunks)"
+
+    class Meta:
+        verbose_name = "Transcript Index"
+        verbose_name_plural = "Transcript Indexes"
+
+
+class UserSessionStats(models.Model):
+    """
+    Per-user session counters, kept up to date on every status transition so the dashboard
+    stats are a single-row read. Stage durations are kept as fixed histograms, which gives
+    mean and p95 per stage without scanning sessions.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='session_stats',
+        help_text="The user these statistics belong to."
+    )
+    status_counts = models.JSONField(
+        default=dict,
+        help_text="Number of the user's sessions in each status, e.g. {'COMPLETED': 3}."
+    )
+    stage_timings = models.JSONField(
+        default=dict,
+        help_text="Per-stage duration histograms: {stage: {'count', 'total_seconds', 'buckets'}}."
+    )
+    last_session = models.ForeignKey(
+        Session,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        help_text="The user's most recently uploaded session."
+    )
+    updated_timestamp = models.DateTimeField(
+        auto_now=True,
+        help_text="When these statistics last changed."
+    )
+
+    def __str__(self):
+        return f"Session stats for {self.user.username}"
+
+    class Meta:
+        verbose_name = "User Session Stats"
+        verbose_name_plural = "User Session Stats"
+
+
+class ResumableUpload(models.Model):
+    """
+    An in-progress chunked upload (tus-style): the client creates it, appends chunks at the
+    current offset, and finalizes it into a Session once every byte has arrived.
+    Bytes are appended to a partial file, so an interrupted upload resumes from upload_offset.
+    """
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False,
+        help_text="Unguessable id used in the upload URL."
+    )
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='resumable_uploads',
+        help_text="The user uploading the file."
+    )
+    original_file_name = models.CharField(
+        max_length=255,
+        help_text="The original name of the file being uploaded."
+    )
+    content_type = models.CharField(
+        max_length=100,
+        blank=True,
+        help_text="MIME type reported by the client, used to tell audio from video."
+    )
+    title = models.CharField(
+        max_length=255,
+        blank=True,
+        help_text="Title for the session created on finalize."
+    )
+    processing_mode = models.CharField(
+        max_length=20,
+        choices=Session.PROCESSING_MODE_CHOICES,
+        default='LECTURE',
+        help_text="Processing mode for the session created on finalize."
+    )
+    upload_length = models.BigIntegerField(
+        help_text="Total size of the file in bytes, declared when the upload is created."
+    )
+    upload_offset = models.BigIntegerField(
+        default=0,
+        help_text="Number of bytes received so far; the next chunk must start here."
+    )
+    crc32 = models.BigIntegerField(
+        default=0,
+        help_text="Rolling CRC-32 of the bytes received so far."
+    )
+    lock_expires = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Set while a request is writing a chunk or finalizing; other requests get a conflict until then."
+    )
+    session = models.OneToOneField(
+        Session,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='resumable_upload',
+        help_text="The session created when the upload was finalized."
+    )
+    created_timestamp = models.DateTimeField(
+        auto_now_add=True,
+        help_text="When the upload was created."
+    )
+    updated_timestamp = models.DateTimeField(
+        auto_now=True,
+        help_text="When the last chunk was received."
+    )
+
+    @property
+    def is_complete(self):
+        return self.upload_offset >= self.upload_length
+
+    def __str__(self):
+        return f"Upload {self.id} of {self.original_file_name} ({self.upload_offset}/{self.upload_length} bytes)"
+
+    class Meta:
+        verbose_name = "Resumable Upload"
+        verbose_name_plural = "Resumable Uploads"
+
+
+class DispatchLock(models.Model):
+    """
+    Single row that lets one scheduler dispatcher run at a time across all workers (see scheduler.py).
+    """
+    locked_until = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Set while a dispatcher runs; lapses in case the worker running it dies."
+    )
+    dispatch_again = models.BooleanField(
+        default=False,
+        help_text="Set when a dispatch was requested while one was running, so it does another pass."
+    )
+
+    def __str__(self):
+        return f"Dispatch lock (held until {self.locked_until})" if self.locked_until else "Dispatch lock (free)"
+
+    class Meta:
+        verbose_name = "Dispatch Lock"
+        verbose_name_plural = "Dispatch Lock"
@@ -0,0 +1,127 @@
+# audio_processor/ollama_client.py
+
+import json
+import random
+import threading
+import time
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+
+class OllamaClient:
+    """
+    Shared client for Ollama's /api/generate endpoint.
+    Reuses pooled keep-alive connections, applies connect/read timeouts, retries 5xx and
+    connection errors with jittered exponential backoff, and caps in-flight generations
+    per process with a semaphore so workers can't overload the LLM host.
+    Failures surface as requests.exceptions.RequestException, like a plain requests.post would.
+    """
+
+    def __init__(self, base_url, model_name, connect_timeout=5, read_timeout=300,
+                 max_retries=3, retry_backoff=1.0, max_concurrent_requests=2, pool_size=10):
+        self.generate_url = f"{base_url.rstrip('/')}/api/generate"
+        self.model_name = model_name
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._slots = threading.BoundedSemaphore(max_concurrent_requests)
+
+        self._http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self._http.mount('http://', adapter)
+        self._http.mount('https://', adapter)
+
+    def _payload(self, prompt, model, stream, options):
+        payload = {
+            "model": model or self.model_name,
+            "prompt": prompt,
+            "stream": stream
+        }
+        if options:
+            payload["options"] = options
+        return payload
+
+    def _should_retry(self, error):
+        if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+            return True
+        response = getattr(error, 'response', None)
+        return response is not None and response.status_code >= 500
+
+    def _sleep_before_retry(self, attempt):
+        # Full jitter keeps retries from many workers from arriving at the LLM host in lockstep
+        delay = self.retry_backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+        time.sleep(delay)
+
+    def _post(self, payload, stream):
+        """
+        POSTs with retries and returns a response whose status has already been checked.
+        """
+        attempt = 0
+        while True:
+            try:
+                response = self._http.post(self.generate_url, json=payload, timeout=self.timeout, stream=stream)
+                response.raise_for_status()
+                return response
+            except requests.exceptions.RequestException as e:
+                if attempt >= self.max_retries or not self._should_retry(e):
+                    raise
+                print(f"Ollama request failed ({e}); retrying ({attempt + 1}/{self.max_retries}).")
+                self._sleep_before_retry(attempt)
+                attempt += 1
+
+    def generate(self, prompt, model=None, options=None):
+        """
+        Runs a non-streaming generation and returns the response text.
+        """
+        with self._slots:
+            response = self._post(self._payload(prompt, model, False, options), stream=False)
+            return response.json().get('response', '').strip()
+
+    def stream_generate(self, prompt, model=None, options=None):
+        """
+        Yields response tokens as Ollama produces them. Closing the generator early
+        (e.g. the HTTP client went away) closes the upstream connection, which stops generation.
+        The concurrency slot is held until the stream ends.
+        """
+        with self._slots:
+            response = self._post(self._payload(prompt, model, True, options), stream=True)
+            try:
+                # Ollama streams one JSON object per line (NDJSON)
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    chunk = json.loads(line)
+                    token = chunk.get('response', '')
+                    if token:
+                        yield token
+                    if chunk.get('done'):
+                        return
+            finally:
+                response.close()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_ollama_client():
+    """
+    Returns the process-wide Ollama client configured from settings.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OllamaClient(
+                    base_url=settings.OLLAMA_BASE_URL,
+                    model_name=settings.OLLAMA_MODEL_NAME,
+                    connect_timeout=settings.OLLAMA_CONNECT_TIMEOUT,
+                    read_timeout=settings.OLLAMA_READ_TIMEOUT,
+                    max_retries=settings.OLLAMA_MAX_RETRIES,
+                    retry_backoff=settings.OLLAMA_RETRY_BACKOFF,
+                    max_concurrent_requests=settings.OLLAMA_MAX_CONCURRENT_REQUESTS,
+                    pool_size=settings.OLLAMA_POOL_SIZE,
+                )
+    return _client
@@ -0,0 +1,16 @@
+# audio_processor/pagination.py
+
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class SessionCursorPagination(CursorPagination):
+    """
+    Newest-first cursor pagination for session lists.
+    Each page is an index range scan from the cursor position, so it costs the same no matter
+    how deep the user pages or how many sessions they have.
+    """
+    ordering = ('-upload_timestamp', '-id')
+    page_size = settings.SESSION_LIST_PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = settings.SESSION_LIST_MAX_PAGE_SIZE
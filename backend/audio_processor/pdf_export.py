@@ -0,0 +1,139 @@
+# audio_processor/pdf_export.py
+
+import hashlib
+import os
+import tempfile
+from datetime import timedelta
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import Q
+from django.template.loader import get_template
+from django.utils import timezone
+from xhtml2pdf import pisa
+
+from .models import AnalysisResult
+
+PDF_TEMPLATE_NAME = 'audio_processor/pdf_notes.html'
+PDF_TEMPLATE_VERSION = "pdf_notes_v1" # Bump when the PDF template changes so stored artifacts are re-rendered
+
+
+class PDFRenderError(Exception):
+    pass
+
+
+def session_pdf_title(session):
+    return session.title or session.original_file_name or f"Session {session.id}"
+
+
+def notes_pdf_hash(session, analysis):
+    """
+    Content hash of everything that ends up in the notes PDF. The stored artifact is keyed by it,
+    so regenerated analysis (or a renamed session) never serves a stale file.
+    """
+    hasher = hashlib.sha256()
+    for part in (
+        PDF_TEMPLATE_VERSION,
+        session_pdf_title(session),
+        analysis.processed_timestamp.isoformat() if analysis.processed_timestamp else '',
+        analysis.notes_text,
+        analysis.summary_text,
+        analysis.suggestions_resources_text,
+    ):
+        hasher.update((part or '').encode('utf-8'))
+        hasher.update(b'\x00')
+    return hasher.hexdigest()
+
+
+def notes_pdf_name(content_hash):
+    return f"{settings.PDF_EXPORT_DIR}/{content_hash[:2]}/{content_hash}.pdf"
+
+
+def stored_notes_pdf_path(content_hash):
+    """
+    Returns the filesystem path of the stored artifact, or None if it hasn't been rendered yet.
+    """
+    path = default_storage.path(notes_pdf_name(content_hash))
+    return path if os.path.exists(path) else None
+
+
+def claim_notes_pdf_render(analysis, content_hash):
+    """
+    Records that a background render of content_hash was requested, with a conditional update so
+    that concurrent downloads (in any web process) enqueue it once. False if it was already
+    requested within PDF_RENDER_LOCK_SECONDS.
+    """
+    now = timezone.now()
+    unclaimed = (
+        ~Q(pdf_render_hash=content_hash)
+        | Q(pdf_render_requested__isnull=True)
+        | Q(pdf_render_requested__lt=now - timedelta(seconds=settings.PDF_RENDER_LOCK_SECONDS))
+    )
+    return AnalysisResult.objects.filter(unclaimed, pk=analysis.pk).update(
+        pdf_render_hash=content_hash, pdf_render_requested=now
+    ) == 1
+
+
+def release_notes_pdf_render(analysis):
+    AnalysisResult.objects.filter(pk=analysis.pk).update(pdf_render_hash=None, pdf_render_requested=None)
+
+
+def _remove_artifact(content_hash):
+    # Identical content (e.g. deduplicated uploads) shares one artifact; keep it while still referenced
+    if not content_hash or AnalysisResult.objects.filter(pdf_content_hash=content_hash).exists():
+        return
+    path = default_storage.path(notes_pdf_name(content_hash))
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def invalidate_notes_pdf(analysis):
+    """
+    Forgets the session's rendered PDF (after its analysis was regenerated) and deletes the file.
+    """
+    previous_hash = analysis.pdf_content_hash
+    if not previous_hash:
+        return
+    AnalysisResult.objects.filter(pk=analysis.pk).update(pdf_content_hash=None)
+    analysis.pdf_content_hash = None
+    _remove_artifact(previous_hash)
+
+
+def render_notes_pdf(session):
+    """
+    Renders the session's notes PDF into storage unless an artifact for the current content
+    already exists, and records it on the AnalysisResult. Returns the content hash.
+    """
+    analysis = session.analysis_result
+    content_hash = notes_pdf_hash(session, analysis)
+
+    if stored_notes_pdf_path(content_hash) is None:
+        html = get_template(PDF_TEMPLATE_NAME).render({
+            'session_title': session_pdf_title(session),
+            'analysis': analysis,
+        })
+        result_file = BytesIO()
+        pisa_status = pisa.CreatePDF(html, dest=result_file, encoding="UTF-8")
+        if pisa_status.err:
+            raise PDFRenderError(f"xhtml2pdf reported {pisa_status.err} error(s) for session {session.id}.")
+
+        final_path = default_storage.path(notes_pdf_name(content_hash))
+        os.makedirs(os.path.dirname(final_path), exist_ok=True)
+        # Write next to the final location and rename, so readers never see a partial file
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(final_path), suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as temp_file:
+                temp_file.write(result_file.getvalue())
+            os.replace(temp_path, final_path)
+        except Exception:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    previous_hash = analysis.pdf_content_hash
+    if previous_hash != content_hash:
+        AnalysisResult.objects.filter(pk=analysis.pk).update(pdf_content_hash=content_hash)
+        analysis.pdf_content_hash = content_hash
+        _remove_artifact(previous_hash)
+    return content_hash
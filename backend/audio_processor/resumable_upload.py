@@ -0,0 +1,147 @@
+# audio_processor/resumable_upload.py
+
+import base64
+import binascii
+import hashlib
+import os
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .dedup import store_content_addressed
+from .models import ResumableUpload
+
+PARTIAL_UPLOAD_DIR = 'user_uploads/partial'
+READ_BLOCK_SIZE = 1024 * 1024 # Bytes read from the request and written to disk at a time
+
+# Per-chunk checksums accepted in the Upload-Checksum header ("<algorithm> <base64 digest>", as in tus)
+CHECKSUM_ALGORITHMS = {
+    'sha1': hashlib.sha1,
+    'sha256': hashlib.sha256,
+    'md5': hashlib.md5,
+}
+
+
+class ChunkError(Exception):
+    """
+    The chunk was rejected; nothing from it was kept. status_code is the HTTP status to answer with.
+    """
+
+    def __init__(self, message, status_code):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def partial_upload_path(upload):
+    # Kept under MEDIA_ROOT so the finished file can be renamed into content-addressed storage
+    return os.path.join(settings.MEDIA_ROOT, PARTIAL_UPLOAD_DIR, f"{upload.id}.part")
+
+
+def lock_upload(upload_id):
+    """
+    Claims the upload for one writer (a PATCH or the finalize) with a conditional update, so the
+    claim holds across web processes. False if another request holds it. The claim lapses after
+    RESUMABLE_UPLOAD_LOCK_SECONDS in case the process holding it dies mid-chunk.
+    """
+    now = timezone.now()
+    free = Q(lock_expires__isnull=True) | Q(lock_expires__lt=now)
+    expires = now + timedelta(seconds=settings.RESUMABLE_UPLOAD_LOCK_SECONDS)
+    return ResumableUpload.objects.filter(free, pk=upload_id).update(lock_expires=expires) == 1
+
+
+def unlock_upload(upload_id):
+    ResumableUpload.objects.filter(pk=upload_id).update(lock_expires=None)
+
+
+def parse_upload_checksum(header):
+    """
+    Parses 'sha256 <base64 digest>' into (hash constructor, digest bytes), or None when absent.
+    """
+    if not header:
+        return None
+    algorithm, _, encoded = header.strip().partition(' ')
+    if algorithm.lower() not in CHECKSUM_ALGORITHMS:
+        raise ChunkError(f"Unsupported checksum algorithm '{algorithm}'.", 400)
+    try:
+        return CHECKSUM_ALGORITHMS[algorithm.lower()], base64.b64decode(encoded.strip(), validate=True)
+    except (binascii.Error, ValueError):
+        raise ChunkError("Upload-Checksum digest must be base64.", 400)
+
+
+def append_chunk(upload, stream, content_length, checksum=None):
+    """
+    Streams one chunk from the request body to the partial file at upload.upload_offset, a block
+    at a time, updating the rolling CRC-32. Returns (new_offset, new_crc32).
+    If the connection drops mid-chunk, the bytes that did arrive are kept (as in tus) so the
+    client resumes after them; with a checksum the chunk is all-or-nothing instead, and a
+    rejected chunk is cut off again so the stored offset stays valid.
+    """
+    path = partial_upload_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    start = upload.upload_offset
+    crc = upload.crc32
+    chunk_hasher = checksum[0]() if checksum else None
+
+    with open(path, 'r+b' if os.path.exists(path) else 'w+b') as partial:
+        # Drop anything past the committed offset (e.g. from a worker killed mid-write)
+        partial.truncate(start)
+        partial.seek(start)
+        received = 0
+        try:
+            while received < content_length:
+                try:
+                    block = stream.read(min(READ_BLOCK_SIZE, content_length - received))
+                except OSError:
+                    block = b'' # Client went away (Django raises UnreadablePostError, an OSError)
+                if not block:
+                    break
+                partial.write(block)
+                crc = zlib.crc32(block, crc)
+                if chunk_hasher:
+                    chunk_hasher.update(block)
+                received += len(block)
+
+            if chunk_hasher:
+                if received < content_length:
+                    raise ChunkError("Request body ended before Content-Length bytes were received.", 400)
+                if chunk_hasher.digest() != checksum[1]:
+                    raise ChunkError("Chunk checksum mismatch.", 460) # tus: Checksum Mismatch
+            partial.flush()
+            os.fsync(partial.fileno())
+        except BaseException:
+            partial.truncate(start)
+            raise
+
+    return start + received, crc
+
+
+def finish_upload(upload):
+    """
+    Hashes the completed partial file (streamed, in blocks) and moves it into content-addressed
+    storage. Returns (content_hash, storage_name).
+    """
+    path = partial_upload_path(upload)
+    hasher = hashlib.sha256()
+    crc = 0
+    with open(path, 'rb') as partial:
+        while True:
+            block = partial.read(READ_BLOCK_SIZE)
+            if not block:
+                break
+            hasher.update(block)
+            crc = zlib.crc32(block, crc)
+    if crc != upload.crc32:
+        raise ChunkError("Stored file does not match the checksum of the received chunks.", 409)
+
+    content_hash = hasher.hexdigest()
+    extension = os.path.splitext(upload.original_file_name)[1].lower()
+    return content_hash, store_content_addressed(path, content_hash, extension)
+
+
+def discard_upload(upload):
+    path = partial_upload_path(upload)
+    if os.path.exists(path):
+        os.remove(path)
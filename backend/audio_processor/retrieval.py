@@ -0,0 +1,206 @@
+# audio_processor/retrieval.py
+
+import io
+import re
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+
+from .analysis import CHARS_PER_TOKEN
+from .models import TranscriptIndex
+
+# BM25 parameters (standard Okapi defaults)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+WORD_RE = re.compile(r"[a-z0-9']+")
+SENTENCE_RE = re.compile(r"[^.!?]+(?:[.!?]+|$)\s*")
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have he her his i if in into is it its me my no not
+of on or our she so that the their them then there these they this to was we were what when
+where which who why will with you your do does did can could would should about just than
+""".split())
+
+
+def tokenize(text):
+    return [w for w in WORD_RE.findall(text.lower()) if w not in STOPWORDS and len(w) > 1]
+
+
+def chunk_spans(text, max_tokens):
+    """
+    Splits text into consecutive (start, end) character spans of about max_tokens, breaking between sentences.
+    """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    spans = []
+    chunk_start = None
+    chunk_end = 0
+    for match in SENTENCE_RE.finditer(text):
+        if chunk_start is None:
+            chunk_start = match.start()
+        elif match.end() - chunk_start > max_chars:
+            spans.append((chunk_start, chunk_end))
+            chunk_start = match.start()
+        chunk_end = match.end()
+    if chunk_start is not None and chunk_end > chunk_start:
+        spans.append((chunk_start, chunk_end))
+    return spans
+
+
+class BM25Index:
+    """
+    Lexical BM25 index over chunks of one transcript.
+    Postings are kept in CSR form (term_ptr, post_doc, post_tf), and chunks are stored as
+    character spans into the transcript rather than copies of the text, so the serialized
+    index is a small fraction of the transcript size.
+    """
+
+    def __init__(self, terms, term_ptr, post_doc, post_tf, doc_len, spans):
+        self.terms = terms
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.term_ptr = term_ptr
+        self.post_doc = post_doc
+        self.post_tf = post_tf
+        self.doc_len = doc_len
+        self.spans = spans
+
+    @property
+    def chunk_count(self):
+        return len(self.spans)
+
+    @classmethod
+    def build(cls, text, chunk_tokens):
+        spans = chunk_spans(text, chunk_tokens)
+        postings = {} # term -> list of (doc, tf)
+        doc_len = np.zeros(len(spans), dtype=np.int32)
+        for doc, (start, end) in enumerate(spans):
+            counts = Counter(tokenize(text[start:end]))
+            doc_len[doc] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc, tf))
+
+        terms = sorted(postings)
+        term_ptr = np.zeros(len(terms) + 1, dtype=np.int32)
+        for i, term in enumerate(terms):
+            term_ptr[i + 1] = term_ptr[i] + len(postings[term])
+        post_doc = np.empty(term_ptr[-1], dtype=np.int32)
+        post_tf = np.empty(term_ptr[-1], dtype=np.uint16)
+        for i, term in enumerate(terms):
+            docs, tfs = zip(*postings[term])
+            post_doc[term_ptr[i]:term_ptr[i + 1]] = docs
+            post_tf[term_ptr[i]:term_ptr[i + 1]] = np.minimum(tfs, np.iinfo(np.uint16).max)
+
+        return cls(terms, term_ptr, post_doc, post_tf, doc_len, np.array(spans, dtype=np.int64).reshape(-1, 2))
+
+    def to_bytes(self):
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            terms=np.frombuffer("\n".join(self.terms).encode('utf-8'), dtype=np.uint8),
+            term_ptr=self.term_ptr,
+            post_doc=self.post_doc,
+            post_tf=self.post_tf,
+            doc_len=self.doc_len,
+            spans=self.spans,
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(bytes(data))) as arrays:
+            terms_blob = arrays['terms'].tobytes().decode('utf-8')
+            return cls(
+                terms_blob.split("\n") if terms_blob else [],
+                arrays['term_ptr'],
+                arrays['post_doc'],
+                arrays['post_tf'],
+                arrays['doc_len'],
+                arrays['spans'],
+            )
+
+    def score(self, query):
+        """
+        Returns the BM25 score of every chunk for the query.
+        """
+        n_docs = self.chunk_count
+        scores = np.zeros(n_docs, dtype=np.float32)
+        if n_docs == 0:
+            return scores
+        avg_len = max(float(self.doc_len.mean()), 1.0)
+        length_norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_len / avg_len)
+
+        for term in set(tokenize(query)):
+            term_id = self.term_ids.get(term)
+            if term_id is None:
+                continue
+            docs = self.post_doc[self.term_ptr[term_id]:self.term_ptr[term_id + 1]]
+            tf = self.post_tf[self.term_ptr[term_id]:self.term_ptr[term_id + 1]].astype(np.float32)
+            idf = np.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tf * (BM25_K1 + 1) / (tf + length_norm[docs])
+        return scores
+
+    def top_chunks(self, query, top_k):
+        """
+        Returns the ids of the best-scoring chunks (score > 0), best first.
+        """
+        scores = self.score(query)
+        if not scores.any():
+            return []
+        k = min(top_k, int(np.count_nonzero(scores)))
+        best = np.argpartition(-scores, k - 1)[:k]
+        return [int(i) for i in best[np.argsort(-scores[best])]]
+
+
+def pack_chunks(index, text, chunk_ids, max_tokens):
+    """
+    Packs the given chunks (best first) into max_tokens and returns them in transcript order,
+    joined with a marker where text was skipped.
+    """
+    budget_chars = max_tokens * CHARS_PER_TOKEN
+    chosen = []
+    used = 0
+    for chunk_id in chunk_ids:
+        start, end = index.spans[chunk_id]
+        if used + (end - start) > budget_chars:
+            continue
+        chosen.append(chunk_id)
+        used += end - start
+
+    return "\n[...]\n".join(
+        text[index.spans[chunk_id][0]:index.spans[chunk_id][1]].strip() for chunk_id in sorted(chosen)
+    )
+
+
+def build_transcript_index(session, transcription_text):
+    """
+    Builds and stores the retrieval index for a session's transcript.
+    """
+    index = BM25Index.build(transcription_text, settings.RETRIEVAL_CHUNK_TOKENS)
+    TranscriptIndex.objects.update_or_create(
+        session=session,
+        defaults={'data': index.to_bytes(), 'chunk_count': index.chunk_count}
+    )
+    return index
+
+
+def retrieve_transcript_context(session, question):
+    """
+    Returns the transcript excerpts most relevant to the question, packed into RETRIEVAL_CONTEXT_TOKENS,
+    or None when the whole transcript already fits the budget. The index is built on first use
+    for sessions that completed before indexing existed.
+    """
+    transcription_text = session.analysis_result.transcription_text
+    if len(transcription_text) <= settings.RETRIEVAL_CONTEXT_TOKENS * CHARS_PER_TOKEN:
+        return None
+
+    try:
+        index = BM25Index.from_bytes(session.transcript_index.data)
+    except TranscriptIndex.DoesNotExist:
+        index = build_transcript_index(session, transcription_text)
+
+    chunk_ids = index.top_chunks(question, settings.RETRIEVAL_TOP_K)
+    if not chunk_ids:
+        # Nothing matched lexically; fall back to the start of the transcript
+        chunk_ids = list(range(min(settings.RETRIEVAL_TOP_K, index.chunk_count)))
+    return pack_chunks(index, transcription_text, chunk_ids, settings.RETRIEVAL_CONTEXT_TOKENS)
@@ -0,0 +1,10 @@
+# audio_processor/routing.py
+
+from django.urls import path
+
+from .consumers import LiveTranscriptionConsumer, SessionStatusConsumer
+
+websocket_urlpatterns = [
+    path('ws/sessions/status/', SessionStatusConsumer.as_asgi()),
+    path('ws/sessions/<int:session_id>/live/', LiveTranscriptionConsumer.as_asgi()),
+]
@@ -0,0 +1,225 @@
+# audio_processor/scheduler.py
+
+import uuid
+from datetime import timedelta
+
+from celery import current_app
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import DispatchLock, Session
+
+# Sessions wait in the database (status PENDING, dispatched_timestamp empty) until the dispatcher
+# hands them to the Celery pipeline. Only SCHEDULER_MAX_TRANSCRIBING sessions are in the transcribe
+# stage at once, so the Celery queues stay short and the order in which sessions start is decided
+# here: shortest recordings first, with aging, and at most SCHEDULER_MAX_IN_FLIGHT_PER_USER per user.
+# With BATCH_TRANSCRIBE_ENABLED, short recordings are started in groups that share one transcription
+# (see batch_transcription.py). A group takes one slot, and all its sessions share the run id, which
+# is how slots are counted. A group that isn't full waits up to BATCH_TRANSCRIBE_WINDOW_SECONDS for
+# more short uploads.
+
+DISPATCH_TASK_NAME = 'audio_processor.tasks.dispatch_sessions_task'
+
+# A dispatched session in one of these statuses holds one of its user's slots
+IN_FLIGHT_STATUSES = ['PENDING', 'TRANSCRIBING', 'TRANSCRIBED', 'ANALYZING']
+# ... and in one of these, a transcription slot
+TRANSCRIBE_STATUSES = ['PENDING', 'TRANSCRIBING']
+
+
+def duration_lane(duration_seconds):
+    """
+    Priority lane by probed length, 0 for the shortest recordings. Unknown durations go in the middle lane.
+    """
+    bounds = settings.SCHEDULER_LANE_BOUNDS_SECONDS
+    if duration_seconds is None:
+        return len(bounds) // 2
+    for lane, bound in enumerate(bounds):
+        if duration_seconds <= bound:
+            return lane
+    return len(bounds)
+
+
+def effective_lane(duration_seconds, waited_seconds):
+    """
+    Every SCHEDULER_AGING_SECONDS spent waiting moves a session up one lane, so long recordings
+    reach the top lane eventually and can't be starved by a stream of short ones.
+    """
+    promoted = int(max(waited_seconds, 0) // settings.SCHEDULER_AGING_SECONDS)
+    return max(duration_lane(duration_seconds) - promoted, 0)
+
+
+def is_batchable(candidate):
+    """
+    Whether a waiting session can share a batched transcription: short, with a known duration,
+    not yet transcribed, and without a video track still to be stripped by the extract stage.
+    """
+    duration = candidate['duration_seconds']
+    return (
+        settings.BATCH_TRANSCRIBE_ENABLED
+        and duration is not None and duration <= settings.BATCH_TRANSCRIBE_MAX_SECONDS
+        and candidate['checkpoint'] in ('', 'EXTRACTED')
+        and not (candidate['file_type'] == 'VIDEO' and settings.INGEST_AUDIO_ONLY)
+    )
+
+
+def plan_dispatch(candidates, user_in_flight, free_slots, now, batch_size=1):
+    """
+    Picks the waiting sessions to start, in order: by effective lane, then by how long they have
+    waited. Users already at their in-flight cap are skipped (their sessions keep waiting).
+    candidates are dicts with id, user_id, duration_seconds, queued_at and optionally batchable.
+    Returns groups of session ids, each taking one slot: batchable sessions share a group of up
+    to batch_size, every other session gets its own.
+    """
+    per_user_cap = settings.SCHEDULER_MAX_IN_FLIGHT_PER_USER
+    ranked = sorted(candidates, key=lambda c: (
+        effective_lane(c['duration_seconds'], (now - c['queued_at']).total_seconds()),
+        c['queued_at'],
+        c['id'],
+    ))
+
+    in_flight = dict(user_in_flight)
+    groups = []
+    open_batch = None
+    for candidate in ranked:
+        if in_flight.get(candidate['user_id'], 0) >= per_user_cap:
+            continue
+        if batch_size > 1 and candidate.get('batchable'):
+            if open_batch is None or len(open_batch) >= batch_size:
+                if len(groups) >= free_slots:
+                    continue
+                open_batch = []
+                groups.append(open_batch)
+            open_batch.append(candidate['id'])
+        else:
+            if len(groups) >= free_slots:
+                # No slot left, but a batch that isn't full can still take short sessions
+                if open_batch is None or len(open_batch) >= batch_size:
+                    break
+                continue
+            groups.append([candidate['id']])
+        in_flight[candidate['user_id']] = in_flight.get(candidate['user_id'], 0) + 1
+    return groups
+
+
+def _dispatch_once(start_pipeline, start_batch=None):
+    now = timezone.now()
+    dispatched = Session.objects.filter(dispatched_timestamp__isnull=False).order_by()
+    # One slot per run: the sessions of a batch share theirs
+    busy = dispatched.aggregate(
+        n=Count('lease_owner', filter=Q(status__in=TRANSCRIBE_STATUSES), distinct=True)
+    )['n']
+    free_slots = settings.SCHEDULER_MAX_TRANSCRIBING - busy
+    if free_slots <= 0:
+        return 0
+    user_in_flight = dict(
+        dispatched.filter(status__in=IN_FLIGHT_STATUSES).values_list('user_id').annotate(n=Count('id'))
+    )
+
+    waiting = (
+        Session.objects.filter(status='PENDING', dispatched_timestamp__isnull=True)
+        .order_by('status_changed_timestamp', 'id')
+        .values(
+            'id', 'user_id', 'duration_seconds', 'checkpoint', 'file_type',
+            'status_changed_timestamp', 'upload_timestamp',
+        )
+        [:settings.SCHEDULER_CANDIDATE_LIMIT]
+    )
+    candidates = [
+        {**row, 'queued_at': row['status_changed_timestamp'] or row['upload_timestamp'], 'batchable': is_batchable(row)}
+        for row in waiting
+    ]
+    by_id = {c['id']: c for c in candidates}
+    batch_size = settings.BATCH_TRANSCRIBE_MAX_SESSIONS if start_batch else 1
+    batch_window = timedelta(seconds=settings.BATCH_TRANSCRIBE_WINDOW_SECONDS)
+
+    started = 0
+    retry_at = None
+    for group in plan_dispatch(candidates, user_in_flight, free_slots, now, batch_size):
+        if batch_size > 1 and by_id[group[0]]['batchable'] and len(group) < batch_size:
+            # Give more short uploads a moment to join, bounded by the window
+            window_ends = min(by_id[session_id]['queued_at'] for session_id in group) + batch_window
+            if window_ends > now:
+                retry_at = min(retry_at or window_ends, window_ends)
+                continue
+
+        # Conditional claim: a session retried or deleted meanwhile is left alone. The new run
+        # gets the lease (see leases.py) for as long as its first message may wait in the queue.
+        run_id = uuid.uuid4().hex
+        claimed = [
+            session_id for session_id in group
+            if Session.objects.filter(
+                pk=session_id, status='PENDING', dispatched_timestamp__isnull=True
+            ).update(
+                dispatched_timestamp=now,
+                lease_owner=run_id,
+                lease_expires=now + timedelta(seconds=settings.SESSION_LEASE_QUEUED_SECONDS),
+                processing_attempts=F('processing_attempts') + 1,
+            )
+        ]
+        if not claimed:
+            continue
+        try:
+            if len(claimed) > 1:
+                start_batch(claimed, run_id)
+            else:
+                start_pipeline(claimed[0], run_id)
+            started += len(claimed)
+        except Exception as e:
+            # Broker unavailable: put the sessions back so a later pass starts them
+            print(f"Could not start processing for session(s) {claimed}: {e}")
+            Session.objects.filter(pk__in=claimed, lease_owner=run_id).update(
+                dispatched_timestamp=None, lease_owner='', lease_expires=None,
+                processing_attempts=F('processing_attempts') - 1,
+            )
+            break
+
+    if retry_at is not None:
+        request_dispatch(countdown=max((retry_at - now).total_seconds(), 0))
+    return started
+
+
+def dispatch_pending_sessions(start_pipeline, start_batch=None):
+    """
+    Starts as many waiting sessions as there are free slots, calling start_pipeline(session_id, run_id)
+    for each, or start_batch(session_ids, run_id) for a group of short sessions transcribed
+    together (batching is off without it). One dispatcher runs at a time, holding the DispatchLock
+    row; a request arriving while it runs makes it do another pass instead of waiting for the lock.
+    Returns the number of sessions started.
+    """
+    now = timezone.now()
+    lock_until = now + timedelta(seconds=settings.SCHEDULER_DISPATCH_LOCK_SECONDS)
+    DispatchLock.objects.get_or_create(pk=1)
+    free = Q(locked_until__isnull=True) | Q(locked_until__lt=now)
+    if not DispatchLock.objects.filter(free, pk=1).update(locked_until=lock_until, dispatch_again=False):
+        DispatchLock.objects.filter(pk=1).update(dispatch_again=True)
+        return 0
+    started = 0
+    try:
+        while True:
+            started += _dispatch_once(start_pipeline, start_batch)
+            # Releases the lock unless a request arrived during the pass; that one gets another pass
+            if DispatchLock.objects.filter(pk=1, dispatch_again=False).update(locked_until=None):
+                break
+            lock_until = timezone.now() + timedelta(seconds=settings.SCHEDULER_DISPATCH_LOCK_SECONDS)
+            DispatchLock.objects.filter(pk=1).update(locked_until=lock_until, dispatch_again=False)
+    except BaseException:
+        DispatchLock.objects.filter(pk=1).update(locked_until=None)
+        raise
+    return started
+
+
+def request_dispatch(countdown=None):
+    """
+    Asks the dispatcher to run (after the current transaction commits, so it sees the change that
+    prompted it), optionally countdown seconds from now. Called on new uploads, retries, whenever
+    a session frees a slot, and when a batch's collection window ends.
+    """
+    def send():
+        try:
+            current_app.send_task(DISPATCH_TASK_NAME, countdown=countdown)
+        except Exception as e:
+            # The periodic dispatch picks the session up
+            print(f"Could not request session dispatch: {e}")
+    transaction.on_commit(send)
@@ -0,0 +1,360 @@
+# audio_processor/search.py
+
+import html
+import re
+
+from django.db import connection
+
+# Index over AnalysisResult text, kept in sync by database triggers (SQLite) or an expression index (PostgreSQL)
+ANALYSIS_TABLE = 'audio_processor_analysisresult'
+SESSION_TABLE = 'audio_processor_session'
+FTS_TABLE = 'audio_processor_analysis_fts'
+
+# (API name, AnalysisResult column, PostgreSQL weight)
+SEARCH_FIELDS = [
+    ('transcription', 'transcription_text', 'B'),
+    ('summary', 'summary_text', 'A'),
+    ('notes', 'notes_text', 'A'),
+    ('suggestions', 'suggestions_resources_text', 'C'),
+]
+COLUMNS = [column for _, column, _ in SEARCH_FIELDS]
+
+# Markers FTS5/ts_headline put around matches; control characters never appear in transcripts
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+ELLIPSIS = '…'
+SNIPPET_TOKENS = 16
+
+QUERY_WORD_RE = re.compile(r"\w+")
+
+PG_DOCUMENT = " || ".join(
+    f"setweight(to_tsvector('english', coalesce({column}, '')), '{weight}')" for _, column, weight in SEARCH_FIELDS
+)
+
+
+# --- Index creation (called from migrations) ---
+
+FTS_TRIGGER_SUFFIXES = ('ai', 'ad', 'au')
+
+
+def _sqlite_trigger_statements():
+    columns = ", ".join(COLUMNS)
+    new_values = ", ".join(f"new.{c}" for c in COLUMNS)
+    old_values = ", ".join(f"old.{c}" for c in COLUMNS)
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {ANALYSIS_TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {ANALYSIS_TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON {ANALYSIS_TABLE} BEGIN "
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {columns}) VALUES ('delete', old.id, {old_values}); "
+        f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {new_values}); END",
+    ]
+
+
+def create_search_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5({', '.join(COLUMNS)}, "
+            f"content='{ANALYSIS_TABLE}', content_rowid='id', tokenize='porter unicode61')"
+        )
+        for statement in _sqlite_trigger_statements():
+            schema_editor.execute(statement)
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')") # Index existing rows
+    elif vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE INDEX {FTS_TABLE}_gin ON {ANALYSIS_TABLE} USING GIN (({PG_DOCUMENT}))"
+        )
+
+
+def ensure_search_triggers(connection):
+    """
+    SQLite can't alter a column in place, so Django rebuilds the table for most AlterField/AddField
+    operations on AnalysisResult, and the copy loses the FTS triggers. Recreates any that are
+    missing and rebuilds the index, which has missed every change since. Returns True if it had to.
+    No-op elsewhere, and before the index exists.
+    """
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s",
+            [f"{FTS_TABLE}%"]
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+        if FTS_TABLE not in existing:
+            return False
+        if all(f"{FTS_TABLE}_{suffix}" in existing for suffix in FTS_TRIGGER_SUFFIXES):
+            return False
+        for statement in _sqlite_trigger_statements():
+            cursor.execute(statement)
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return True
+
+
+def drop_search_index(schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        for suffix in FTS_TRIGGER_SUFFIXES:
+            schema_editor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+        schema_editor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+    elif vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {FTS_TABLE}_gin")
+
+
+# --- Query helpers ---
+
+def _query_words(query):
+    return QUERY_WORD_RE.findall(query)
+
+
+def _fts5_query(query):
+    """
+    Turns free text into an FTS5 query: every word must match, the last one as a prefix.
+    Words are quoted so user input can't use FTS5 syntax.
+    """
+    words = _query_words(query)
+    if not words:
+        return None
+    quoted = [f'"{word}"' for word in words]
+    quoted[-1] += '*'
+    return " ".join(quoted)
+
+
+def _parse_snippet(marked):
+    """
+    Splits a snippet with match markers into (plain_text, [(start, end), ...]) for the highlighted parts.
+    """
+    plain = []
+    highlights = []
+    position = 0
+    start = None
+    for part in re.split(f"([{MATCH_START}{MATCH_END}])", marked):
+        if part == MATCH_START:
+            start = position
+        elif part == MATCH_END:
+            if start is not None:
+                highlights.append((start, position))
+            start = None
+        else:
+            plain.append(part)
+            position += len(part)
+    return "".join(plain), highlights
+
+
+def _snippet_html(plain, highlights):
+    parts = []
+    last = 0
+    for start, end in highlights:
+        parts.append(html.escape(plain[last:start]))
+        parts.append(f"<mark>{html.escape(plain[start:end])}</mark>")
+        last = end
+    parts.append(html.escape(plain[last:]))
+    return "".join(parts)
+
+
+def _build_snippet(field, marked, fragment_offset):
+    """
+    Builds the API representation of one matched field. fragment_offset is where the snippet
+    (without its ellipses) starts in the field, so highlights can be mapped to field offsets.
+    """
+    plain, highlights = _parse_snippet(marked)
+    leading = len(plain) - len(plain.lstrip(ELLIPSIS))
+    field_offsets = []
+    if fragment_offset is not None and fragment_offset >= 0:
+        field_offsets = [[fragment_offset + s - leading, fragment_offset + e - leading] for s, e in highlights]
+    return {
+        'field': field,
+        'snippet': plain,
+        'snippet_html': _snippet_html(plain, highlights),
+        'highlights': [[s, e] for s, e in highlights],
+        'offsets': field_offsets,
+    }
+
+
+def _fragment_sql(snippet_sql):
+    # The snippet without markers or ellipses is an exact substring of the field
+    return f"replace(replace(trim({snippet_sql}, '{ELLIPSIS}'), char(2), ''), char(3), '')"
+
+
+# --- SQLite (FTS5) ---
+
+def _sqlite_search(user_id, query, limit):
+    match = _fts5_query(query)
+    if not match:
+        return []
+    snippets = [
+        f"snippet({FTS_TABLE}, {i}, char(2), char(3), '{ELLIPSIS}', {SNIPPET_TOKENS})" for i in range(len(COLUMNS))
+    ]
+    # Rank first using only rowids, then build snippets for the page of hits
+    sql = f"""
+        WITH hits AS (
+            SELECT {FTS_TABLE}.rowid AS analysis_id, bm25({FTS_TABLE}, 1.0, 2.0, 2.0, 0.5) AS rank
+            FROM {FTS_TABLE}
+            JOIN {ANALYSIS_TABLE} a ON a.id = {FTS_TABLE}.rowid
+            JOIN {SESSION_TABLE} s ON s.id = a.session_id
+            WHERE {FTS_TABLE} MATCH %s AND s.user_id = %s
+            ORDER BY rank
+            LIMIT %s
+        )
+        SELECT a.session_id, hits.rank, {", ".join(snippets)},
+               {", ".join(f"instr(a.{column}, {_fragment_sql(snippet)}) - 1" for column, snippet in zip(COLUMNS, snippets))}
+        FROM hits
+        JOIN {FTS_TABLE} ON {FTS_TABLE}.rowid = hits.analysis_id
+        JOIN {ANALYSIS_TABLE} a ON a.id = hits.analysis_id
+        WHERE {FTS_TABLE} MATCH %s
+        ORDER BY hits.rank
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, user_id, limit, match])
+        rows = cursor.fetchall()
+
+    n = len(COLUMNS)
+    results = []
+    for row in rows:
+        session_id, rank = row[0], row[1]
+        marked, offsets = row[2:2 + n], row[2 + n:2 + 2 * n]
+        results.append({
+            'session_id': session_id,
+            'score': round(-rank, 4), # bm25() is lower-is-better
+            'snippets': [
+                _build_snippet(field, marked[i], offsets[i])
+                for i, (field, _, _) in enumerate(SEARCH_FIELDS) if MATCH_START in (marked[i] or '')
+            ],
+        })
+    return results
+
+
+def _sqlite_matching_fields(analysis_id, query):
+    match = _fts5_query(query)
+    if not match:
+        return set()
+    # A one-token snippet contains a marker only if that column matched
+    snippets = ", ".join(f"snippet({FTS_TABLE}, {i}, char(2), char(3), '', 1)" for i in range(len(COLUMNS)))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT {snippets} FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = %s",
+            [match, analysis_id]
+        )
+        row = cursor.fetchone()
+    if not row:
+        return set()
+    return {field for (field, _, _), marked in zip(SEARCH_FIELDS, row) if MATCH_START in (marked or '')}
+
+
+# --- PostgreSQL (tsvector) ---
+
+def _pg_search(user_id, query, limit):
+    if not _query_words(query):
+        return []
+    options = f"StartSel={MATCH_START}, StopSel={MATCH_END}, MaxFragments=1, MaxWords={SNIPPET_TOKENS}, MinWords=4, FragmentDelimiter={ELLIPSIS}"
+    headlines = [
+        f"ts_headline('english', coalesce(a.{column}, ''), q.query, '{options}')" for column in COLUMNS
+    ]
+    matches = [f"to_tsvector('english', coalesce(a.{column}, '')) @@ q.query" for column in COLUMNS]
+    # Rank first using the GIN index, then build headlines for the page of hits only
+    sql = f"""
+        WITH q AS (SELECT websearch_to_tsquery('english', %s) AS query),
+        hits AS (
+            SELECT a.id AS analysis_id, ts_rank({PG_DOCUMENT}, q.query) AS rank
+            FROM {ANALYSIS_TABLE} a
+            JOIN {SESSION_TABLE} s ON s.id = a.session_id
+            CROSS JOIN q
+            WHERE ({PG_DOCUMENT}) @@ q.query AND s.user_id = %s
+            ORDER BY rank DESC
+            LIMIT %s
+        )
+        SELECT a.session_id, hits.rank, {", ".join(matches)}, {", ".join(headlines)}
+        FROM hits
+        JOIN {ANALYSIS_TABLE} a ON a.id = hits.analysis_id
+        CROSS JOIN q
+        ORDER BY hits.rank DESC
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [query, user_id, limit])
+        rows = cursor.fetchall()
+        n = len(COLUMNS)
+        results = []
+        for row in rows:
+            session_id, rank = row[0], row[1]
+            matched, marked = row[2:2 + n], row[2 + n:2 + 2 * n]
+            snippets = []
+            for i, (field, column, _) in enumerate(SEARCH_FIELDS):
+                if not matched[i]:
+                    continue
+                fragment, _ = _parse_snippet(marked[i])
+                cursor.execute(
+                    f"SELECT strpos({column}, %s) - 1 FROM {ANALYSIS_TABLE} WHERE session_id = %s",
+                    [fragment, session_id]
+                )
+                snippets.append(_build_snippet(field, marked[i], cursor.fetchone()[0]))
+            results.append({'session_id': session_id, 'score': round(float(rank), 4), 'snippets': snippets})
+    return results
+
+
+def _pg_matching_fields(analysis_id, query):
+    if not _query_words(query):
+        return set()
+    matches = ", ".join(
+        f"to_tsvector('english', coalesce({column}, '')) @@ websearch_to_tsquery('english', %s)" for column in COLUMNS
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT {matches} FROM {ANALYSIS_TABLE} WHERE id = %s", [query] * len(COLUMNS) + [analysis_id])
+        row = cursor.fetchone()
+    if not row:
+        return set()
+    return {field for (field, _, _), matched in zip(SEARCH_FIELDS, row) if matched}
+
+
+# --- Other databases: case-insensitive substring scan ---
+
+def _scan_search(user_id, query, limit):
+    from django.db.models import Q
+    from .models import AnalysisResult
+
+    condition = Q()
+    for _, column, _ in SEARCH_FIELDS:
+        condition |= Q(**{f"{column}__icontains": query})
+    analyses = AnalysisResult.objects.filter(condition, session__user_id=user_id).order_by('-session__upload_timestamp')[:limit]
+    return [
+        {'session_id': analysis.session_id, 'score': None, 'snippets': []}
+        for analysis in analyses
+    ]
+
+
+def _scan_matching_fields(analysis_id, query):
+    from .models import AnalysisResult
+
+    analysis = AnalysisResult.objects.get(pk=analysis_id)
+    query_lower = query.lower()
+    return {
+        field for field, column, _ in SEARCH_FIELDS
+        if query_lower in (getattr(analysis, column) or '').lower()
+    }
+
+
+# --- Public API ---
+
+def search_sessions(user_id, query, limit=20):
+    """
+    Ranked full-text search over all of a user's analysed sessions.
+    Returns [{'session_id', 'score', 'snippets': [...]}], best first.
+    """
+    if connection.vendor == 'sqlite':
+        return _sqlite_search(user_id, query, limit)
+    if connection.vendor == 'postgresql':
+        return _pg_search(user_id, query, limit)
+    return _scan_search(user_id, query, limit)
+
+
+def matching_fields(analysis_id, query):
+    """
+    Returns the names of the fields ('transcription', 'summary', 'notes', 'suggestions')
+    of one AnalysisResult that match the query.
+    """
+    if connection.vendor == 'sqlite':
+        return _sqlite_matching_fields(analysis_id, query)
+    if connection.vendor == 'postgresql':
+        return _pg_matching_fields(analysis_id, query)
+    return _scan_matching_fields(analysis_id, query)
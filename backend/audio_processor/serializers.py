@@ -8,7 +8,8 @@ from .models import Session, AnalysisResult, Session # Import your models
 # audio_processor/serializers.py
 
 from rest_framework import serializers
-from .models import Session, AnalysisResult
+from .models import Session, AnalysisResult, TranscriptSegment
+from django.conf import settings
 from django.contrib.auth import get_user_model # Ensure CustomUser is accessible
 
 User = get_user_model() # Get your CustomUser model
@@ -26,6 +27,15 @@ class AnalysisResultSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ('__all__',)# Analysis results are read-only via API
 
+class TranscriptSegmentSerializer(serializers.ModelSerializer):
+    """
+    Serializer for a single timestamped transcript segment.
+    """
+    class Meta:
+        model = TranscriptSegment
+        fields = ['index', 'start', 'end', 'text', 'avg_logprob']
+        read_only_fields = fields
+
 class SessionSerializer(serializers.ModelSerializer):
     """
     Serializer for the Session model.
@@ -38,13 +48,35 @@ class SessionSerializer(serializers.ModelSerializer):
         model = Session
         fields = [
             'id', 'user', 'title', 'original_file_name', 'file_type',
-            'duration_seconds', 'upload_timestamp', 'processing_mode', 'status',
+            'duration_seconds', 'audio_codec', 'sample_rate', 'channels',
+            'upload_timestamp', 'processing_mode', 'status', 'checkpoint',
             'analysis_result' # Include the nested analysis result
         ]
-        read_only_fields = ['user', 'upload_timestamp', 'status', 'analysis_result']
+        read_only_fields = [
+            'user', 'file_type', 'duration_seconds', 'audio_codec', 'sample_rate', 'channels',
+            'upload_timestamp', 'status', 'checkpoint', 'analysis_result'
+        ]
 
  
 
+class SessionListSerializer(serializers.ModelSerializer):
+    """
+    Lightweight serializer for session lists: metadata plus a short summary preview,
+    without the nested analysis texts.
+    """
+    user = serializers.ReadOnlyField(source='user.username')
+    summary_preview = serializers.ReadOnlyField(source='analysis_result.summary_preview')
+
+    class Meta:
+        model = Session
+        fields = [
+            'id', 'user', 'title', 'original_file_name', 'file_type',
+            'duration_seconds', 'audio_codec', 'sample_rate', 'channels',
+            'upload_timestamp', 'processing_mode', 'status', 'checkpoint', 'summary_preview'
+        ]
+        read_only_fields = fields
+
+
 class FileUploadSerializer(serializers.Serializer):
     """
     Serializer specifically for validating file uploads.
@@ -67,3 +99,54 @@ class FileUploadSerializer(serializers.Serializer):
     # e.g., validators=[FileExtensionValidator(allowed_extensions=['mp3', 'wav', 'mp4'])]
     
     
+
+
+class LiveSessionCreateSerializer(serializers.Serializer):
+    """
+    Validates the metadata sent when starting a live (recorded while transcribing) session.
+    """
+    container = serializers.ChoiceField(
+        choices=['webm', 'ogg', 'mp4'],
+        default='webm',
+        help_text="Container the browser records into (MediaRecorder mimeType)."
+    )
+    processing_mode = serializers.ChoiceField(
+        choices=Session.PROCESSING_MODE_CHOICES,
+        default='LECTURE',
+        help_text="The mode for processing the session (e.g., 'LECTURE', 'MEETING')."
+    )
+    title = serializers.CharField(
+        max_length=255,
+        required=False,
+        allow_blank=True,
+        help_text="An optional title for the session."
+    )
+
+
+class ResumableUploadCreateSerializer(serializers.Serializer):
+    """
+    Validates the metadata sent when starting a resumable upload.
+    """
+    file_name = serializers.CharField(max_length=255, help_text="Name of the file being uploaded.")
+    file_size = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.RESUMABLE_UPLOAD_MAX_BYTES,
+        help_text="Total size of the file in bytes."
+    )
+    content_type = serializers.CharField(
+        max_length=100,
+        required=False,
+        allow_blank=True,
+        help_text="MIME type of the file (e.g. 'video/mp4')."
+    )
+    processing_mode = serializers.ChoiceField(
+        choices=Session.PROCESSING_MODE_CHOICES,
+        default='LECTURE',
+        help_text="The mode for processing the session (e.g., 'LECTURE', 'MEETING')."
+    )
+    title = serializers.CharField(
+        max_length=255,
+        required=False,
+        allow_blank=True,
+        help_text="An optional title for the session."
+    )
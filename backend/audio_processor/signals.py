@@ -0,0 +1,101 @@
+# audio_processor/signals.py
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Session, transcription_progress
+from .scheduler import IN_FLIGHT_STATUSES, request_dispatch
+from .stats import record_session_deleted, record_status_transition
+
+
+def session_status_group(user_id):
+    """
+    Channel-layer group that receives status changes for all of one user's sessions.
+    """
+    return f"session_status_user_{user_id}"
+
+
+def session_status_payload(session, transcribed_seconds=None):
+    return {
+        'id': session.id,
+        'status': session.status,
+        'title': session.title,
+        'original_file_name': session.original_file_name,
+        'duration_seconds': session.duration_seconds,
+        'transcription_progress': transcription_progress(session.duration_seconds, transcribed_seconds),
+    }
+
+
+def publish_session_status(user_id, payload):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    try:
+        async_to_sync(channel_layer.group_send)(
+            session_status_group(user_id),
+            {'type': 'session.status', 'session': payload}
+        )
+    except Exception as e:
+        # Push is best effort; clients fall back to polling the status endpoints
+        print(f"Failed to publish status for session {payload['id']}: {e}")
+
+
+def publish_transcription_progress(session, transcribed_seconds):
+    """
+    Pushes how far transcription has got, after each batch of segments is stored.
+    """
+    if not session.duration_seconds:
+        return
+    publish_session_status(session.user_id, session_status_payload(session, transcribed_seconds))
+
+
+@receiver(post_save, sender=Session)
+def broadcast_session_status(sender, instance, created, **kwargs):
+    """
+    Pushes every status transition (all the save(update_fields=['status']) calls) to connected clients.
+    """
+    if getattr(instance, '_status_transition', None) is None:
+        return
+    payload = session_status_payload(instance)
+    user_id = instance.user_id
+    # Publish only once the new status is visible to anyone who re-reads it
+    transaction.on_commit(lambda: publish_session_status(user_id, payload))
+
+
+@receiver(post_save, sender=Session)
+def release_scheduler_slot(sender, instance, created, **kwargs):
+    """
+    Leaving the transcribe stage frees a transcription slot, finishing frees one of the user's
+    slots; either way a waiting session may start now.
+    """
+    transition = getattr(instance, '_status_transition', None)
+    if transition is None or instance.status not in ('TRANSCRIBED', 'COMPLETED', 'FAILED'):
+        return
+    if transition[0] in IN_FLIGHT_STATUSES:
+        request_dispatch()
+
+
+@receiver(post_save, sender=Session)
+def update_session_stats(sender, instance, created, **kwargs):
+    transition = getattr(instance, '_status_transition', None)
+    if transition is None or not settings.SESSION_STATS_COUNTERS_ENABLED:
+        return
+    try:
+        record_status_transition(instance, *transition)
+    except Exception as e:
+        # Counters are rebuilt from the sessions table if they drift; never fail processing over them
+        print(f"Failed to update session stats for user {instance.user_id}: {e}")
+
+
+@receiver(post_delete, sender=Session)
+def update_session_stats_on_delete(sender, instance, **kwargs):
+    if not settings.SESSION_STATS_COUNTERS_ENABLED:
+        return
+    try:
+        record_session_deleted(instance)
+    except Exception as e:
+        print(f"Failed to update session stats for user {instance.user_id}: {e}")
@@ -0,0 +1,139 @@
+# audio_processor/stats.py
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models import Session, UserSessionStats
+
+STATUSES = [choice for choice, _ in Session.PROCESSING_STATUS_CHOICES]
+
+# Stages whose duration is tracked, keyed by the status a session is in during that stage
+TIMED_STAGES = {
+    'PENDING': 'queued',
+    'TRANSCRIBING': 'transcribing',
+    'ANALYZING': 'analyzing',
+}
+
+# Upper bounds (seconds) of the duration histogram buckets; a final bucket catches everything longer
+BUCKET_BOUNDS = [1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200]
+
+
+def bucket_for(seconds):
+    for i, bound in enumerate(BUCKET_BOUNDS):
+        if seconds <= bound:
+            return i
+    return len(BUCKET_BOUNDS)
+
+
+def histogram_percentile(buckets, count, q):
+    """
+    Estimates the q-th percentile from a duration histogram, interpolating within the bucket.
+    """
+    if not count:
+        return None
+    target = q * count
+    seen = 0
+    for i, bucket_count in enumerate(buckets):
+        if bucket_count and seen + bucket_count >= target:
+            lower = BUCKET_BOUNDS[i - 1] if i > 0 else 0
+            upper = BUCKET_BOUNDS[i] if i < len(BUCKET_BOUNDS) else BUCKET_BOUNDS[-1] * 2
+            return round(lower + (upper - lower) * (target - seen) / bucket_count, 1)
+        seen += bucket_count
+    return float(BUCKET_BOUNDS[-1])
+
+
+def summarize_stage_timings(stage_timings):
+    summary = {}
+    for stage in TIMED_STAGES.values():
+        timing = stage_timings.get(stage) or {}
+        count = timing.get('count', 0)
+        summary[stage] = {
+            'count': count,
+            'mean_seconds': round(timing['total_seconds'] / count, 1) if count else None,
+            'p95_seconds': histogram_percentile(timing.get('buckets', []), count, 0.95),
+        }
+    return summary
+
+
+def aggregate_user_stats(user_id):
+    """
+    Counts a user's sessions per status in one aggregate query.
+    """
+    counts = Session.objects.filter(user_id=user_id).aggregate(
+        **{status: Count('id', filter=Q(status=status)) for status in STATUSES}
+    )
+    return {status: count for status, count in counts.items() if count}
+
+
+def rebuild_user_stats(user_id):
+    """
+    Creates (or resets) the user's stats record from their sessions. Stage timings can't be
+    recovered from history, so existing ones are kept.
+    """
+    last_session = Session.objects.filter(user_id=user_id).order_by('-upload_timestamp').only('id').first()
+    stats, _ = UserSessionStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={'status_counts': aggregate_user_stats(user_id), 'last_session': last_session}
+    )
+    return stats
+
+
+def _locked_stats(user_id, create=True):
+    if create:
+        # Create the row before locking it. When two first transitions race, the loser's insert waits
+        # for the winner to commit and then finds its row, instead of both rebuilding from a table
+        # that is missing the other's session and the last write wiping out the other count.
+        _, created = UserSessionStats.objects.get_or_create(user_id=user_id)
+        if created:
+            # First transition for this user: counting from the table already includes this session
+            rebuild_user_stats(user_id)
+            return None
+    return UserSessionStats.objects.select_for_update().filter(user_id=user_id).first()
+
+
+def record_status_transition(session, previous_status, entered_at, now):
+    """
+    Applies one status transition to the user's counters and, when a timed stage ends
+    (other than by failing), records how long it took.
+    """
+    with transaction.atomic():
+        stats = _locked_stats(session.user_id)
+        if stats is None:
+            return
+
+        counts = stats.status_counts
+        if previous_status:
+            counts[previous_status] = max(counts.get(previous_status, 0) - 1, 0)
+        counts[session.status] = counts.get(session.status, 0) + 1
+
+        stage = TIMED_STAGES.get(previous_status)
+        if stage and entered_at and session.status != 'FAILED':
+            seconds = max((now - entered_at).total_seconds(), 0.0)
+            timing = stats.stage_timings.setdefault(stage, {'count': 0, 'total_seconds': 0.0, 'buckets': []})
+            buckets = timing['buckets'] + [0] * (len(BUCKET_BOUNDS) + 1 - len(timing['buckets']))
+            buckets[bucket_for(seconds)] += 1
+            timing.update(count=timing['count'] + 1, total_seconds=timing['total_seconds'] + seconds, buckets=buckets)
+
+        update_fields = ['status_counts', 'stage_timings', 'updated_timestamp']
+        if previous_status is None:
+            stats.last_session = session # Newly created, so the most recent upload
+            update_fields.append('last_session')
+        stats.save(update_fields=update_fields)
+
+
+def record_session_deleted(session):
+    with transaction.atomic():
+        # Never create a record here: the user itself may be in the middle of being deleted
+        stats = _locked_stats(session.user_id, create=False)
+        if stats is None:
+            return
+        counts = stats.status_counts
+        counts[session.status] = max(counts.get(session.status, 0) - 1, 0)
+        update_fields = ['status_counts', 'updated_timestamp']
+        if stats.last_session_id is None or stats.last_session_id == session.id:
+            stats.last_session = (
+                Session.objects.filter(user_id=session.user_id).exclude(pk=session.pk)
+                .order_by('-upload_timestamp').only('id').first()
+            )
+            update_fields.append('last_session')
+        stats.save(update_fields=update_fields)
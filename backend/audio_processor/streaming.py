@@ -0,0 +1,85 @@
+# audio_processor/streaming.py
+
+import asyncio
+import threading
+
+from asgiref.sync import sync_to_async
+
+# HTTP is served through Django's ASGI handler (see config/asgi.py). It consumes a synchronous
+# StreamingHttpResponse iterator with sync_to_async(list), i.e. the whole body is built before
+# the first byte is sent. Streaming views therefore hand StreamingHttpResponse an async iterator.
+
+_EXHAUSTED = object()
+
+
+def _next_item(iterator):
+    return next(iterator, _EXHAUSTED)
+
+
+def _close(iterator):
+    close = getattr(iterator, 'close', None)
+    if close is not None:
+        close()
+
+
+async def iterate_in_thread(iterable):
+    """
+    Yields the items of a blocking iterator, producing each one in the request's sync thread
+    (thread_sensitive), so iterators that read from the database keep using the connection and
+    cursor they started with. The iterator is closed when the response ends early.
+    """
+    iterator = iter(iterable)
+    try:
+        while True:
+            item = await sync_to_async(_next_item)(iterator)
+            if item is _EXHAUSTED:
+                return
+            yield item
+    finally:
+        await sync_to_async(_close)(iterator)
+
+
+async def stream_in_thread(iterable):
+    """
+    Runs a blocking iterator in a thread of its own and yields its items as they arrive, through
+    an asyncio queue, so a slow upstream stream (Ollama tokens) never holds up the event loop or
+    the request's sync thread. If the response ends early (a client disconnect cancels it), the
+    thread stops after its next item and closes the iterator, which closes the upstream request.
+    Exceptions raised by the iterator are raised here.
+    The iterator must not use the database: the thread has no request context.
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def hand_over(item, error=None):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, (item, error))
+        except RuntimeError:
+            stop.set() # The event loop is gone; nobody is listening any more
+
+    def produce():
+        iterator = iter(iterable)
+        error = None
+        try:
+            for item in iterator:
+                if stop.is_set():
+                    break
+                hand_over(item)
+        except Exception as e:
+            error = e
+        finally:
+            _close(iterator)
+            hand_over(_EXHAUSTED, error)
+
+    threading.Thread(target=produce, name="stream-in-thread", daemon=True).start()
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is _EXHAUSTED:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
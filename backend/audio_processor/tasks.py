@@ -1,159 +1,485 @@
 import os
-import subprocess
 import requests
 import json
-from celery import shared_task
+from contextlib import ExitStack
+from celery import chain, current_app, shared_task
+from celery.exceptions import Ignore
 from django.conf import settings
-from faster_whisper import WhisperModel
+from celery.signals import worker_process_init
 
-from .models import Session, AnalysisResult
+from .analysis import run_analysis, parse_analysis_output
+from .audio_decode import SAMPLE_RATE, decode_audio
+from .batch_transcription import transcribe_batch
+from .media_probe import MediaProbeError, extract_audio_track, probe_media
+from .leases import (
+    LeaseHeartbeat, LeaseLost, claim_stage, hand_off_lease, holds_lease, reap_expired_leases, release_lease
+)
+from .live_transcription import decode_live_audio, transcribe_live_window
+from .llm_cache import cached_generate, hash_inputs, make_cache_key
+from .models import Session, AnalysisResult, TranscriptSegment, store_transcript_segments
+from .ollama_client import get_ollama_client
+from .pdf_export import invalidate_notes_pdf, render_notes_pdf
+from .retrieval import build_transcript_index
+from .scheduler import dispatch_pending_sessions, request_dispatch
+from .signals import publish_transcription_progress
+from .transcription import iter_transcript_segments
+from .whisper_pool import get_whisper_model
 
 # --- Configuration ---
-WHISPER_MODEL_SIZE = "base"
-WHISPER_DEVICE = "cpu"
-WHISPER_COMPUTE_TYPE = "int8"
+PROMPT_TEMPLATE_VERSION = "lecture_v1.1" # Bump when the analysis prompts change so cached results aren't reused
 
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
-OLLAMA_MODEL_NAME = "deepseek-r1:1.5b"
+def worker_consumes_queue(queue_name):
+    # consume_from is None/empty when the worker wasn't started with -Q (it consumes every queue)
+    consume_from = current_app.amqp.queues.consume_from
+    return not consume_from or queue_name in consume_from
 
-# Load Whisper model
-try:
-    whisper_model = WhisperModel(WHISPER_MODEL_SIZE, device=WHISPER_DEVICE, compute_type=WHISPER_COMPUTE_TYPE)
-    print(f"Whisper model '{WHISPER_MODEL_SIZE}' loaded on {WHISPER_DEVICE} with {WHISPER_COMPUTE_TYPE} compute type.")
-except Exception as e:
-    print(f"Error loading Whisper model: {e}")
-    whisper_model = None
+# Load the default Whisper model when a worker process starts, so the first task doesn't pay for it.
+# Web processes import this module too, but never receive this signal; workers that only serve
+# the llm queue skip it.
+@worker_process_init.connect
+def preload_whisper_model(**kwargs):
+    if not settings.WHISPER_PRELOAD_ON_WORKER_INIT:
+        return
+    if not (worker_consumes_queue(settings.PIPELINE_TRANSCRIBE_QUEUE) or worker_consumes_queue(settings.PIPELINE_LIVE_QUEUE)):
+        return
+    try:
+        get_whisper_model()
+    except Exception as e:
+        print(f"Error preloading Whisper model: {e}")
+
+def _mark_failed(session, run_id):
+    # Only the run holding the lease may fail the session; a superseded run just stops
+    if session and holds_lease(session.id, run_id):
+        session.status = 'FAILED'
+        session.save(update_fields=['status'])
+        release_lease(session.id, run_id)
+
+def _skip_stage(session_id, run_id):
+    print(f"Session {session_id} is not leased to run {run_id}; skipping duplicate or superseded task.")
+    raise Ignore()
+
+def session_transcript_text(session):
+    texts = session.transcript_segments.order_by('index').values_list('text', flat=True)
+    return " ".join(texts.iterator()).strip()
+
+def transcribe_session(session, input_path, heartbeat=None):
+    """
+    Transcribes the session's media, writing TranscriptSegment rows in batches as Whisper produces them.
+    Segments stored by an earlier run that crashed are kept, and transcription resumes after the last one.
+    With a heartbeat, stops (LeaseLost) before writing a batch once the lease has been lost.
+    Returns the full transcript text.
+    """
+    last_segment = session.transcript_segments.order_by('-index').first()
+    next_index = last_segment.index + 1 if last_segment else 0
+    start_seconds = last_segment.end if last_segment else 0
+    if last_segment:
+        print(f"Resuming transcription for session {session.id} at {start_seconds:.1f}s (segment {next_index}).")
+
+    batch = []
+    for seg in iter_transcript_segments(input_path, start_seconds=start_seconds):
+        if not seg.text:
+            continue
+        batch.append(TranscriptSegment(
+            session=session,
+            index=next_index,
+            start=seg.start,
+            end=seg.end,
+            text=seg.text,
+            avg_logprob=seg.avg_logprob,
+        ))
+        next_index += 1
+        if len(batch) >= settings.TRANSCRIPT_SEGMENT_BATCH_SIZE:
+            if heartbeat:
+                heartbeat.check()
+            store_transcript_segments(session.id, batch)
+            publish_transcription_progress(session, batch[-1].end)
+            batch = []
+    if batch:
+        if heartbeat:
+            heartbeat.check()
+        store_transcript_segments(session.id, batch)
+
+    return session_transcript_text(session)
+
+def cached_ollama_generate(prompt, bypass_cache=False):
+    """
+    Ollama generation cached on (model, prompt template version, prompt hash).
+    Re-running analysis on an unchanged transcript, or on one whose chunks are partly unchanged, reuses answers.
+    """
+    model = settings.OLLAMA_MODEL_NAME
+    key = make_cache_key(model, PROMPT_TEMPLATE_VERSION, hash_inputs(prompt))
+    response, was_cached = cached_generate(lambda: get_ollama_client().generate(prompt), key, bypass=bypass_cache)
+    if was_cached:
+        print("LLM cache hit for analysis prompt.")
+    return response
+
+# --- Processing pipeline ---
+# Each stage is its own task and persists its output (the stored audio file, TranscriptSegment rows,
+# the AnalysisResult), so consecutive stages can run on different workers. CPU-bound stages are routed
+# to the transcribe queue and the LLM stage to the llm queue (see CELERY_TASK_ROUTES), so each kind of
+# worker can be sized and scaled on its own. A failed stage marks the session FAILED and raises Ignore,
+# which stops the rest of the chain.
+# Every stage belongs to one pipeline run (run_id) and only works while that run holds the session's
+# lease (see leases.py): duplicate messages and runs the reaper has replaced are no-ops.
 
 @shared_task
-def process_session_task(session_id):
+def extract_audio_task(session_id, run_id=None):
+    """
+    Stage 1 (transcribe queue): checks the upload is present, reduces video to its audio track
+    and fills in the duration.
+    """
+    if not claim_stage(session_id, run_id):
+        _skip_stage(session_id, run_id)
     session = None
-    output_audio_path = None
+    try:
+        with LeaseHeartbeat(session_id, run_id) as heartbeat:
+            session = Session.objects.get(id=session_id)
+            print(f"Starting processing for Session ID: {session_id} - Title: '{session.title}' (run {run_id})")
+
+            # --- 1. Set status ---
+            session.status = 'TRANSCRIBING'
+            session.save(update_fields=['status'])
+
+            original_file_path = session.file_path.path
+            if not os.path.exists(original_file_path):
+                raise FileNotFoundError(f"Original file not found: {original_file_path}")
 
+            # --- 2. Keep only the audio ---
+            # Video uploads are reduced to a compressed speech-quality audio track, so the video
+            # is decoded once here instead of on every (re)transcription, and isn't kept in storage.
+            if settings.INGEST_AUDIO_ONLY and session.file_type == 'VIDEO':
+                try:
+                    heartbeat.check()
+                    extract_audio_track(session)
+                    original_file_path = session.file_path.path
+                except LeaseLost:
+                    raise
+                except Exception as e:
+                    # Not fatal: transcribe from the original upload instead
+                    print(f"Audio extraction failed for session {session_id}, using the original file: {e}")
+            if session.duration_seconds is None:
+                # Uploaded before probing was added (or ffprobe couldn't tell); needed for progress reporting
+                try:
+                    session.duration_seconds = probe_media(original_file_path).duration
+                    session.save(update_fields=['duration_seconds'])
+                except MediaProbeError as e:
+                    print(f"Could not probe duration for session {session_id}: {e}")
+
+            session.checkpoint = 'EXTRACTED'
+            session.save(update_fields=['checkpoint'])
+        hand_off_lease(session_id, run_id)
+
+    except Session.DoesNotExist:
+        print(f"Session with ID {session_id} not found.")
+        raise Ignore()
+    except LeaseLost as e:
+        print(f"{e} Stopping.")
+        raise Ignore()
+    except Exception as e:
+        print(f"Error preparing media for session {session_id}: {e}")
+        _mark_failed(session, run_id)
+        raise Ignore()
+
+@shared_task
+def transcribe_session_task(session_id, run_id=None):
+    """
+    Stage 2 (transcribe queue): transcribes the stored audio into TranscriptSegment rows.
+    """
+    if not claim_stage(session_id, run_id):
+        _skip_stage(session_id, run_id)
+    session = None
     try:
-        session = Session.objects.get(id=session_id)
-        print(f"Starting processing for Session ID: {session_id} - Title: '{session.title}'")
+        with LeaseHeartbeat(session_id, run_id) as heartbeat:
+            session = Session.objects.get(id=session_id)
 
-        # --- 1. Set status ---
-        session.status = 'TRANSCRIBING'
-        session.save(update_fields=['status'])
+            # --- 3. Transcription ---
+            # Audio is decoded through a pipe and transcribed window by window while ffmpeg is
+            # still running; with TRANSCRIBE_PARALLEL_WORKERS > 1 windows are spread over a process pool.
+            # Segments are saved as they are produced so clients can show a partial transcript.
+            input_path = session.file_path.path
+            if not os.path.exists(input_path):
+                raise FileNotFoundError(f"Original file not found: {input_path}")
+            print(f"Starting transcription for session {session_id}...")
+            transcription_full_text = transcribe_session(session, input_path, heartbeat=heartbeat)
+            print(f"Transcription completed. Length: {len(transcription_full_text)} characters")
+            heartbeat.check()
+        hand_off_lease(session_id, run_id)
+
+        # The transcript is complete: a retry after an LLM failure starts from here
+        session.status = 'TRANSCRIBED'
+        session.checkpoint = 'TRANSCRIBED'
+        session.save(update_fields=['status', 'checkpoint'])
+
+    except Session.DoesNotExist:
+        print(f"Session with ID {session_id} not found.")
+        raise Ignore()
+    except LeaseLost as e:
+        print(f"{e} Stopping.")
+        raise Ignore()
+    except Exception as e:
+        print(f"Error transcribing session {session_id}: {e}")
+        _mark_failed(session, run_id)
+        raise Ignore()
 
-        original_file_path = session.file_path.path
-        if not os.path.exists(original_file_path):
-            raise FileNotFoundError(f"Original file not found: {original_file_path}")
+@shared_task
+def analyze_session_task(session_id, bypass_llm_cache=False, run_id=None):
+    """
+    Stage 3 (llm queue): analyses the stored transcript with the LLM, saves the AnalysisResult
+    and the Q&A index, and completes the session. If the LLM output was already stored by an
+    earlier run (checkpoint ANALYZED), only the steps after it are redone.
+    """
+    if not claim_stage(session_id, run_id):
+        _skip_stage(session_id, run_id)
+    session = None
+    try:
+        with LeaseHeartbeat(session_id, run_id) as heartbeat:
+            session = Session.objects.get(id=session_id)
+            session.status = 'ANALYZING'
+            session.save(update_fields=['status'])
+            analysis = AnalysisResult.objects.filter(session=session).first()
 
-        # --- 2. Extract Audio with FFmpeg ---
-        output_audio_name = f"temp_audio_{session.id}.wav"
-        output_audio_path = os.path.join(settings.MEDIA_ROOT, 'temp_audio', output_audio_name)
-        os.makedirs(os.path.dirname(output_audio_path), exist_ok=True)
+            if session.checkpoint == 'ANALYZED' and analysis is not None:
+                print(f"Session {session_id}: LLM output already stored, skipping the LLM call.")
+                transcription_full_text = analysis.transcription_text
+                notes_text = analysis.notes_text
+            else:
+                # Sessions analysed before transcripts were stored as segments only have the full text
+                transcription_full_text = session_transcript_text(session) or (analysis.transcription_text if analysis else '')
 
-        ffmpeg_command = [
-            "ffmpeg", "-y", "-i", original_file_path,
-            "-vn", "-acodec", "pcm_s16le", "-ar", "16000", "-ac", "1",
-            output_audio_path
-        ]
-        print(f"Running ffmpeg command: {' '.join(ffmpeg_command)}")
-        subprocess.run(ffmpeg_command, check=True)
+                # --- 4. Call LLM via Ollama ---
+                # Long transcripts are analysed in chunks and merged (map-reduce) so the prompt fits the model context.
+                print(f"Sending transcription to LLM for session {session_id}...")
+                llm_generated_text = run_analysis(
+                    transcription_full_text,
+                    lambda prompt: cached_ollama_generate(prompt, bypass_cache=bypass_llm_cache),
+                )
 
-        print(f"Audio extracted to: {output_audio_path}")
+                print(f"--- LLM Output START ---\n{llm_generated_text[:1000]}...\n--- END ---")
 
-        # --- 3. Transcription ---
-        if not whisper_model:
-            raise Exception("Whisper model not loaded. Cannot transcribe.")
+                # --- 5. Parse LLM Output ---
+                summary_text, notes_text, suggestions_text = parse_analysis_output(llm_generated_text)
 
-        print(f"Starting transcription for session {session_id}...")
-        segments, info = whisper_model.transcribe(output_audio_path, beam_size=5)
-        transcription_full_text = " ".join([seg.text for seg in segments]).strip()
-        print(f"Transcription completed. Length: {len(transcription_full_text)} characters")
+                # --- 6. Save Result (the analysis checkpoint) ---
+                heartbeat.check() # Never overwrite results after another run has taken over
+                analysis, created = AnalysisResult.objects.update_or_create(
+                    session=session,
+                    defaults={
+                        'transcription_text': transcription_full_text,
+                        'summary_text': summary_text,
+                        'notes_text': notes_text,
+                        'suggestions_resources_text': suggestions_text,
+                        'llm_raw_output': llm_generated_text,
+                        'llm_model_used': settings.OLLAMA_MODEL_NAME,
+                        'prompt_template_version': PROMPT_TEMPLATE_VERSION
+                    }
+                )
+                if not created:
+                    invalidate_notes_pdf(analysis) # Regenerated analysis: the stored PDF is stale
+                session.checkpoint = 'ANALYZED'
+                session.reanalyze_requested = False
+                session.save(update_fields=['checkpoint', 'reanalyze_requested'])
 
-        session.status = 'ANALYZING'
-        session.save(update_fields=['status'])
+            # --- 7. Build the Q&A retrieval index ---
+            build_transcript_index(session, transcription_full_text)
 
-        # --- 4. Prepare LLM Prompt ---
-        llm_prompt = f"""
-        You are DeepSeek, an advanced AI assistant skilled at analyzing lecture transcripts and extracting key information.
-        Given the following lecture transcription, perform these tasks:
-        1. Write a concise summary of the main ideas and themes.
-        2. Create detailed notes using bullet points or numbered lists, highlighting important concepts, definitions, and facts.
-        3. Suggest further study topics and recommend relevant resources (such as books, articles, or websites).
-
-        Please format your response using these clear sections:
-
-        ### SUMMARY
-        [Insert concise summary here]
-
-        ### DETAILED NOTES
-        [Insert detailed notes here, using bullet points or numbered lists]
-
-        ### SUGGESTIONS AND RESOURCES
-        [Insert suggestions and recommended resources here]
-
-        ---
-        LECTURE TRANSCRIPTION:
-        {transcription_full_text}
-        ---
-        """
-
-        # --- 5. Call LLM via Ollama ---
-        print(f"Sending transcription to LLM for session {session_id}...")
-        llm_response = requests.post(OLLAMA_API_URL, json={
-            "model": OLLAMA_MODEL_NAME,
-            "prompt": llm_prompt,
-            "stream": False
-        })
-        llm_response.raise_for_status()
-        llm_generated_text = llm_response.json().get('response', '').strip()
-
-        print(f"--- LLM Output START ---\n{llm_generated_text[:1000]}...\n--- END ---")
-
-        # --- 6. Parse LLM Output ---
-        summary_start = llm_generated_text.find("### SUMMARY")
-        notes_start = llm_generated_text.find("### DETAILED NOTES")
-        suggestions_start = llm_generated_text.find("### SUGGESTIONS AND RESOURCES")
-
-        summary_end = notes_start if notes_start != -1 else suggestions_start if suggestions_start != -1 else len(llm_generated_text)
-        notes_end = suggestions_start if suggestions_start != -1 else len(llm_generated_text)
-        suggestions_end = len(llm_generated_text)
-
-        summary_text = llm_generated_text[summary_start + len("### SUMMARY"):summary_end].strip() if summary_start != -1 else ""
-        notes_text = llm_generated_text[notes_start + len("### DETAILED NOTES"):notes_end].strip() if notes_start != -1 else ""
-        suggestions_text = llm_generated_text[suggestions_start + len("### SUGGESTIONS AND RESOURCES"):suggestions_end].strip() if suggestions_start != -1 else ""
-
-        if not any([summary_text, notes_text, suggestions_text]):
-            print("Warning: Failed to parse LLM output. Using full output as notes.")
-            notes_text = llm_generated_text
-
-        # --- 7. Save Result ---
-        AnalysisResult.objects.update_or_create(
-            session=session,
-            defaults={
-                'transcription_text': transcription_full_text,
-                'summary_text': summary_text,
-                'notes_text': notes_text,
-                'suggestions_resources_text': suggestions_text,
-                'llm_model_used': OLLAMA_MODEL_NAME,
-                'prompt_template_version': 'lecture_v1.0'
-            }
-        )
         session.status = 'COMPLETED'
         session.save(update_fields=['status'])
+        release_lease(session_id, run_id)
         print(f"Session {session_id} COMPLETED.")
 
+        # --- 8. Pre-render the notes PDF so the first download is served from storage ---
+        if notes_text:
+            try:
+                render_notes_pdf_task.delay(session_id)
+            except Exception as e:
+                # Not fatal: the PDF is rendered on first download instead
+                print(f"Could not enqueue PDF rendering for session {session_id}: {e}")
+
     except Session.DoesNotExist:
         print(f"Session with ID {session_id} not found.")
+        raise Ignore()
+    except LeaseLost as e:
+        print(f"{e} Stopping.")
+        raise Ignore()
     except requests.exceptions.RequestException as e:
         print(f"LLM API error: {e}")
-        if session:
-            session.status = 'FAILED'
-            session.save(update_fields=['status'])
+        _mark_failed(session, run_id)
+        raise Ignore()
     except Exception as e:
-        print(f"Error processing session: {e}")
-        if session:
-            session.status = 'FAILED'
-            session.save(update_fields=['status'])
-    finally:
-        if output_audio_path and os.path.exists(output_audio_path):
+        print(f"Error analysing session {session_id}: {e}")
+        _mark_failed(session, run_id)
+        raise Ignore()
+
+@shared_task
+def transcribe_batch_task(session_ids, run_id=None):
+    """
+    Stage 2 for a group of short sessions started together by the scheduler (transcribe queue):
+    transcribes them in one batched Whisper pass, stores each session's segments and sends each
+    on to its own analysis stage. The extract stage is skipped; batched sessions have no video
+    to strip. If the batched pass fails, each session falls back to the ordinary pipeline.
+    """
+    claimed = [session_id for session_id in session_ids if claim_stage(session_id, run_id)]
+    if not claimed:
+        _skip_stage(session_ids, run_id)
+
+    transcribed = []
+    with ExitStack() as stack:
+        heartbeats = {
+            session_id: stack.enter_context(LeaseHeartbeat(session_id, run_id)) for session_id in claimed
+        }
+
+        # --- 1. Decode every recording (one unreadable file only fails its own session) ---
+        sessions, audios, offsets, next_indexes = [], [], [], []
+        for session in Session.objects.filter(id__in=claimed):
             try:
-                os.remove(output_audio_path)
-                print(f"Cleaned up: {output_audio_path}")
-            except Exception as cleanup_error:
-                print(f"Failed to clean up audio file: {cleanup_error}")
+                session.status = 'TRANSCRIBING'
+                session.save(update_fields=['status'])
+                input_path = session.file_path.path
+                if not os.path.exists(input_path):
+                    raise FileNotFoundError(f"Original file not found: {input_path}")
+                # Resume after segments stored by an earlier run, as transcribe_session does
+                last_segment = session.transcript_segments.order_by('-index').first()
+                start_seconds = last_segment.end if last_segment else 0
+                audio = decode_audio(input_path, duration_hint=session.duration_seconds)
+                audios.append(audio[int(start_seconds * SAMPLE_RATE):])
+                offsets.append(start_seconds)
+                next_indexes.append(last_segment.index + 1 if last_segment else 0)
+                sessions.append(session)
+            except Exception as e:
+                print(f"Error preparing session {session.id} for batched transcription: {e}")
+                _mark_failed(session, run_id)
+
+        # --- 2. Transcribe them together ---
+        try:
+            print(f"Starting batched transcription of {len(sessions)} session(s) (run {run_id})...")
+            results = transcribe_batch(audios, offsets)
+        except Exception as e:
+            print(f"Batched transcription failed, transcribing the sessions one by one: {e}")
+            results = None
+
+        # --- 3. Scatter the segments back to their sessions ---
+        for session, segments, next_index in zip(sessions, results or [], next_indexes):
+            try:
+                heartbeats[session.id].check()
+                store_transcript_segments(session.id, (
+                    TranscriptSegment(
+                        session=session,
+                        index=next_index + i,
+                        start=seg.start,
+                        end=seg.end,
+                        text=seg.text,
+                        avg_logprob=seg.avg_logprob,
+                    )
+                    for i, seg in enumerate(segments)
+                ))
+                transcribed.append(session)
+            except LeaseLost as e:
+                print(f"{e} Dropping its batched transcript.")
+            except Exception as e:
+                print(f"Error storing batched transcript for session {session.id}: {e}")
+                _mark_failed(session, run_id)
+
+    # Heartbeats have stopped, so the hand-off leases aren't cut short again
+    if results is None:
+        for session in sessions:
+            if hand_off_lease(session.id, run_id):
+                session_pipeline(session.id, run_id, session.checkpoint, session.reanalyze_requested).apply_async()
+        return
+    for session in transcribed:
+        if not hand_off_lease(session.id, run_id):
+            continue
+        session.status = 'TRANSCRIBED'
+        session.checkpoint = 'TRANSCRIBED'
+        session.save(update_fields=['status', 'checkpoint'])
+        analyze_session_task.si(session.id, session.reanalyze_requested, run_id=run_id).apply_async()
+
+def session_pipeline(session_id, run_id, checkpoint='', bypass_llm_cache=False):
+    """
+    The processing chain for one pipeline run, starting at the first stage whose output isn't
+    stored yet. Signatures are immutable: every stage reads its input from the database, not
+    from the previous stage's return value.
+    """
+    stages = []
+    if not checkpoint:
+        stages.append(extract_audio_task.si(session_id, run_id=run_id))
+    if checkpoint in ('', 'EXTRACTED'):
+        stages.append(transcribe_session_task.si(session_id, run_id=run_id))
+    stages.append(analyze_session_task.si(session_id, bypass_llm_cache, run_id=run_id))
+    return chain(*stages)
+
+def start_session_pipeline(session_id, run_id):
+    """
+    Starts a run for a dispatched session, resuming after its checkpoint.
+    """
+    session = Session.objects.get(id=session_id)
+    if session.checkpoint in ('TRANSCRIBED', 'ANALYZED'):
+        print(f"Session {session_id} resumes at analysis (checkpoint {session.checkpoint}).")
+        # Only waits for the llm queue, so it shouldn't hold a transcription slot
+        session.status = 'TRANSCRIBED'
+        session.save(update_fields=['status'])
+    elif session.checkpoint:
+        print(f"Session {session_id} resumes at transcription (checkpoint {session.checkpoint}).")
+    return session_pipeline(session_id, run_id, session.checkpoint, session.reanalyze_requested).apply_async()
+
+def start_session_batch(session_ids, run_id):
+    """
+    Starts a run for a group of short sessions dispatched together (see BATCH_TRANSCRIBE_ENABLED).
+    """
+    print(f"Sessions {session_ids} are transcribed as one batch (run {run_id}).")
+    return transcribe_batch_task.si(session_ids, run_id=run_id).apply_async()
+
+@shared_task
+def dispatch_sessions_task():
+    """
+    Starts waiting sessions as slots free up, shortest first (see scheduler.py). Requested on every
+    upload, retry and slot release, and run periodically by celery beat.
+    """
+    started = dispatch_pending_sessions(start_session_pipeline, start_session_batch)
+    if started:
+        print(f"Scheduler started {started} session(s).")
+
+@shared_task
+def reap_expired_leases_task():
+    """
+    Re-queues sessions whose pipeline run stopped renewing its lease (run periodically by celery beat).
+    """
+    requeued, failed = reap_expired_leases()
+    if requeued or failed:
+        print(f"Lease reaper re-queued {requeued} and failed {failed} session(s).")
+
+@shared_task
+def process_session_task(session_id, bypass_llm_cache=False):
+    """
+    Hands a PENDING session to the scheduler. Kept so scripts and messages queued before the
+    staged pipeline still work; bypass_llm_cache becomes a requested re-analysis, so the
+    session's analysis skips the LLM cache as it used to.
+    """
+    waiting = Session.objects.filter(id=session_id, status='PENDING', dispatched_timestamp__isnull=True)
+    found = waiting.update(reanalyze_requested=True) if bypass_llm_cache else waiting.exists()
+    if not found:
+        print(f"Session {session_id} is not waiting to be processed; ignoring process_session_task.")
+        return
+    request_dispatch()
+
+@shared_task
+def render_notes_pdf_task(session_id):
+    """
+    Renders a completed session's notes PDF into storage (a no-op if the current content is already rendered).
+    """
+    try:
+        session = Session.objects.select_related('analysis_result').get(id=session_id)
+        content_hash = render_notes_pdf(session)
+        print(f"Notes PDF for session {session_id} ready ({content_hash[:12]}).")
+    except (Session.DoesNotExist, AnalysisResult.DoesNotExist):
+        print(f"Session {session_id} has no analysis to export.")
+    except Exception as e:
+        print(f"Error rendering notes PDF for session {session_id}: {e}")
+
+@shared_task
+def transcribe_live_window_task(audio_pcm, offset, initial_prompt=None, final=False):
+    """
+    One step of a live recording's sliding-window transcription (live queue), sent and awaited
+    by the WebSocket consumer through run_live_step. Returns ([segment fields], commit_until).
+    """
+    segments, commit_until = transcribe_live_window(decode_live_audio(audio_pcm), offset, initial_prompt, final)
+    return [list(seg) for seg in segments], commit_until
@@ -1,3 +1,989 @@
-from django.test import TestCase
+import asyncio
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import requests
+from asgiref.sync import sync_to_async
+from celery import current_app
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.files.storage import default_storage
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .audio_decode import iter_transcription_windows
+from .leases import claim_stage, hand_off_lease, reap_expired_leases, release_lease
+from .live_transcription import decode_live_audio, encode_live_audio, run_live_step
+from .llm_cache import cache_stats, cached_generate, hash_inputs, make_cache_key
+from .consumers import LiveTranscriptionConsumer
+from .media_probe import MediaInfo, MediaProbeError
+from .models import (
+    AnalysisResult, DispatchLock, ResumableUpload, Session, TranscriptIndex, TranscriptSegment, UserSessionStats,
+    store_transcript_segments,
+)
+from .resumable_upload import lock_upload, partial_upload_path
+from .retrieval import BM25Index, build_transcript_index, retrieve_transcript_context
+from .scheduler import dispatch_pending_sessions, plan_dispatch
+from .search import search_sessions
+from .streaming import iterate_in_thread, stream_in_thread
+from .tasks import (
+    PROMPT_TEMPLATE_VERSION, process_session_task, start_session_pipeline, transcribe_batch_task,
+    transcribe_live_window_task,
+)
+from .transcript_export import format_timestamp, parse_byte_range, slice_byte_stream
+from .transcription import TranscribedSegment, drop_overlapping_words
+from .views import start_session_processing
+
+
+def create_session(user, **fields):
+    fields.setdefault('title', 'Test session')
+    fields.setdefault('original_file_name', 'lecture.mp3')
+    return Session.objects.create(user=user, **fields)
+
+
+def use_temp_media_root(test):
+    media_root = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+    media_override = override_settings(MEDIA_ROOT=media_root)
+    media_override.enable()
+    test.addCleanup(media_override.disable)
+
+
+def auth_header(user):
+    return {'Authorization': f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+
+class SearchIndexTests(TestCase):
+    """
+    The FTS index is kept in sync by triggers that SQLite table rebuilds used to drop (see 0015).
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='alice', password='secret')
+        self.other_user = get_user_model().objects.create_user(username='bob', password='secret')
+
+    def test_new_analysis_is_found(self):
+        session = create_session(self.user, status='COMPLETED')
+        AnalysisResult.objects.create(session=session, transcription_text="Plants use chlorophyll to absorb light.")
+
+        results = search_sessions(self.user.id, 'chlorophyll')
+
+        self.assertEqual([r['session_id'] for r in results], [session.id])
+        self.assertEqual(results[0]['snippets'][0]['field'], 'transcription')
+
+    def test_updated_analysis_is_reindexed(self):
+        session = create_session(self.user, status='COMPLETED')
+        analysis = AnalysisResult.objects.create(session=session, summary_text="Cell division")
+        analysis.summary_text = "Photosynthesis and chlorophyll"
+        analysis.save()
+
+        self.assertEqual([r['session_id'] for r in search_sessions(self.user.id, 'chlorophyll')], [session.id])
+        self.assertEqual(search_sessions(self.user.id, 'division'), [])
+
+    def test_deleted_analysis_is_not_found(self):
+        session = create_session(self.user, status='COMPLETED')
+        AnalysisResult.objects.create(session=session, notes_text="chlorophyll")
+        session.delete()
+
+        self.assertEqual(search_sessions(self.user.id, 'chlorophyll'), [])
+
+    def test_other_users_sessions_are_not_searched(self):
+        session = create_session(self.other_user, status='COMPLETED')
+        AnalysisResult.objects.create(session=session, notes_text="chlorophyll")
+
+        self.assertEqual(search_sessions(self.user.id, 'chlorophyll'), [])
+
+
+class SessionStatusBatchViewTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='alice', password='secret')
+        other_user = get_user_model().objects.create_user(username='bob', password='secret')
+        self.session = create_session(self.user, status='PENDING', duration_seconds=100)
+        self.other_session = create_session(other_user, status='PENDING')
+        self.client.force_login(self.user)
+
+    def get(self, **headers):
+        ids = f"{self.session.id},{self.other_session.id}"
+        return self.client.get(reverse('session_status_batch'), {'ids': ids}, headers=headers)
+
+    def test_statuses_and_etag(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in response.json()['sessions']], [self.session.id])
+        self.assertEqual(response.json()['missing'], [self.other_session.id])
+
+        unchanged = self.get(**{'If-None-Match': response['ETag']})
+        self.assertEqual(unchanged.status_code, 304)
+        self.assertEqual(unchanged.content, b'')
+
+        self.session.status = 'TRANSCRIBING'
+        self.session.save()
+        changed = self.get(**{'If-None-Match': response['ETag']})
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+        # Stored segments move the progress (and the ETag) without touching the session row's timestamp
+        store_transcript_segments(self.session.id, [
+            TranscriptSegment(session=self.session, index=i, start=i * 10.0, end=i * 10.0 + 10, text="words")
+            for i in range(4)
+        ])
+        progressed = self.get(**{'If-None-Match': changed['ETag']})
+        self.assertEqual(progressed.status_code, 200)
+        self.assertEqual(progressed.json()['sessions'][0]['transcription_progress'], 0.4)
+
+
+class SessionsSearchViewTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='alice', password='secret')
+        self.client.force_login(self.user)
+        for i in range(3):
+            session = create_session(self.user, status='COMPLETED', title=f"Botany {i}")
+            AnalysisResult.objects.create(session=session, notes_text="chlorophyll and light")
+        self.url = reverse('sessions_search')
+
+    def test_limit(self):
+        response = self.client.get(self.url, {'q': 'chlorophyll', 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_large_limit_is_capped(self):
+        response = self.client.get(self.url, {'q': 'chlorophyll', 'limit': 10_000})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), 3)
+
+    def test_invalid_limit_is_rejected(self):
+        for limit in ('-1', '0', 'ten', '1.5'):
+            with self.subTest(limit=limit):
+                response = self.client.get(self.url, {'q': 'chlorophyll', 'limit': limit})
+                self.assertEqual(response.status_code, 400)
+
+
+@override_settings(SESSION_STATS_COUNTERS_ENABLED=True)
+class SessionStatsTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='alice', password='secret')
+        self.client.force_login(self.user)
+        self.now = timezone.now()
+        clock = mock.patch('django.utils.timezone.now', side_effect=lambda: self.now)
+        clock.start()
+        self.addCleanup(clock.stop)
+
+    def advance(self, session, seconds, status):
+        self.now += timedelta(seconds=seconds)
+        session.status = status
+        session.save(update_fields=['status'])
+
+    def test_transitions_update_counts_and_stage_timings(self):
+        session = create_session(self.user, status='PENDING')
+        latest = create_session(self.user, status='FAILED')
+        self.assertEqual(UserSessionStats.objects.get(user=self.user).status_counts, {'PENDING': 1, 'FAILED': 1})
+
+        self.advance(session, 15, 'TRANSCRIBING')
+        self.advance(session, 40, 'COMPLETED')
+
+        response = self.client.get(reverse('session_stats'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(
+            (data['total_sessions'], data['pending_sessions'], data['transcribing_sessions'], data['completed_sessions']),
+            (2, 0, 0, 1),
+        )
+        self.assertEqual(data['last_session']['id'], latest.id)
+        self.assertEqual(data['stage_timings'], {
+            'queued': {'count': 1, 'mean_seconds': 15.0, 'p95_seconds': 19.5}, # Interpolated in the 10-20 s bucket
+            'transcribing': {'count': 1, 'mean_seconds': 40.0, 'p95_seconds': 58.5},
+            'analyzing': {'count': 0, 'mean_seconds': None, 'p95_seconds': None},
+        })
+
+
+@override_settings(
+    SCHEDULER_LANE_BOUNDS_SECONDS=[600, 3600], SCHEDULER_AGING_SECONDS=900,
+    SCHEDULER_MAX_IN_FLIGHT_PER_USER=2, SCHEDULER_MAX_TRANSCRIBING=4,
+)
+class PlanDispatchTests(TestCase):
+
+    def setUp(self):
+        self.now = timezone.now()
+
+    def candidate(self, session_id, duration, waited=0, user_id=1, batchable=False):
+        return {
+            'id': session_id, 'user_id': user_id, 'duration_seconds': duration,
+            'queued_at': self.now - timedelta(seconds=waited), 'batchable': batchable,
+        }
+
+    def test_shortest_first(self):
+        candidates = [self.candidate(1, 5000), self.candidate(2, 60, user_id=2), self.candidate(3, 1200, user_id=3)]
+        self.assertEqual(plan_dispatch(candidates, {}, 4, self.now), [[2], [3], [1]])
+
+    def test_aging_promotes_long_recordings(self):
+        # Two aging steps take the long recording from the last lane to the first, ahead of the newer short one
+        candidates = [self.candidate(1, 60, waited=10, user_id=2), self.candidate(2, 5000, waited=1800)]
+        self.assertEqual(plan_dispatch(candidates, {}, 1, self.now), [[2]])
+        candidates[1]['queued_at'] = self.now - timedelta(seconds=899)
+        self.assertEqual(plan_dispatch(candidates, {}, 1, self.now), [[1]])
+
+    def test_per_user_cap(self):
+        candidates = [self.candidate(i, 60, waited=i) for i in range(1, 4)] + [self.candidate(4, 5000, user_id=2)]
+        self.assertEqual(plan_dispatch(candidates, {}, 4, self.now), [[3], [2], [4]])
+        self.assertEqual(plan_dispatch(candidates, {1: 2}, 4, self.now), [[4]])
+
+    def test_short_sessions_share_a_batch(self):
+        candidates = [self.candidate(i, 60, waited=10 - i, user_id=i, batchable=True) for i in range(1, 4)]
+        candidates.append(self.candidate(4, 5000, user_id=4))
+        self.assertEqual(plan_dispatch(candidates, {}, 1, self.now, batch_size=2), [[1, 2]])
+        self.assertEqual(plan_dispatch(candidates, {}, 3, self.now, batch_size=2), [[1, 2], [3], [4]])
+
+
+@override_settings(SCHEDULER_MAX_IN_FLIGHT_PER_USER=2, SCHEDULER_MAX_TRANSCRIBING=4, BATCH_TRANSCRIBE_ENABLED=False)
+class DispatchPendingSessionsTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='alice', password='secret')
+        self.other_user = get_user_model().objects.create_user(username='bob', password='secret')
+        self.started = []
+
+    def start_pipeline(self, session_id, run_id):
+        self.started.append(session_id)
+
+    def test_starts_waiting_sessions_within_the_caps(self):
+        mine = [create_session(self.user, status='PENDING', duration_seconds=60) for _ in range(3)]
+        theirs = create_session(self.other_user, status='PENDING', duration_seconds=60)
+
+        self.assertEqual(dispatch_pending_sessions(self.start_pipeline), 3)
+        self.assertEqual(sorted(self.started), [mine[0].id, mine[1].id, theirs.id])
+        session = Session.objects.get(pk=mine[0].id)
+        self.assertIsNotNone(session.dispatched_timestamp)
+        self.assertTrue(session.lease_owner)
+        self.assertEqual(session.processing_attempts, 1)
+        self.assertIsNone(DispatchLock.objects.get().locked_until)
+
+    def test_running_dispatcher_is_asked_for_another_pass(self):
+        create_session(self.user, status='PENDING', duration_seconds=60)
+        DispatchLock.objects.create(pk=1, locked_until=timezone.now() + timedelta(seconds=60))
+
+        self.assertEqual(dispatch_pending_sessions(self.start_pipeline), 0)
+        self.assertEqual(self.started, [])
+        self.assertTrue(DispatchLock.objects.get().dispatch_again)
+
+        # A lock left by a dispatcher that died lapses
+        DispatchLock.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(dispatch_pending_sessions(self.start_pipeline), 1)
+
+    def test_request_during_a_pass_gets_its_own_pass(self):
+        first = create_session(self.user, status='PENDING', duration_seconds=60)
+
+        def start_pipeline(session_id, run_id):
+            self.start_pipeline(session_id, run_id)
+            if session_id == first.id:
+                # Another upload arrives while the dispatcher is running
+                self.late = create_session(self.other_user, status='PENDING', duration_seconds=60)
+                self.assertEqual(dispatch_pending_sessions(self.start_pipeline), 0)
+
+        self.assertEqual(dispatch_pending_sessions(start_pipeline), 2)
+        self.assertEqual(self.started, [first.id, self.late.id])
+        self.assertIsNone(DispatchLock.objects.get().locked_until)
+
+
+class TranscribeBatchTaskTests(TestCase):
+
+    def setUp(self):
+        use_temp_media_root(self)
+        self.user = get_user_model().objects.create_user(username='alice', password='secret')
+        default_storage.save('user_uploads/lecture.mp3', io.BytesIO(b'audio'))
+        self.sessions = [
+            create_session(
+                self.user, status='PENDING', file_path='user_uploads/lecture.mp3', duration_seconds=60,
+                dispatched_timestamp=timezone.now(), lease_owner='run1', reanalyze_requested=reanalyze,
+            )
+            for reanalyze in (False, True)
+        ]
+
+    def test_failed_batch_falls_back_to_the_ordinary_pipeline(self):
+        with mock.patch('audio_processor.tasks.decode_audio', return_value=np.zeros(16000, dtype=np.float32)), \
+                mock.patch('audio_processor.tasks.transcribe_batch', side_effect=RuntimeError("out of memory")), \
+                mock.patch('audio_processor.tasks.session_pipeline') as session_pipeline:
+            transcribe_batch_task([session.id for session in self.sessions], run_id='run1')
+
+        self.assertEqual(sorted(session_pipeline.call_args_list), [
+            mock.call(self.sessions[0].id, 'run1', '', False),
+            # A requested re-analysis still skips the LLM cache
+            mock.call(self.sessions[1].id, 'run1', '', True),
+        ])
+
+
+class ProcessSessionTaskTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='alice', password='secret')
+
+    def run_task(self, session, **options):
+        with mock.patch('audio_processor.tasks.request_dispatch') as request_dispatch:
+            process_session_task(session.id, **options)
+        session.refresh_from_db()
+        return request_dispatch
+
+    def test_bypass_is_kept_as_a_requested_reanalysis(self):
+        session = create_session(self.user, status='PENDING')
+        self.run_task(session, bypass_llm_cache=True).assert_called_once()
+        self.assertTrue(session.reanalyze_requested)
+
+    def test_session_that_is_not_waiting_is_left_alone(self):
+        session = create_session(self.user, status='COMPLETED')
+        self.run_task(session, bypass_llm_cache=True).assert_not_called()
+        self.assertFalse(session.reanalyze_requested)
+
+
+@override_settings(SESSION_PROCESSING_MAX_ATTEMPTS=3)
+class LeaseTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='alice', password='secret')
+
+    def leased_session(self, expires_in, attempts=1):
+        return create_session(
+            self.user, status='TRANSCRIBING', dispatched_timestamp=timezone.now(), lease_owner='run1',
+            lease_expires=timezone.now() + timedelta(seconds=expires_in), processing_attempts=attempts,
+        )
+
+    def test_only_the_owning_run_holds_the_lease(self):
+        session = self.leased_session(60)
+        self.assertTrue(claim_stage(session.id, 'run1'))
+        self.assertFalse(claim_stage(session.id, 'run2')) # A duplicate or superseded message
+        self.assertFalse(claim_stage(session.id, None))
+        self.assertTrue(hand_off_lease(session.id, 'run1'))
+        self.assertTrue(release_lease(session.id, 'run1'))
+        self.assertFalse(claim_stage(session.id, 'run1'))
+
+    def test_expired_leases_are_requeued_or_failed(self):
+        running = self.leased_session(60)
+        expired = self.leased_session(-1)
+        exhausted = self.leased_session(-1, attempts=3)
+
+        self.assertEqual(reap_expired_leases(), (1, 1))
+        running.refresh_from_db()
+        expired.refresh_from_db()
+        exhausted.refresh_from_db()
+        self.assertEqual((running.status, running.lease_owner), ('TRANSCRIBING', 'run1'))
+        self.assertEqual((expired.status, expired.lease_owner, expired.dispatched_timestamp), ('PENDING', '', None))
+        self.assertEqual(exhausted.status, 'FAILED')
+        self.assertFalse(claim_stage(expired.id, 'run1')) # The old run stops at its next stage
+
+
+@override_settings(BATCH_TRANSCRIBE_ENABLED=False)
+class SessionRetryViewTests(TestCase):
+    """
+    Retries resume at the first stage whose output isn't stored. Dispatched runs execute their
+    stage chain in-process (task_always_eager), with transcription and the LLM mocked.
+    """
+    LLM_OUTPUT = "### SUMMARY\nPhotosynthesis.\n### DETAILED NOTES\nLight reactions."
+
+    def setUp(self):
+        use_temp_media_root(self)
+        self.user = get_user_model().objects.create_user(username='alice', password='secret')
+        self.auth = auth_header(self.user)
+        default_storage.save('user_uploads/lecture.mp3', io.BytesIO(b'audio'))
+        self.session = create_session(self.user, status='PENDING', file_path='user_uploads/lecture.mp3', duration_seconds=60)
+        self.url = reverse('session_retry', args=[self.session.id])
+
+        current_app.conf.task_always_eager = True
+        self.addCleanup(setattr, current_app.conf, 'task_always_eager', False)
+        self.transcribe = self.patch('audio_processor.tasks.transcribe_session', side_effect=self.fake_transcribe)
+        self.generate = self.patch('audio_processor.tasks.cached_ollama_generate', return_value=self.LLM_OUTPUT)
+        self.patch('audio_processor.tasks.render_notes_pdf_task')
+
+    def patch(self, target, **options):
+        patcher = mock.patch(target, **options)
+        self.addCleanup(patcher.stop)
+        return patcher.start()
+
+    def fake_transcribe(self, session, input_path, heartbeat=None):
+        store_transcript_segments(session.id, [
+            TranscriptSegment(session=session, index=0, start=0, end=60, text="Plants absorb light."),
+        ])
+        return "Plants absorb light."
+
+    def run_dispatched(self):
+        dispatch_pending_sessions(start_session_pipeline)
+        self.session.refresh_from_db()
+
+    def test_llm_failure_resumes_at_analysis(self):
+        self.generate.side_effect = requests.ConnectionError("Ollama is down")
+        self.run_dispatched()
+        self.assertEqual((self.session.status, self.session.checkpoint), ('FAILED', 'TRANSCRIBED'))
+
+        response = self.client.post(self.url, headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['checkpoint'], 'TRANSCRIBED')
+
+        self.generate.side_effect = None
+        self.run_dispatched()
+        self.assertEqual((self.session.status, self.session.checkpoint), ('COMPLETED', 'ANALYZED'))
+        self.transcribe.assert_called_once() # Only by the first run
+        self.assertEqual(self.generate.call_args.kwargs, {'bypass_cache': False})
+        self.assertEqual(self.session.analysis_result.summary_text, "Photosynthesis.")
+
+    def test_reanalyze_only_runs_the_analysis_without_the_cache(self):
+        self.run_dispatched()
+        self.assertEqual(self.session.status, 'COMPLETED')
+        self.transcribe.reset_mock()
+        self.generate.reset_mock()
+        self.generate.return_value = "### SUMMARY\nChlorophyll."
+
+        response = self.client.post(self.url, {'reanalyze': True}, content_type='application/json', headers=self.auth)
+        self.assertEqual(response.status_code, 200)
+        self.session.refresh_from_db()
+        self.assertTrue(self.session.reanalyze_requested)
+
+        self.run_dispatched()
+        self.assertEqual((self.session.status, self.session.checkpoint), ('COMPLETED', 'ANALYZED'))
+        self.assertFalse(self.session.reanalyze_requested)
+        self.transcribe.assert_not_called()
+        self.generate.assert_called_once()
+        self.assertEqual(self.generate.call_args.kwargs, {'bypass_cache': True})
+        self.assertEqual(self.session.analysis_result.summary_text, "Chlorophyll.")
+        self.assertEqual(self.session.transcript_segments.count(), 1)
+
+    def test_live_lease_is_a_conflict(self):
+        lease_expires = timezone.now() + timedelta(minutes=5)
+        Session.objects.filter(pk=self.session.pk).update(
+            status='TRANSCRIBING', dispatched_timestamp=timezone.now(), lease_owner='run1', lease_expires=lease_expires,
+        )
+
+        response = self.client.post(self.url, headers=self.auth)
+
+        self.assertEqual(response.status_code, 409)
+        self.session.refresh_from_db()
+        self.assertEqual((self.session.status, self.session.lease_owner), ('TRANSCRIBING', 'run1'))
+
+
+class TranscriptionWindowTests(TestCase):
+
+    def segment(self, text, start=0.0):
+        return TranscribedSegment(start, start + 1, text, -0.1)
+
+    def test_drop_overlapping_words(self):
+        previous = [self.segment("we measure the light"), self.segment("that plants absorb.")]
+        following = [self.segment("Plants absorb", 5), self.segment("mostly red light", 6)]
+        self.assertEqual(
+            [seg.text for seg in drop_overlapping_words(previous, following)], ["mostly red light"]
+        )
+        partly = [self.segment("plants absorb mostly red", 5)]
+        self.assertEqual([seg.text for seg in drop_overlapping_words(previous, partly)], ["mostly red"])
+        # One repeated word is too likely to be a coincidence
+        self.assertEqual(drop_overlapping_words(previous, [self.segment("absorb it")]), [self.segment("absorb it")])
+
+    def windows(self, audio, **options):
+        blocks = np.array_split(audio, 37)
+        return list(iter_transcription_windows(
+            blocks, window_seconds=10, search_seconds=2, sample_rate=100, **options
+        ))
+
+    def test_windows_cover_the_audio_once(self):
+        rng = np.random.default_rng(0)
+        audio = rng.uniform(-1, 1, 4500).astype(np.float32) # 45 s at 100 Hz
+        audio[1050:1070] = 0 # A pause to cut at, just after the first 10 s
+        windows = self.windows(audio, start_seconds=60)
+
+        self.assertEqual(windows[0][0], 60)
+        self.assertEqual(len(windows[0][1]), 1055) # Cut in the middle of the first quiet frame
+        self.assertTrue(np.array_equal(np.concatenate([window for _, window in windows]), audio))
+        for (offset, window), (next_offset, _) in zip(windows, windows[1:]):
+            self.assertAlmostEqual(next_offset, offset + len(window) / 100)
+
+    def test_overlapping_windows(self):
+        audio = np.random.default_rng(1).uniform(-1, 1, 4500).astype(np.float32)
+        windows = self.windows(audio, overlap_seconds=1)
+        for (offset, window), (next_offset, next_window) in zip(windows, windows[1:]):
+            start = int(round((next_offset - offset) * 100))
+            self.assertEqual(len(window) - start, 100) # The next window repeats the last second
+            self.assertTrue(np.array_equal(window[start:], next_window[:100]))
+        end = int(round(windows[-1][0] * 100)) + len(windows[-1][1])
+        self.assertEqual(end, len(audio))
+
+
+@override_settings(RETRIEVAL_CHUNK_TOKENS=20, RETRIEVAL_TOP_K=2, RETRIEVAL_CONTEXT_TOKENS=30)
+class TranscriptRetrievalTests(TestCase):
+
+    TOPICS = ["chlorophyll absorbs red light", "mitochondria produce energy", "ribosomes build proteins"]
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='alice', password='secret')
+        self.text = " ".join(f"Today we discuss how {topic} in the cell. This is lesson {i}." for i, topic in enumerate(self.TOPICS * 4))
+
+    def test_index_survives_serialization(self):
+        index = BM25Index.build(self.text, 20)
+        loaded = BM25Index.from_bytes(index.to_bytes())
+
+        self.assertEqual(loaded.chunk_count, index.chunk_count)
+        self.assertGreater(index.chunk_count, 3)
+        self.assertTrue(np.allclose(loaded.score("ribosomes proteins"), index.score("ribosomes proteins")))
+        for chunk_id in loaded.top_chunks("ribosomes proteins", 3):
+            start, end = loaded.spans[chunk_id]
+            self.assertIn("ribosomes", self.text[start:end])
+        self.assertEqual(loaded.top_chunks("photosynthesis", 3), [])
+
+    def test_context_is_built_from_matching_chunks(self):
+        session = create_session(self.user, status='COMPLETED')
+        AnalysisResult.objects.create(session=session, transcription_text=self.text)
+        session = Session.objects.select_related('analysis_result').get(pk=session.id)
+
+        context = retrieve_transcript_context(session, "What do mitochondria produce?")
+        self.assertIn("mitochondria", context)
+        self.assertNotIn("ribosomes", context)
+        # Built on first use, then loaded
+        stored = TranscriptIndex.objects.get(session=session)
+        self.assertEqual(stored.chunk_count, build_transcript_index(session, self.text).chunk_count)
+
+
+class StartSessionProcessingTests(TestCase):
+    """
+    An upload whose bytes the same user already had analysed is completed from the earlier session.
+    """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='alice', password='secret')
+        self.other_user = get_user_model().objects.create_user(username='bob', password='secret')
+        self.source = create_session(self.user, status='COMPLETED', content_hash='ab' * 32, duration_seconds=20)
+        text = "Plants absorb light. Chlorophyll is green."
+        AnalysisResult.objects.create(
+            session=self.source, transcription_text=text, summary_text="Photosynthesis.",
+            llm_model_used=settings.OLLAMA_MODEL_NAME, prompt_template_version=PROMPT_TEMPLATE_VERSION,
+        )
+        store_transcript_segments(self.source.id, [
+            TranscriptSegment(session=self.source, index=0, start=0, end=10, text="Plants absorb light."),
+            TranscriptSegment(session=self.source, index=1, start=10, end=20, text="Chlorophyll is green."),
+        ])
+        build_transcript_index(self.source, text)
+
+    def start(self, user):
+        session = create_session(user, status='PENDING', content_hash=self.source.content_hash)
+        with mock.patch('audio_processor.views.request_dispatch') as request_dispatch:
+            start_session_processing(session)
+        session.refresh_from_db()
+        return session, request_dispatch
+
+    def test_identical_upload_copies_the_results(self):
+        session, request_dispatch = self.start(self.user)
+
+        request_dispatch.assert_not_called()
+        self.assertEqual((session.status, session.checkpoint), ('COMPLETED', 'ANALYZED'))
+        self.assertEqual((session.duration_seconds, session.transcribed_seconds), (20, 20))
+        self.assertEqual(session.analysis_result.summary_text, "Photosynthesis.")
+        self.assertEqual(
+            list(session.transcript_segments.order_by('index').values_list('index', 'start', 'end', 'text')),
+            list(self.source.transcript_segments.order_by('index').values_list('index', 'start', 'end', 'text')),
+        )
+        self.assertEqual(TranscriptIndex.objects.get(session=session).data, TranscriptIndex.objects.get(session=self.source).data)
+
+    def test_other_users_results_are_not_reused(self):
+        session, request_dispatch = self.start(self.other_user)
+
+        request_dispatch.assert_called_once()
+        self.assertEqual((session.status, session.checkpoint), ('PENDING', ''))
+        self.assertFalse(AnalysisResult.objects.filter(session=session).exists())
+        self.assertFalse(session.transcript_segments.exists())
+
+
+class ResumableUploadTests(TestCase):
+
+    def setUp(self):
+        use_temp_media_root(self)
+        self.user = get_user_model().objects.create_user(username='alice', password='secret')
+        self.auth = auth_header(self.user)
+        response = self.client.post(
+            reverse('resumable_upload_create'),
+            {'file_name': 'lecture.mp3', 'file_size': 10, 'processing_mode': 'LECTURE'},
+            content_type='application/json', headers=self.auth,
+        )
+        self.assertEqual(response.status_code, 201)
+        self.upload = ResumableUpload.objects.get(pk=response.json()['id'])
+        self.url = reverse('resumable_upload', args=[self.upload.id])
+        self.finalize_url = reverse('resumable_upload_finalize', args=[self.upload.id])
+
+    def patch(self, offset, data):
+        return self.client.patch(
+            self.url, data, content_type='application/offset+octet-stream',
+            headers={**self.auth, 'Upload-Offset': str(offset)},
+        )
+
+    def finalize(self):
+        media_info = MediaInfo(12.5, 'mp3', 44100, 2, False, 'mp3')
+        with mock.patch('audio_processor.views.inspect_stored_upload', return_value=media_info):
+            return self.client.post(self.finalize_url, headers=self.auth)
+
+    def test_chunks_then_finalize(self):
+        self.assertEqual(self.patch(0, b'01234')['Upload-Offset'], '5')
+        response = self.patch(0, b'01234') # A retry of a chunk that already arrived
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '5')
+        self.assertEqual(self.finalize().status_code, 409) # Not complete yet
+        self.assertEqual(self.patch(5, b'56789').status_code, 204)
+
+        response = self.finalize()
+        self.assertEqual(response.status_code, 202)
+        session = Session.objects.get(pk=response.json()['id'])
+        self.assertEqual(session.duration_seconds, 12.5)
+        with default_storage.open(session.file_path.name) as stored:
+            self.assertEqual(stored.read(), b'0123456789')
+        self.assertFalse(os.path.exists(partial_upload_path(self.upload)))
+
+        response = self.finalize() # Finalizing again returns the same session
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], session.id)
+
+    def test_concurrent_writer_gets_conflict(self):
+        self.assertTrue(lock_upload(self.upload.id))
+        self.assertEqual(self.patch(0, b'01234').status_code, 409)
+
+        # A lock left behind by a process that died mid-chunk lapses
+        ResumableUpload.objects.filter(pk=self.upload.pk).update(lock_expires=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.patch(0, b'01234').status_code, 204)
+        self.assertIsNone(ResumableUpload.objects.get(pk=self.upload.pk).lock_expires)
+
+    def test_server_side_probe_failure_is_not_reported_as_gone(self):
+        self.patch(0, b'0123456789')
+        with mock.patch('audio_processor.media_probe.subprocess.run', side_effect=FileNotFoundError('ffprobe')):
+            with self.assertRaises(FileNotFoundError): # A 500, not "410 no longer available"
+                self.client.post(self.finalize_url, headers=self.auth)
+        self.assertFalse(Session.objects.exists())
+        stored_files = [name for _, _, names in os.walk(settings.MEDIA_ROOT) for name in names]
+        self.assertEqual(stored_files, []) # Not orphaned in content-addressed storage
+        self.assertIsNone(ResumableUpload.objects.get(pk=self.upload.pk).lock_expires)
+
+
+class NotesPDFViewTests(TestCase):
+
+    def setUp(self):
+        use_temp_media_root(self)
+        self.user = get_user_model().objects.create_user(username='alice', password='secret')
+        self.session = create_session(self.user, status='COMPLETED')
+        self.analysis = AnalysisResult.objects.create(session=self.session, notes_text="# Notes")
+        self.url = reverse('session_pdf_export', args=[self.session.id])
+        self.auth = auth_header(self.user)
+
+    def test_render_is_requested_once_per_content(self):
+        with mock.patch('audio_processor.views.render_notes_pdf_task') as task:
+            for _ in range(2):
+                response = self.client.get(self.url, headers=self.auth)
+                self.assertEqual(response.status_code, 202)
+            self.assertEqual(task.delay.call_count, 1)
+
+            # Requested again once the first request looks lost, or for changed content
+            AnalysisResult.objects.filter(pk=self.analysis.pk).update(
+                pdf_render_requested=timezone.now() - timedelta(seconds=settings.PDF_RENDER_LOCK_SECONDS + 1)
+            )
+            self.client.get(self.url, headers=self.auth)
+            self.assertEqual(task.delay.call_count, 2)
+            self.session.title = "Renamed"
+            self.session.save()
+            self.client.get(self.url, headers=self.auth)
+            self.assertEqual(task.delay.call_count, 3)
+
+
+class LiveStepTests(TestCase):
+
+    def test_audio_survives_the_broker(self):
+        audio = np.array([0, 1, -1, 12345, -32768, 32767], dtype=np.int16).astype(np.float32) / 32768.0
+        self.assertTrue(np.array_equal(decode_live_audio(encode_live_audio(audio)), audio))
+
+    def test_step_runs_in_a_worker(self):
+        window_result = ([TranscribedSegment(10.0, 11.5, "Hello", -0.2)], 11.5)
+
+        def send_task(name, args):
+            # What the live worker does with the message, through JSON like the real broker
+            with mock.patch('audio_processor.tasks.transcribe_live_window', return_value=window_result) as window:
+                returned = json.loads(json.dumps(transcribe_live_window_task(*json.loads(json.dumps(args)))))
+            self.assertEqual(window.call_args.args[1:], (10.0, "Earlier text", False))
+            result = mock.Mock()
+            result.get.return_value = returned
+            return result
+
+        with mock.patch('audio_processor.live_transcription.current_app') as app:
+            app.send_task.side_effect = send_task
+            segments, commit_until = run_live_step(np.zeros(1600, dtype=np.float32), 10.0, "Earlier text")
+
+        self.assertEqual((segments, commit_until), window_result)
+        self.assertEqual(app.send_task.call_args.args[0], 'audio_processor.tasks.transcribe_live_window_task')
+
+    def test_asgi_application_loads_without_faster_whisper(self):
+        # Whisper runs in the workers; the web server must start without it
+        code = (
+            "import os, sys; sys.modules['faster_whisper'] = None; "
+            "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings'); "
+            "import config.asgi; import audio_processor.consumers"
+        )
+        completed = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, capture_output=True, text=True)
+        self.assertEqual(completed.returncode, 0, completed.stderr)
+
+
+# Stands in for ffmpeg: the "recording" the test sends is raw s16le already, passed straight through
+PASSTHROUGH_DECODER = [sys.executable, '-c', 'import shutil, sys; shutil.copyfileobj(sys.stdin.buffer, sys.stdout.buffer)']
+
+
+@override_settings(SESSION_LEASE_SECONDS=1, SESSION_LEASE_HEARTBEAT_SECONDS=0.2, LIVE_STEP_SECONDS=1)
+class LiveTranscriptionConsumerTests(TransactionTestCase):
+
+    def setUp(self):
+        use_temp_media_root(self)
+        self.user = get_user_model().objects.create_user(username='alice', password='secret')
+        self.session = create_session(self.user, status='TRANSCRIBING', file_type='LIVE', processing_mode='LECTURE')
+
+    async def connect(self):
+        communicator = WebsocketCommunicator(
+            LiveTranscriptionConsumer.as_asgi(), f"/ws/sessions/{self.session.id}/live/?container=webm"
+        )
+        communicator.scope['user'] = self.user
+        communicator.scope['url_route'] = {'kwargs': {'session_id': self.session.id}}
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def test_lease_outlives_a_failed_live_step(self):
+        second_of_audio = (np.sin(np.arange(16000) / 10) * 10000).astype('<i2').tobytes()
+        with mock.patch('audio_processor.consumers.ffmpeg_stream_decode_command', return_value=PASSTHROUGH_DECODER), \
+                mock.patch('audio_processor.consumers.run_live_step', side_effect=TimeoutError("live worker down")), \
+                mock.patch('audio_processor.consumers.probe_media', side_effect=MediaProbeError("not probed")), \
+                mock.patch('audio_processor.consumers.request_dispatch'):
+            communicator = await self.connect()
+            await communicator.send_to(bytes_data=second_of_audio * 2) # Enough for a step, which fails
+            # The user keeps recording for more than a lease period after live transcription broke down
+            for _ in range(8):
+                await asyncio.sleep(0.25)
+                await communicator.send_to(bytes_data=second_of_audio)
+
+            self.assertEqual(await sync_to_async(reap_expired_leases)(), (0, 0))
+            session = await Session.objects.aget(pk=self.session.id)
+            self.assertEqual(session.status, 'TRANSCRIBING')
+            self.assertGreater(session.lease_expires, timezone.now())
+
+            await communicator.send_to(text_data=json.dumps({'type': 'stop'}))
+            message = json.loads(await communicator.receive_from(timeout=10))
+            await communicator.disconnect()
+
+        self.assertEqual(message['type'], 'finalized')
+        session = await Session.objects.aget(pk=self.session.id)
+        self.assertEqual((session.status, session.checkpoint, session.lease_owner), ('PENDING', '', ''))
+        # Everything recorded is kept for the pipeline
+        self.assertEqual(os.path.getsize(session.file_path.path), len(second_of_audio) * 10)
+        self.assertIsNone(session.duration_seconds) # The decoder stopped counting when the step failed
+
+
+class IterateInThreadTests(TestCase):
+
+    async def test_yields_items_in_order(self):
+        self.assertEqual([item async for item in iterate_in_thread(iter(['a', 'b', 'c']))], ['a', 'b', 'c'])
+
+    async def test_closes_iterator_when_stopped_early(self):
+        closed = []
+
+        def chunks():
+            try:
+                yield 'first'
+                yield 'second'
+            finally:
+                closed.append(True)
+
+        stream = iterate_in_thread(chunks())
+        self.assertEqual(await stream.__anext__(), 'first')
+        await stream.aclose()
+        self.assertEqual(closed, [True])
+
+
+class ByteRangeTests(TestCase):
+
+    def test_parse_byte_range(self):
+        self.assertEqual(parse_byte_range('bytes=0-9', 100), (0, 9))
+        self.assertEqual(parse_byte_range('bytes=90-', 100), (90, 99))
+        self.assertEqual(parse_byte_range('bytes=-10', 100), (90, 99))
+        self.assertEqual(parse_byte_range('bytes=50-500', 100), (50, 99)) # Clamped to the content
+        self.assertIsNone(parse_byte_range('bytes=0-1,5-6', 100)) # Multiple ranges: full body instead
+        self.assertIsNone(parse_byte_range('items=0-9', 100))
+        self.assertIsNone(parse_byte_range('bytes=a-b', 100))
+        with self.assertRaises(ValueError):
+            parse_byte_range('bytes=100-', 100)
+        with self.assertRaises(ValueError):
+            parse_byte_range('bytes=9-5', 100)
+
+    def test_slice_byte_stream_spans_chunks(self):
+        chunks = [b'abcd', b'efgh', b'ijkl']
+        self.assertEqual(b''.join(slice_byte_stream(iter(chunks), 2, 9)), b'cdefghij')
+        self.assertEqual(b''.join(slice_byte_stream(iter(chunks), 4, 4)), b'e')
+
+    def test_format_timestamp(self):
+        self.assertEqual(format_timestamp(3725.5, ','), '01:02:05,500')
+        self.assertEqual(format_timestamp(0.0004, '.'), '00:00:00.000')
+
+
+class TranscriptExportViewTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='alice', password='secret')
+        self.session = create_session(self.user, status='COMPLETED')
+        TranscriptSegment.objects.bulk_create([
+            TranscriptSegment(session=self.session, index=i, start=i * 2.0, end=i * 2.0 + 1.5, text=f"Line {i}")
+            for i in range(3)
+        ])
+        self.url = reverse('session_transcript_export', args=[self.session.id, 'srt'])
+        self.auth = auth_header(self.user)
+
+    async def get(self, **headers):
+        response = await self.async_client.get(self.url, headers={**self.auth, **headers})
+        body = b''.join([chunk async for chunk in response.streaming_content]) if response.streaming else b''
+        return response, body
+
+    async def test_streams_srt(self):
+        response, body = await self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async) # Streamed by the ASGI handler, not read into memory first
+        self.assertTrue(body.startswith(b"1\n00:00:00,000 --> 00:00:01,500\nLine 0\n\n2\n"))
+
+    async def test_unchanged_export_is_not_modified(self):
+        response, _ = await self.get()
+        response, body = await self.get(**{'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(body, b'')
+
+    async def test_range_request(self):
+        _, full = await self.get()
+        response, body = await self.get(Range='bytes=5-20')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, full[5:21])
+        self.assertEqual(response['Content-Range'], f"bytes 5-20/{len(full)}")
+
+    async def test_unsatisfiable_range(self):
+        response, _ = await self.get(Range='bytes=100000-')
+        self.assertEqual(response.status_code, 416)
+
+
+class StreamInThreadTests(TestCase):
+
+    async def test_relays_items_and_errors(self):
+        def tokens():
+            yield 'a'
+            yield 'b'
+            raise ValueError("bad line")
+
+        received = []
+        with self.assertRaises(ValueError):
+            async for token in stream_in_thread(tokens()):
+                received.append(token)
+        self.assertEqual(received, ['a', 'b'])
+
+    async def test_closes_iterator_when_consumer_stops(self):
+        closed = threading.Event()
+
+        def tokens():
+            try:
+                while True:
+                    yield 'token'
+            finally:
+                closed.set()
+
+        stream = stream_in_thread(tokens())
+        self.assertEqual(await stream.__anext__(), 'token')
+        await stream.aclose() # What a client disconnect does to the response
+        self.assertTrue(await asyncio.to_thread(closed.wait, 5))
+
+
+class CachedGenerateTests(TestCase):
+
+    def setUp(self):
+        caches[settings.LLM_CACHE_ALIAS].clear()
+        self.key = make_cache_key('llama3', 'lecture_v1.1', hash_inputs("A short lecture."))
+
+    def test_miss_hit_and_bypass(self):
+        generate = mock.Mock(return_value="First answer")
+        self.assertEqual(cached_generate(generate, self.key), ("First answer", False))
+
+        generate.return_value = "Second answer"
+        self.assertEqual(cached_generate(generate, self.key), ("First answer", True))
+        self.assertEqual(generate.call_count, 1)
+
+        # A bypass always asks the LLM and replaces the cached response
+        self.assertEqual(cached_generate(generate, self.key, bypass=True), ("Second answer", False))
+        self.assertEqual(cached_generate(generate, self.key), ("Second answer", True))
+        self.assertEqual(generate.call_count, 2)
+        self.assertEqual(cache_stats(), {'hits': 2, 'misses': 1, 'hit_rate': 0.667})
+
+    def test_unreachable_cache_is_a_miss(self):
+        broken = mock.Mock()
+        broken.get.side_effect = broken.set.side_effect = ConnectionError("Connection refused")
+        with mock.patch('audio_processor.llm_cache._cache', return_value=broken):
+            self.assertEqual(cached_generate(lambda: "Answer", self.key), ("Answer", False))
+
+
+class FakeOllamaClient:
+
+    def __init__(self, *lines):
+        self.lines = lines
+        self.closed = False
+
+    def stream_generate(self, prompt):
+        try:
+            for line in self.lines:
+                if isinstance(line, Exception):
+                    raise line
+                yield line
+        finally:
+            self.closed = True
+
+
+class QnAStreamViewTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='alice', password='secret')
+        self.session = create_session(self.user, status='COMPLETED')
+        AnalysisResult.objects.create(session=self.session, transcription_text="A short lecture.")
+        self.url = reverse('session_qna_stream', args=[self.session.id])
+        self.auth = auth_header(self.user)
+
+    async def ask(self, client):
+        with mock.patch('audio_processor.views.get_ollama_client', return_value=client):
+            response = await self.async_client.post(
+                self.url, {'question': 'What was it about?', 'bypass_cache': True},
+                content_type='application/json', headers=self.auth,
+            )
+            body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        events = []
+        for block in body.strip().split("\n\n"):
+            lines = dict(line.split(": ", 1) for line in block.splitlines())
+            events.append((lines.get('event'), json.loads(lines['data'])))
+        return response, events
+
+    async def test_streams_tokens_then_done(self):
+        client = FakeOllamaClient('The ', 'lecture')
+        response, events = await self.ask(client)
+        self.assertTrue(response.is_async)
+        self.assertEqual(events, [
+            (None, {'token': 'The '}),
+            (None, {'token': 'lecture'}),
+            ('done', {'answer': 'The lecture', 'cached': False}),
+        ])
+        self.assertTrue(client.closed)
+
+    async def test_malformed_first_line_is_an_error_event(self):
+        client = FakeOllamaClient(ValueError("Expecting value"))
+        response, events = await self.ask(client)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([event for event, _ in events], ['error'])
+
+    async def test_upstream_failure_mid_answer_is_an_error_event(self):
+        client = FakeOllamaClient('The ', ValueError("Expecting value"))
+        _, events = await self.ask(client)
+        self.assertEqual([event for event, _ in events], [None, 'error'])
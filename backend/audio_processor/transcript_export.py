@@ -0,0 +1,130 @@
+# audio_processor/transcript_export.py
+
+import hashlib
+import json
+
+from django.db.models import Count, Max
+
+EXPORT_FORMAT_VERSION = "transcript_export_v1" # Bump when the output of any format changes
+
+EXPORT_FORMATS = {
+    'srt': ('application/x-subrip; charset=utf-8', 'srt'),
+    'vtt': ('text/vtt; charset=utf-8', 'vtt'),
+    'jsonl': ('application/jsonl; charset=utf-8', 'jsonl'),
+}
+
+SEGMENT_FIELDS = ('index', 'start', 'end', 'text', 'avg_logprob')
+
+
+def format_timestamp(seconds, decimal_marker):
+    """
+    Formats seconds as HH:MM:SS,mmm (SRT) or HH:MM:SS.mmm (WebVTT).
+    """
+    milliseconds = max(int(round(seconds * 1000)), 0)
+    hours, milliseconds = divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = divmod(milliseconds, 60_000)
+    secs, milliseconds = divmod(milliseconds, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}{decimal_marker}{milliseconds:03d}"
+
+
+def _srt_entry(number, segment):
+    start = format_timestamp(segment['start'], ',')
+    end = format_timestamp(segment['end'], ',')
+    return f"{number}\n{start} --> {end}\n{segment['text'].strip()}\n\n"
+
+
+def _vtt_entry(number, segment):
+    start = format_timestamp(segment['start'], '.')
+    end = format_timestamp(segment['end'], '.')
+    # A blank line would end the cue early, and "-->" inside a cue is not allowed
+    text = " ".join(segment['text'].split()).replace('-->', '->')
+    return f"{start} --> {end}\n{text}\n\n"
+
+
+def _jsonl_entry(number, segment):
+    return json.dumps(segment, ensure_ascii=False) + "\n"
+
+
+ENTRY_FORMATTERS = {
+    'srt': _srt_entry,
+    'vtt': _vtt_entry,
+    'jsonl': _jsonl_entry,
+}
+
+
+def transcript_export_etag_source(session, export_format):
+    """
+    Identifies the export's exact bytes: segments are only ever appended, so their count and
+    last timing change whenever the output does.
+    """
+    summary = session.transcript_segments.aggregate(count=Count('id'), last_index=Max('index'), last_end=Max('end'))
+    return hashlib.sha256(
+        f"{EXPORT_FORMAT_VERSION}:{export_format}:{session.id}:{summary['count']}:"
+        f"{summary['last_index']}:{summary['last_end']}".encode()
+    ).hexdigest()
+
+
+def iter_transcript_export(session, export_format, batch_size=200):
+    """
+    Yields the export as UTF-8 byte chunks of about batch_size segments each, reading segments
+    from the database in batches, so memory use doesn't grow with the transcript length.
+    """
+    formatter = ENTRY_FORMATTERS[export_format]
+    segments = session.transcript_segments.order_by('index').values(*SEGMENT_FIELDS)
+
+    parts = ["WEBVTT\n\n"] if export_format == 'vtt' else []
+    for number, segment in enumerate(segments.iterator(chunk_size=batch_size), start=1):
+        parts.append(formatter(number, segment))
+        if len(parts) >= batch_size:
+            yield "".join(parts).encode('utf-8')
+            parts = []
+    if parts:
+        yield "".join(parts).encode('utf-8')
+
+
+def slice_byte_stream(chunks, start, end):
+    """
+    Yields only bytes start..end (inclusive) of a stream of byte chunks, stopping once end is reached.
+    """
+    position = 0
+    for chunk in chunks:
+        chunk_end = position + len(chunk)
+        if chunk_end > start:
+            yield chunk[max(start - position, 0):end + 1 - position]
+        position = chunk_end
+        if position > end:
+            return
+
+
+def parse_byte_range(range_header, total_length):
+    """
+    Parses a single-range 'bytes=' header into an inclusive (start, end).
+    Returns None when the header is malformed or asks for several ranges (the full body is sent
+    instead, as RFC 9110 allows), and raises ValueError when the range can't be satisfied.
+    """
+    if not range_header or not range_header.startswith('bytes=') or ',' in range_header:
+        return None
+    start_text, separator, end_text = range_header[len('bytes='):].strip().partition('-')
+    if not separator or not (start_text or end_text):
+        return None
+    try:
+        start = int(start_text) if start_text else None
+        end = int(end_text) if end_text else None
+    except ValueError:
+        return None
+
+    if start is None:
+        # bytes=-N: the last N bytes
+        if end == 0 or total_length == 0:
+            raise ValueError("Empty suffix range.")
+        return max(total_length - end, 0), total_length - 1
+    if start >= total_length or (end is not None and end < start):
+        raise ValueError("Range starts beyond the end of the content.")
+    return start, min(end if end is not None else total_length - 1, total_length - 1)
+
+
+def transcript_export_length(session, export_format):
+    """
+    Byte length of the export, computed by streaming it once (needed for Content-Range).
+    """
+    return sum(len(chunk) for chunk in iter_transcript_export(session, export_format))
@@ -0,0 +1,161 @@
+# audio_processor/transcription.py
+
+import multiprocessing
+import os
+import re
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from django.conf import settings
+
+from .audio_decode import SAMPLE_RATE, iter_audio_blocks, iter_transcription_windows
+from .whisper_pool import get_whisper_model
+
+TRANSCRIBE_PROMPT_CHARS = 200 # Previous-window text passed to Whisper as initial_prompt
+MAX_OVERLAP_WORDS = 40 # Upper bound on how many repeated words are searched for when stitching chunks
+MIN_OVERLAP_WORDS = 2 # A single repeated word is too likely to be a coincidence ("the", "and") to drop
+
+
+class TranscribedSegment(NamedTuple):
+    """
+    One Whisper segment with timestamps relative to the start of the recording.
+    """
+    start: float
+    end: float
+    text: str
+    avg_logprob: float
+
+
+def _transcribe_window(audio, offset, model_size=None, compute_type=None, cpu_threads=None, initial_prompt=None):
+    whisper_model = get_whisper_model(model_size, compute_type, cpu_threads)
+    segments, info = whisper_model.transcribe(audio, beam_size=5, initial_prompt=initial_prompt)
+    return [
+        TranscribedSegment(offset + seg.start, offset + seg.end, seg.text.strip(), seg.avg_logprob)
+        for seg in segments
+    ]
+
+
+def _normalize_word(word):
+    return re.sub(r"[^\w']", "", word.lower())
+
+
+def drop_overlapping_words(previous_segments, next_segments, max_words=MAX_OVERLAP_WORDS):
+    """
+    Removes the words at the start of next_segments that repeat the end of previous_segments.
+    Chunks transcribed with overlapping audio produce the same few words twice; the longest
+    run of words that is both a suffix of the previous chunk and a prefix of the next is dropped.
+    """
+    previous_words = [_normalize_word(w) for seg in previous_segments[-5:] for w in seg.text.split()][-max_words:]
+    next_words = [_normalize_word(w) for seg in next_segments[:5] for w in seg.text.split()][:max_words]
+
+    overlap = 0
+    for k in range(min(len(previous_words), len(next_words)), MIN_OVERLAP_WORDS - 1, -1):
+        if previous_words[-k:] == next_words[:k] and any(next_words[:k]):
+            overlap = k
+            break
+    if not overlap:
+        return list(next_segments)
+
+    stitched = []
+    for seg in next_segments:
+        words = seg.text.split()
+        if overlap:
+            dropped = min(overlap, len(words))
+            overlap -= dropped
+            words = words[dropped:]
+            if not words:
+                continue
+            seg = seg._replace(text=" ".join(words))
+        stitched.append(seg)
+    return stitched
+
+
+def iter_serial_segments(windows):
+    """
+    Transcribes windows one after another in this process, carrying text context across cuts.
+    """
+    previous_text = ""
+    for offset, window in windows:
+        segments = _transcribe_window(window, offset, initial_prompt=previous_text[-TRANSCRIBE_PROMPT_CHARS:] or None)
+        print(f"Transcribed audio from {offset:.0f}s ({len(window) / SAMPLE_RATE:.0f}s window).")
+        if segments:
+            previous_text = " ".join(seg.text for seg in segments)
+        yield from segments
+
+
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+
+def get_transcription_executor(workers):
+    """
+    Returns this worker's long-lived transcription process pool. Pool processes keep
+    their Whisper model loaded between tasks, so only the first task pays the load time.
+    """
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            # spawn, not fork: forking a process that already holds CTranslate2 threads is unsafe
+            _executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _executor_workers = workers
+        return _executor
+
+
+def iter_parallel_segments(windows, workers):
+    """
+    Transcribes windows concurrently across a process pool and yields segments in order.
+    At most 2 * workers windows are in flight, which bounds memory for very long recordings.
+    """
+    executor = get_transcription_executor(workers)
+    cpu_threads = settings.WHISPER_CPU_THREADS or max(1, (os.cpu_count() or 1) // workers)
+    model_args = (settings.WHISPER_MODEL_SIZE, settings.WHISPER_COMPUTE_TYPE, cpu_threads)
+
+    in_flight = deque()
+    previous_segments = []
+
+    def collect_oldest():
+        nonlocal previous_segments
+        offset, future = in_flight.popleft()
+        segments = drop_overlapping_words(previous_segments, future.result())
+        print(f"Transcribed chunk starting at {offset:.0f}s ({len(segments)} segments).")
+        if segments:
+            previous_segments = segments
+        return segments
+
+    try:
+        for offset, window in windows:
+            in_flight.append((offset, executor.submit(_transcribe_window, window, offset, *model_args)))
+            if len(in_flight) >= 2 * workers:
+                yield from collect_oldest()
+        while in_flight:
+            yield from collect_oldest()
+    finally:
+        for _, future in in_flight:
+            future.cancel()
+
+
+def iter_transcript_segments(input_path, start_seconds=0):
+    """
+    Decodes and transcribes a media file, yielding TranscribedSegment objects in order.
+    Uses the process pool when TRANSCRIBE_PARALLEL_WORKERS > 1. start_seconds skips audio
+    that has already been transcribed.
+    """
+    workers = settings.TRANSCRIBE_PARALLEL_WORKERS
+    audio_blocks = iter_audio_blocks(input_path, start_seconds=start_seconds)
+
+    if workers > 1:
+        windows = iter_transcription_windows(
+            audio_blocks,
+            settings.TRANSCRIBE_PARALLEL_CHUNK_SECONDS,
+            overlap_seconds=settings.TRANSCRIBE_CHUNK_OVERLAP_SECONDS,
+            start_seconds=start_seconds,
+        )
+        return iter_parallel_segments(windows, workers)
+
+    windows = iter_transcription_windows(audio_blocks, settings.TRANSCRIBE_WINDOW_SECONDS, start_seconds=start_seconds)
+    return iter_serial_segments(windows)
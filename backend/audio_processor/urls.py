@@ -3,24 +3,44 @@
 from django.urls import path
 from .views import (
     SessionUploadView,
+    LiveSessionCreateView,
+    ResumableUploadCreateView,
+    ResumableUploadView,
+    ResumableUploadFinalizeView,
     SessionStatusView,
+    SessionStatusBatchView,
     SessionResultsView,      
+    SessionTranscriptSegmentsView,
+    SessionTranscriptExportView,
     ExportNotesPDFView,      
     SessionSearchAPIView,    
+    SessionsSearchAPIView,
     SessionQnAAPIView,
+    SessionQnAStreamAPIView,
     SessionListView ,       
     SessionStatsView ,
     SessionRetryView,
+    LLMCacheStatsView,
 )
 
 urlpatterns = [
     path('sessions/upload/', SessionUploadView.as_view(), name='session_upload'),
+    path('sessions/live/', LiveSessionCreateView.as_view(), name='session_live_create'),
+    path('sessions/status/', SessionStatusBatchView.as_view(), name='session_status_batch'),
+    path('uploads/', ResumableUploadCreateView.as_view(), name='resumable_upload_create'),
+    path('uploads/<uuid:upload_id>/', ResumableUploadView.as_view(), name='resumable_upload'),
+    path('uploads/<uuid:upload_id>/finalize/', ResumableUploadFinalizeView.as_view(), name='resumable_upload_finalize'),
     path('sessions/<int:pk>/status/', SessionStatusView.as_view(), name='session_status'),
     path('sessions/<int:pk>/results/', SessionResultsView.as_view(), name='session_results'),  
+    path('sessions/<int:pk>/transcript/', SessionTranscriptSegmentsView.as_view(), name='session_transcript'),
+    path('sessions/<int:pk>/transcript/export/<str:export_format>/', SessionTranscriptExportView.as_view(), name='session_transcript_export'),
     path('sessions/<int:pk>/pdf/', ExportNotesPDFView.as_view(), name='session_pdf_export'), 
+    path('sessions/search/', SessionsSearchAPIView.as_view(), name='sessions_search'),
     path('sessions/<int:pk>/search/', SessionSearchAPIView.as_view(), name='session_search'), 
     path('sessions/<int:pk>/qna/', SessionQnAAPIView.as_view(), name='session_qna'), 
+    path('sessions/<int:pk>/qna/stream/', SessionQnAStreamAPIView.as_view(), name='session_qna_stream'),
     path('sessions/', SessionListView.as_view(), name='session_list'),
     path('sessions/stats/', SessionStatsView.as_view(), name='session_stats'), # <--- ADD THIS LINE
     path('sessions/<int:pk>/retry/', SessionRetryView.as_view(), name='session_retry'),
+    path('llm-cache/stats/', LLMCacheStatsView.as_view(), name='llm_cache_stats'),
 ]
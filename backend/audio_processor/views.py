@@ -1,31 +1,90 @@
-from django.shortcuts import render
-
 # Create your views here.
 # audio_processor/views.py
 
  
 import os
 import json
-from django.http import FileResponse, Http404
+import hashlib
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
 from django.template.loader import get_template
+from django.utils.http import content_disposition_header, parse_etags, quote_etag
 from django.conf import settings
-from xhtml2pdf import pisa # For PDF generation
-from io import BytesIO # For handling PDF in memory
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils import timezone
+from django.db import transaction
 import requests
+from asgiref.sync import sync_to_async
 from rest_framework import status
 from rest_framework.parsers import MultiPartParser, FormParser
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework import generics
 
-from .models import Session, AnalysisResult
-from .serializers import FileUploadSerializer, SessionSerializer, AnalysisResultSerializer # Import new serializer
-from .tasks import process_session_task
+from .models import Session, AnalysisResult, ResumableUpload, UserSessionStats, transcription_progress
+from .serializers import FileUploadSerializer, LiveSessionCreateSerializer, ResumableUploadCreateSerializer, SessionSerializer, SessionListSerializer, AnalysisResultSerializer, TranscriptSegmentSerializer
+from .pagination import SessionCursorPagination
+from .analysis import build_qna_context, build_qna_prompt, QNA_PROMPT_TEMPLATE_VERSION
+from .llm_cache import cache_stats, get_cached, set_cached, hash_inputs, make_cache_key
+from .ollama_client import get_ollama_client
+from .retrieval import retrieve_transcript_context
+from .search import matching_fields, search_sessions
+from .stats import aggregate_user_stats, rebuild_user_stats, summarize_stage_timings
+from .dedup import save_content_addressed, find_reusable_session, copy_session_results
+from .media_probe import MediaProbeError, inspect_stored_upload, media_info_fields
+from .scheduler import request_dispatch
+from .resumable_upload import (
+    ChunkError, append_chunk, discard_upload, finish_upload, lock_upload, parse_upload_checksum, unlock_upload,
+)
+from .pdf_export import (
+    PDFRenderError, claim_notes_pdf_render, notes_pdf_hash, release_notes_pdf_render, render_notes_pdf,
+    session_pdf_title, stored_notes_pdf_path,
+)
+from .transcript_export import (
+    EXPORT_FORMATS, iter_transcript_export, parse_byte_range, slice_byte_stream,
+    transcript_export_etag_source, transcript_export_length,
+)
+from .streaming import iterate_in_thread, stream_in_thread
+from .tasks import render_notes_pdf_task, PROMPT_TEMPLATE_VERSION
 
-# --- Configuration for LLM (re-used from tasks.py for Q&A endpoint) ---
-OLLAMA_API_URL = "http://localhost:11434/api/generate"
-OLLAMA_MODEL_NAME = "deepseek-r1:1.5b" # Must match the model used in tasks.py
+def is_truthy(value):
+    """
+    Interprets booleans sent either as JSON or as form/query strings.
+    """
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+def qna_cache_key(session, context_text, user_question):
+    """
+    LLM cache key for a Q&A answer: model, Q&A prompt version, hash of the session content and
+    user context, and the normalized question.
+    """
+    analysis = session.analysis_result
+    inputs_hash = hash_inputs(
+        analysis.transcription_text, analysis.summary_text, analysis.notes_text, context_text
+    )
+    return make_cache_key(settings.OLLAMA_MODEL_NAME, QNA_PROMPT_TEMPLATE_VERSION, inputs_hash, user_question)
+
+
+def start_session_processing(session):
+    """
+    Starts processing a newly uploaded session: identical bytes the same user already had analysed
+    with the same model and prompt reuse that result, anything else waits for the scheduler to
+    start its pipeline.
+    """
+    reusable_session = find_reusable_session(
+        session.user_id, session.content_hash, settings.OLLAMA_MODEL_NAME, PROMPT_TEMPLATE_VERSION
+    )
+    if reusable_session:
+        print(f"Session {session.id} reuses results of Session {reusable_session.id} (identical upload).")
+        copy_session_results(reusable_session, session)
+    else:
+        # The scheduler starts the Celery pipeline (extract -> transcribe -> analyze) when the session's turn comes
+        request_dispatch()
 
 class SessionUploadView(APIView):
     """
@@ -43,21 +102,28 @@ class SessionUploadView(APIView):
             processing_mode = serializer.validated_data['processing_mode']
             title = serializer.validated_data.get('title', '') # Get title, default to empty string
 
+            # Save the file under its SHA-256 so identical uploads share one copy on disk
+            content_hash, stored_name = save_content_addressed(uploaded_file)
+
+            # Probe duration/codec and reject files without decodable audio before any worker time is spent
+            try:
+                media_info = inspect_stored_upload(stored_name)
+            except MediaProbeError as e:
+                return Response({"detail": f"Unsupported or corrupt media file: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
             # Create a new Session instance
             session = Session.objects.create(
                 user=request.user, # Link to the authenticated user
                 title=title,
                 original_file_name=uploaded_file.name,
-                file_type='AUDIO' if uploaded_file.content_type.startswith('audio') else 'VIDEO', # Basic type detection
-                # duration_seconds will be set by the processing task
                 processing_mode=processing_mode,
                 status='PENDING', # Initial status
-                file_path=uploaded_file # Django's FileField handles saving the file
+                file_path=stored_name,
+                content_hash=content_hash,
+                **media_info_fields(media_info), # Duration, codec, sample rate, channels, audio/video
             )
 
-            # Enqueue the Celery task for background processing
-            # Pass the session ID so the task knows which session to process
-            process_session_task.delay(session.id)
+            start_session_processing(session)
 
             # Return a 202 Accepted response with the new session's basic info
             return Response(
@@ -66,9 +132,247 @@ class SessionUploadView(APIView):
             )
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
-        
-        
-        
+
+
+class LiveSessionCreateView(APIView):
+    """
+    Starts a live session: POST {"title", "processing_mode", "container"}.
+    Then stream the recording to the returned websocket_path (under /ws/); it is transcribed while
+    recording and, once the socket is stopped, only the analysis is left to run.
+    Requires authentication.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = LiveSessionCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        # TRANSCRIBING without a file: the scheduler leaves it alone until the socket finalizes it
+        session = Session.objects.create(
+            user=request.user,
+            title=data.get('title', ''),
+            original_file_name=f"live_recording_{timezone.now():%Y%m%d_%H%M%S}.{data['container']}",
+            processing_mode=data['processing_mode'],
+            file_type='LIVE',
+            status='TRANSCRIBING',
+        )
+        response_data = SessionSerializer(session).data
+        response_data['websocket_path'] = f"sessions/{session.id}/live/?container={data['container']}"
+        return Response(response_data, status=status.HTTP_201_CREATED)
+
+
+# --- Resumable (chunked) uploads ---
+UPLOAD_CHUNK_CONTENT_TYPE = 'application/offset+octet-stream'
+
+
+def _get_resumable_upload(request, upload_id):
+    """
+    Returns (upload, None), or (None, error response) if it doesn't exist or isn't the user's.
+    """
+    try:
+        upload = ResumableUpload.objects.get(pk=upload_id)
+    except ResumableUpload.DoesNotExist:
+        raise Http404("Upload not found.")
+    if upload.user_id != request.user.id:
+        return None, Response(
+            {"detail": "You do not have permission to access this upload."},
+            status=status.HTTP_403_FORBIDDEN
+        )
+    return upload, None
+
+
+def _upload_state_response(upload, response_status=status.HTTP_200_OK):
+    response = Response({
+        'id': str(upload.id),
+        'upload_offset': upload.upload_offset,
+        'upload_length': upload.upload_length,
+        'session_id': upload.session_id,
+    }, status=response_status)
+    response['Upload-Offset'] = str(upload.upload_offset)
+    response['Upload-Length'] = str(upload.upload_length)
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+class ResumableUploadCreateView(APIView):
+    """
+    Starts a resumable upload: POST {"file_name", "file_size", "content_type", "processing_mode", "title"}.
+    Then PATCH the file to /uploads/<id>/ in chunks and POST /uploads/<id>/finalize/ to create the session.
+    Requires authentication.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        serializer = ResumableUploadCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        upload = ResumableUpload.objects.create(
+            user=request.user,
+            original_file_name=data['file_name'],
+            content_type=data.get('content_type', ''),
+            title=data.get('title', ''),
+            processing_mode=data['processing_mode'],
+            upload_length=data['file_size'],
+        )
+        response = _upload_state_response(upload, status.HTTP_201_CREATED)
+        response['Location'] = request.build_absolute_uri(reverse('resumable_upload', args=[upload.id]))
+        return response
+
+
+class ResumableUploadView(APIView):
+    """
+    One resumable upload.
+        GET/HEAD: current offset (Upload-Offset header), to resume after an interruption.
+        PATCH:    append a chunk. Headers: Upload-Offset (must equal the current offset),
+                  Content-Type: application/offset+octet-stream, optionally
+                  Upload-Checksum: "<sha1|sha256|md5> <base64 digest>" of the chunk.
+        DELETE:   abandon the upload and delete what was received.
+    Chunks are streamed to disk a block at a time, so memory per request stays bounded.
+    Requires authentication.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, upload_id, *args, **kwargs):
+        upload, error = _get_resumable_upload(request, upload_id)
+        if error:
+            return error
+        return _upload_state_response(upload)
+
+    def patch(self, request, upload_id, *args, **kwargs):
+        upload, error = _get_resumable_upload(request, upload_id)
+        if error:
+            return error
+        if upload.session_id:
+            return Response({"detail": "This upload has already been finalized."}, status=status.HTTP_409_CONFLICT)
+        if request.content_type != UPLOAD_CHUNK_CONTENT_TYPE:
+            return Response(
+                {"detail": f"Chunks must be sent as {UPLOAD_CHUNK_CONTENT_TYPE}."},
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+            )
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            content_length = int(request.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return Response(
+                {"detail": "Integer Upload-Offset and Content-Length headers are required."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if content_length == 0:
+            response = Response(status=status.HTTP_204_NO_CONTENT)
+            response['Upload-Offset'] = str(upload.upload_offset)
+            return response
+        if content_length > settings.RESUMABLE_UPLOAD_MAX_CHUNK_BYTES:
+            return Response(
+                {"detail": f"Chunks can be at most {settings.RESUMABLE_UPLOAD_MAX_CHUNK_BYTES} bytes."},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+        if offset + content_length > upload.upload_length:
+            return Response({"detail": "Chunk extends past the declared file size."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # One writer per upload; a second concurrent PATCH gets a conflict and should re-check the offset
+        if not lock_upload(upload.id):
+            return Response({"detail": "Another chunk for this upload is in progress."}, status=status.HTTP_409_CONFLICT)
+        try:
+            upload.refresh_from_db()
+            if offset != upload.upload_offset:
+                response = Response(
+                    {"detail": "Upload-Offset does not match the current offset.", 'upload_offset': upload.upload_offset},
+                    status=status.HTTP_409_CONFLICT
+                )
+                response['Upload-Offset'] = str(upload.upload_offset)
+                return response
+            try:
+                checksum = parse_upload_checksum(request.headers.get('Upload-Checksum'))
+                new_offset, crc = append_chunk(upload, request.stream, content_length, checksum)
+            except ChunkError as e:
+                return Response({"detail": str(e)}, status=e.status_code)
+
+            # Only moves the offset on from the one the chunk was written at
+            committed = ResumableUpload.objects.filter(pk=upload.pk, upload_offset=offset).update(
+                upload_offset=new_offset, crc32=crc, updated_timestamp=timezone.now()
+            )
+            if not committed:
+                return Response({"detail": "The upload changed while the chunk was written."}, status=status.HTTP_409_CONFLICT)
+        finally:
+            unlock_upload(upload.id)
+
+        response = Response(status=status.HTTP_204_NO_CONTENT)
+        response['Upload-Offset'] = str(new_offset)
+        return response
+
+    def delete(self, request, upload_id, *args, **kwargs):
+        upload, error = _get_resumable_upload(request, upload_id)
+        if error:
+            return error
+        if not upload.session_id:
+            discard_upload(upload)
+        upload.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class ResumableUploadFinalizeView(APIView):
+    """
+    Completes a resumable upload once every byte has arrived: verifies the rolling checksum,
+    moves the file into content-addressed storage, creates the Session and starts processing.
+    Calling it again returns the same session.
+    Requires authentication.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, upload_id, *args, **kwargs):
+        upload, error = _get_resumable_upload(request, upload_id)
+        if error:
+            return error
+        if upload.session_id:
+            return Response(SessionSerializer(upload.session).data, status=status.HTTP_200_OK)
+        if not upload.is_complete:
+            return Response(
+                {"detail": "The upload is not complete yet.", 'upload_offset': upload.upload_offset,
+                 'upload_length': upload.upload_length},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        if not lock_upload(upload.id):
+            return Response({"detail": "This upload is being finalized."}, status=status.HTTP_409_CONFLICT)
+        try:
+            upload.refresh_from_db()
+            if upload.session_id:
+                return Response(SessionSerializer(upload.session).data, status=status.HTTP_200_OK)
+            try:
+                content_hash, stored_name = finish_upload(upload)
+            except FileNotFoundError:
+                return Response({"detail": "The uploaded data is no longer available."}, status=status.HTTP_410_GONE)
+            except ChunkError as e:
+                return Response({"detail": str(e)}, status=e.status_code)
+            try:
+                media_info = inspect_stored_upload(stored_name)
+            except MediaProbeError as e:
+                upload.delete() # The file is gone; the client has to start a new upload
+                return Response({"detail": f"Unsupported or corrupt media file: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+            session = Session.objects.create(
+                user=request.user,
+                title=upload.title,
+                original_file_name=upload.original_file_name,
+                processing_mode=upload.processing_mode,
+                status='PENDING',
+                file_path=stored_name,
+                content_hash=content_hash,
+                **media_info_fields(media_info),
+            )
+            upload.session = session
+            upload.save(update_fields=['session', 'updated_timestamp'])
+        finally:
+            unlock_upload(upload.id)
+
+        start_session_processing(session)
+        return Response(SessionSerializer(session).data, status=status.HTTP_202_ACCEPTED)
+
+
 class SessionStatusView(generics.RetrieveAPIView):
     """
     API endpoint to get the status of a specific session.
@@ -88,11 +392,14 @@ class SessionStatusView(generics.RetrieveAPIView):
                 status=status.HTTP_403_FORBIDDEN
             )
         # Manually select fields to return for status polling
+        transcribed_seconds = session.transcribed_seconds if session.status == 'TRANSCRIBING' else None
         data = {
             'id': session.id,
             'status': session.status,
             'title': session.title,
             'original_file_name': session.original_file_name,
+            'duration_seconds': session.duration_seconds,
+            'transcription_progress': transcription_progress(session.duration_seconds, transcribed_seconds),
         }
         return Response(data) # Return only the specific data needed for status
     
@@ -100,6 +407,69 @@ class SessionStatusView(generics.RetrieveAPIView):
     
     
     
+class SessionStatusBatchView(APIView):
+    """
+    API endpoint to get the status of many sessions in one request: GET /api/sessions/status/?ids=1,2,3
+    Statuses come from a single query scoped to the requesting user; ids that don't exist or
+    belong to someone else are reported under "missing". The response carries an ETag over the
+    statuses and update times, and a matching If-None-Match gets an empty 304.
+    Requires authentication.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        raw_ids = [part for part in request.query_params.get('ids', '').split(',') if part.strip()]
+        if not raw_ids:
+            return Response({"detail": "Query parameter 'ids' is required."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = sorted({int(part) for part in raw_ids})
+        except ValueError:
+            return Response({"detail": "'ids' must be a comma-separated list of integers."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > settings.SESSION_STATUS_BATCH_MAX_IDS:
+            return Response(
+                {"detail": f"At most {settings.SESSION_STATUS_BATCH_MAX_IDS} ids can be requested at once."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = list(
+            Session.objects
+            .filter(user=request.user, id__in=ids)
+            .order_by('id')
+            .values(
+                'id', 'status', 'title', 'original_file_name', 'duration_seconds', 'updated_timestamp',
+                'transcribed_seconds',
+            )
+        )
+        for row in rows:
+            transcribed_seconds = row.pop('transcribed_seconds')
+            if row['status'] == 'TRANSCRIBING':
+                row['transcription_progress'] = transcription_progress(row['duration_seconds'], transcribed_seconds)
+            else:
+                row['transcription_progress'] = None
+
+        hasher = hashlib.sha1()
+        for row in rows:
+            # Segments are stored without touching the session, so progress is part of the tag
+            hasher.update(
+                f"{row['id']}:{row['status']}:{row['updated_timestamp'].isoformat()}:{row['transcription_progress']};".encode()
+            )
+        etag = quote_etag(hasher.hexdigest())
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and (etag in parse_etags(if_none_match) or if_none_match.strip() == '*'):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            found = {row['id'] for row in rows}
+            response = Response({
+                'sessions': rows,
+                'missing': [session_id for session_id in ids if session_id not in found],
+            })
+        response['ETag'] = etag
+        # Always revalidate; the ETag makes that cheap
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
 class SessionResultsView(generics.RetrieveAPIView):
     """
     API endpoint to get the full analysis results for a specific session.
@@ -130,6 +500,126 @@ class SessionResultsView(generics.RetrieveAPIView):
         serializer = self.get_serializer(session)
         return Response(serializer.data)
 
+# --- API Endpoint for the partial transcript ---
+class SessionTranscriptSegmentsView(APIView):
+    """
+    API endpoint to fetch transcript segments written so far, optionally only those after a given index.
+    Clients poll with ?after=<last index seen> to render the transcript progressively while transcribing.
+    Requires authentication.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, *args, **kwargs):
+        try:
+            session = Session.objects.get(pk=pk)
+        except Session.DoesNotExist:
+            raise Http404("Session not found.")
+
+        if session.user != request.user:
+            return Response(
+                {"detail": "You do not have permission to access this session."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        try:
+            after = int(request.query_params.get('after', -1))
+        except ValueError:
+            return Response({"detail": "'after' must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        page_size = settings.TRANSCRIPT_SEGMENTS_PAGE_SIZE
+        segments = list(session.transcript_segments.filter(index__gt=after).order_by('index')[:page_size + 1])
+        has_more = len(segments) > page_size
+        segments = segments[:page_size]
+
+        return Response({
+            'session_id': session.id,
+            'status': session.status,
+            'segments': TranscriptSegmentSerializer(segments, many=True).data,
+            'last_index': segments[-1].index if segments else after,
+            'has_more': has_more,
+        }, status=status.HTTP_200_OK)
+
+class SessionTranscriptExportView(APIView):
+    """
+    API endpoint to download a session's timestamped transcript as SRT, WebVTT or JSON lines
+    (one segment per line), built from the stored Whisper segment timings.
+    The file is streamed as it is generated, so long transcripts are never held in memory.
+    Supports conditional GET (ETag) and single byte ranges, so interrupted downloads can resume.
+    Requires authentication.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, export_format, *args, **kwargs):
+        try:
+            session = Session.objects.get(pk=pk)
+        except Session.DoesNotExist:
+            raise Http404("Session not found.")
+
+        if session.user_id != request.user.id:
+            return Response(
+                {"detail": "You do not have permission to access this session."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        if export_format not in EXPORT_FORMATS:
+            return Response(
+                {"detail": f"Unsupported format '{export_format}'. Use one of: {', '.join(EXPORT_FORMATS)}."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if not session.transcript_segments.exists():
+            return Response(
+                {"detail": "No timestamped transcript available for this session."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        content_type, extension = EXPORT_FORMATS[export_format]
+        etag_source = transcript_export_etag_source(session, export_format)
+        etag = quote_etag(etag_source)
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and etag in parse_etags(if_none_match):
+            response = HttpResponse(status=status.HTTP_304_NOT_MODIFIED)
+            response['ETag'] = etag
+            return response
+
+        chunks = iter_transcript_export(session, export_format)
+        response_status = status.HTTP_200_OK
+        content_range = None
+
+        # Only resume against the same bytes: a stale If-Range gets the full, current file
+        range_header = request.headers.get('Range')
+        if_range = request.headers.get('If-Range')
+        if range_header and (not if_range or if_range == etag):
+            length_key = f"transcript-export:length:{etag_source}"
+            total_length = cache.get(length_key)
+            if total_length is None:
+                total_length = transcript_export_length(session, export_format)
+                cache.set(length_key, total_length, timeout=settings.TRANSCRIPT_EXPORT_LENGTH_CACHE_SECONDS)
+            try:
+                byte_range = parse_byte_range(range_header, total_length)
+            except ValueError:
+                response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+                response['Content-Range'] = f"bytes */{total_length}"
+                return response
+            if byte_range:
+                start, end = byte_range
+                chunks = slice_byte_stream(chunks, start, end)
+                response_status = status.HTTP_206_PARTIAL_CONTENT
+                content_range = (start, end, total_length)
+
+        # Async iterator: under ASGI a sync one would be read completely before sending
+        response = StreamingHttpResponse(iterate_in_thread(chunks), content_type=content_type, status=response_status)
+        if content_range:
+            start, end, total_length = content_range
+            response['Content-Range'] = f"bytes {start}-{end}/{total_length}"
+            response['Content-Length'] = str(end - start + 1)
+        response['Accept-Ranges'] = 'bytes'
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        title = session.title or session.original_file_name or f"Session {session.id}"
+        response['Content-Disposition'] = content_disposition_header(True, f"{title}_transcript.{extension}")
+        return response
+
 # --- New: API Endpoint for PDF Export ---
 class ExportNotesPDFView(APIView):
     """
@@ -140,11 +630,11 @@ class ExportNotesPDFView(APIView):
 
     def get(self, request, pk, *args, **kwargs):
         try:
-            session = Session.objects.get(pk=pk)
+            session = Session.objects.select_related('analysis_result').get(pk=pk)
         except Session.DoesNotExist:
             raise Http404("Session not found.")
 
-        if session.user != request.user:
+        if session.user_id != request.user.id:
             return Response(
                 {"detail": "You do not have permission to access these notes."},
                 status=status.HTTP_403_FORBIDDEN
@@ -156,57 +646,47 @@ class ExportNotesPDFView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        notes_content = session.analysis_result.notes_text
-        session_title = session.title or session.original_file_name or f"Session {session.id}"
-
-        # Create an HTML template for the PDF
-        # You might want to create a dedicated template file (e.g., 'pdf_notes.html')
-        # in audio_processor/templates/audio_processor/
-        html_template = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>{session_title} Notes</title>
-            <style>
-                body {{ font-family: sans-serif; margin: 40px; }}
-                h1 {{ color: #312E81; text-align: center; }}
-                h2 {{ color: #4F46E5; margin-top: 30px; }}
-                pre {{ background-color: #f4f4f4; padding: 15px; border-radius: 5px; white-space: pre-wrap; word-wrap: break-word; }}
-                ul, ol {{ margin-left: 20px; }}
-                li {{ margin-bottom: 5px; }}
-            </style>
-        </head>
-        <body>
-            <h1>Notes for: {session_title}</h1>
-            <p>Generated on: {session.analysis_result.processed_timestamp.strftime('%Y-%m-%d %H:%M')}</p>
-            <hr/>
-            <h2>Detailed Notes</h2>
-            <pre>{notes_content}</pre>
-            <hr/>
-            <h2>Summary</h2>
-            <pre>{session.analysis_result.summary_text}</pre>
-             <hr/>
-            <h2>Suggestions and Resources</h2>
-            <pre>{session.analysis_result.suggestions_resources_text}</pre>
-        </body>
-        </html>
-        """
-        # Alternatively, load from a template file:
-        # template = get_template('audio_processor/pdf_notes.html')
-        # html_content = template.render({'session_title': session_title, 'notes_content': notes_content, ...})
-
-        result_file = BytesIO()
-        pisa_status = pisa.CreatePDF(
-            html_template,
-            dest=result_file,
-            encoding="UTF-8"
-        )
-        if pisa_status.err:
-            return Response({"detail": "Error generating PDF."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        analysis = session.analysis_result
+        content_hash = notes_pdf_hash(session, analysis)
+        etag = quote_etag(content_hash)
+
+        # The ETag is the content hash, so a matching client copy is current without touching storage
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match and etag in parse_etags(if_none_match):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            response['ETag'] = etag
+            return response
 
-        result_file.seek(0)
-        response = FileResponse(result_file, content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="{session_title}_notes.pdf"'
+        pdf_path = stored_notes_pdf_path(content_hash)
+        if pdf_path is None:
+            # Not rendered yet (or the analysis changed): render in the background, once per content hash
+            if claim_notes_pdf_render(analysis, content_hash):
+                try:
+                    render_notes_pdf_task.delay(session.id)
+                except Exception as e:
+                    print(f"Could not enqueue PDF rendering for session {session.id} ({e}); rendering inline.")
+                    release_notes_pdf_render(analysis)
+                    try:
+                        pdf_path = stored_notes_pdf_path(render_notes_pdf(session))
+                    except PDFRenderError:
+                        return Response({"detail": "Error generating PDF."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            if pdf_path is None:
+                response = Response(
+                    {"detail": "The PDF is being generated. Please try again shortly."},
+                    status=status.HTTP_202_ACCEPTED
+                )
+                response['Retry-After'] = str(settings.PDF_RETRY_AFTER_SECONDS)
+                return response
+
+        # Stream the stored artifact; repeat downloads cost no rendering
+        response = FileResponse(
+            open(pdf_path, 'rb'),
+            content_type='application/pdf',
+            as_attachment=True,
+            filename=f"{session_pdf_title(session)}_notes.pdf"
+        )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
         return response
 
 # --- New: API Endpoint for Search ---
@@ -233,34 +713,68 @@ class SessionSearchAPIView(APIView):
         if not query:
             return Response({"detail": "Search query 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        if not hasattr(session, 'analysis_result'):
+        # Only the id is needed; loading the analysis would pull the whole transcript into memory
+        analysis_id = AnalysisResult.objects.filter(session=session).values_list('id', flat=True).first()
+        if analysis_id is None:
             return Response(
                 {"detail": "Analysis not yet completed for this session."},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        analysis = session.analysis_result
-        results = {}
-
-        # Simple case-insensitive search using 'in' operator for now
-        # For large texts, consider PostgreSQL Full-Text Search or dedicated search engines
-        query_lower = query.lower()
-
-        if query_lower in analysis.transcription_text.lower():
-            results['transcription_matches'] = True
-            # In a real app, you'd return snippets or highlight indices
-        if query_lower in analysis.summary_text.lower():
-            results['summary_matches'] = True
-        if query_lower in analysis.notes_text.lower():
-            results['notes_matches'] = True
-        if query_lower in analysis.suggestions_resources_text.lower():
-            results['suggestions_matches'] = True
+        # Uses the full-text index instead of scanning the texts in Python
+        matched = matching_fields(analysis_id, query)
+        results = {f"{field}_matches": True for field in matched}
 
         if not results:
             return Response({"detail": "No matches found."}, status=status.HTTP_200_OK)
 
         return Response(results, status=status.HTTP_200_OK)
 
+# --- API Endpoint for searching across all of the user's sessions ---
+class SessionsSearchAPIView(APIView):
+    """
+    API endpoint for full-text search across all of the user's analysed sessions.
+    Returns sessions ranked by relevance, each with highlighted snippets and the character
+    offsets of the matches within the matched field.
+    Requires authentication.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({"detail": "Search query 'q' is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except (TypeError, ValueError):
+            limit = 0
+        if limit < 1:
+            # SQLite treats a negative LIMIT as no limit at all
+            return Response({"detail": "'limit' must be a positive integer."}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, 100)
+
+        hits = search_sessions(request.user.id, query, limit)
+        sessions = Session.objects.filter(id__in=[hit['session_id'] for hit in hits]).only(
+            'id', 'title', 'original_file_name', 'status', 'upload_timestamp'
+        ).in_bulk()
+
+        results = []
+        for hit in hits:
+            session = sessions.get(hit['session_id'])
+            if session is None:
+                continue
+            results.append({
+                'session_id': session.id,
+                'title': session.title or session.original_file_name,
+                'status': session.status,
+                'upload_timestamp': session.upload_timestamp.isoformat(),
+                'score': hit['score'],
+                'snippets': hit['snippets'],
+            })
+
+        return Response({'query': query, 'results': results}, status=status.HTTP_200_OK)
+
 # --- New: API Endpoint for Ask LLM / Q&A ---
 class SessionQnAAPIView(APIView):
     """
@@ -293,45 +807,26 @@ class SessionQnAAPIView(APIView):
         if not user_question:
             return Response({"detail": "Question is required."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Combine relevant content for LLM context
-        analysis = session.analysis_result
-        full_context = analysis.transcription_text # Always provide full transcription
-        if context_text: # If frontend provides specific context, prepend it
-            full_context = f"User provided context: {context_text}\n\nFull Transcription:\n{full_context}"
-        else:
-            # If no specific context, add summary/notes to enrich context
-            full_context = f"Summary:\n{analysis.summary_text}\n\nNotes:\n{analysis.notes_text}\n\nFull Transcription:\n{full_context}"
-
-
-        # Construct the prompt for the Q&A
-        qna_prompt = f"""
-        You are an AI assistant helping a user understand a lecture.
-        Based on the provided lecture content, answer the following question.
-        If the answer is not directly available in the content, state that you cannot answer based on the provided text.
-
-        ---
-        LECTURE CONTENT:
-        {full_context}
-        ---
+        # Repeated questions on unchanged content are answered from the LLM cache
+        cache_key = qna_cache_key(session, context_text, user_question)
+        bypass_cache = is_truthy(request.data.get('bypass_cache'))
+        if not bypass_cache:
+            cached_answer = get_cached(cache_key)
+            if cached_answer is not None:
+                return Response({"answer": cached_answer, "cached": True}, status=status.HTTP_200_OK)
 
-        USER QUESTION: {user_question}
-
-        AI ANSWER:
-        """
+        # Combine relevant content for LLM context
+        transcript_excerpts = retrieve_transcript_context(session, user_question)
+        qna_prompt = build_qna_prompt(
+            build_qna_context(session.analysis_result, context_text, transcript_excerpts), user_question
+        )
         print(f"Sending Q&A prompt to LLM for session {pk}...")
-        ollama_payload = {
-            "model": OLLAMA_MODEL_NAME,
-            "prompt": qna_prompt,
-            "stream": False
-        }
 
         try:
-            llm_response = requests.post(OLLAMA_API_URL, json=ollama_payload)
-            llm_response.raise_for_status()
-            response_data = llm_response.json()
-            print("AI answer: ",response_data)
-            ai_answer = response_data.get('response', '').strip()
-            return Response({"answer": ai_answer}, status=status.HTTP_200_OK)
+            ai_answer = get_ollama_client().generate(qna_prompt)
+            print("AI answer: ", ai_answer)
+            set_cached(cache_key, ai_answer)
+            return Response({"answer": ai_answer, "cached": False}, status=status.HTTP_200_OK)
         except requests.exceptions.RequestException as e:
             print(f"LLM API error during Q&A for Session ID {pk}: {e}")
             return Response(
@@ -347,26 +842,161 @@ class SessionQnAAPIView(APIView):
     
     
     
+# --- API Endpoint for streaming Q&A (Server-Sent Events) ---
+class EventStreamRenderer(BaseRenderer):
+    """
+    Lets clients send 'Accept: text/event-stream'. Error responses are still rendered as JSON.
+    """
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data).encode(self.charset)
+
+
+def _sse_event(data, event=None):
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def _sse_response(events):
+    if not hasattr(events, '__aiter__'):
+        events = iterate_in_thread(events) # Under ASGI a sync iterator would be sent all at once
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no' # Stop nginx from buffering the stream
+    return response
+
+
+class SessionQnAStreamAPIView(APIView):
+    """
+    Streaming variant of SessionQnAAPIView. Relays Ollama's tokens to the client as
+    Server-Sent Events as soon as they are generated:
+        data: {"token": "..."}          (repeated)
+        event: done / data: {"answer": "<full answer>"}
+        event: error / data: {"detail": "..."}
+    When the client disconnects the upstream request is closed, which stops generation in Ollama.
+    Requires authentication.
+    """
+    permission_classes = [IsAuthenticated]
+    renderer_classes = [JSONRenderer, EventStreamRenderer]
+
+    def post(self, request, pk, *args, **kwargs):
+        try:
+            session = Session.objects.get(pk=pk)
+        except Session.DoesNotExist:
+            raise Http404("Session not found.")
+
+        if session.user != request.user:
+            return Response(
+                {"detail": "You do not have permission to query this session."},
+                status=status.HTTP_403_FORBIDDEN
+            )
+
+        if not hasattr(session, 'analysis_result') or session.status != 'COMPLETED':
+            return Response(
+                {"detail": "Analysis not yet completed for this session."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        user_question = request.data.get('question', '').strip()
+        context_text = request.data.get('context', '').strip() # Optional context from frontend
+
+        if not user_question:
+            return Response({"detail": "Question is required."}, status=status.HTTP_400_BAD_REQUEST)
+
+        cache_key = qna_cache_key(session, context_text, user_question)
+        if not is_truthy(request.data.get('bypass_cache')):
+            cached_answer = get_cached(cache_key)
+            if cached_answer is not None:
+                return _sse_response(iter([
+                    _sse_event({"token": cached_answer}),
+                    _sse_event({"answer": cached_answer, "cached": True}, event='done'),
+                ]))
+
+        transcript_excerpts = retrieve_transcript_context(session, user_question)
+        qna_prompt = build_qna_prompt(
+            build_qna_context(session.analysis_result, context_text, transcript_excerpts), user_question
+        )
+        print(f"Streaming Q&A answer from LLM for session {pk}...")
+
+        # Start the generation before returning, so connection failures still get a JSON error response
+        tokens = get_ollama_client().stream_generate(qna_prompt)
+        try:
+            first_token = next(tokens, None)
+        except requests.exceptions.RequestException as e:
+            print(f"LLM API error during streaming Q&A for Session ID {pk}: {e}")
+            return Response(
+                {"detail": f"Failed to get answer from AI. LLM error: {e}"},
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+        except ValueError as e:
+            # Ollama answered, but not with the NDJSON stream expected
+            print(f"Malformed LLM stream during Q&A for Session ID {pk}: {e}")
+            tokens.close()
+            return _sse_response(iter([
+                _sse_event({"detail": "The AI returned an unreadable response."}, event='error'),
+            ]))
+
+        async def event_stream():
+            answer_parts = []
+            relaying = False
+            try:
+                if first_token is not None:
+                    answer_parts.append(first_token)
+                    yield _sse_event({"token": first_token})
+                    # The rest of the tokens are read in a thread of their own; when the client
+                    # disconnects, the response is cancelled and that thread closes the token stream,
+                    # which closes the upstream connection and stops generation in Ollama
+                    relaying = True
+                    async for token in stream_in_thread(tokens):
+                        answer_parts.append(token)
+                        yield _sse_event({"token": token})
+                ai_answer = "".join(answer_parts).strip()
+                await sync_to_async(set_cached)(cache_key, ai_answer)
+                yield _sse_event({"answer": ai_answer, "cached": False}, event='done')
+            except (requests.exceptions.RequestException, ValueError) as e:
+                print(f"LLM stream error during Q&A for Session ID {pk}: {e}")
+                yield _sse_event({"detail": "The AI stopped responding before finishing the answer."}, event='error')
+            finally:
+                if not relaying:
+                    tokens.close() # Never handed to the relay thread (or already exhausted)
+
+        return _sse_response(event_stream())
+
+
 # --- NEW: API Endpoint for Listing User Sessions ---
 class SessionListView(generics.ListAPIView):
     """
-    API endpoint to list all sessions for the authenticated user.
+    API endpoint to list all sessions for the authenticated user, newest first.
+    Returns metadata and a summary preview only (fetch /results/ for the full analysis),
+    paginated with a cursor: follow "next" for older sessions.
     Requires authentication.
     """
     
     queryset = Session.objects.all() # Base queryset
-    serializer_class = SessionSerializer
+    serializer_class = SessionListSerializer
+    pagination_class = SessionCursorPagination
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         """
-        Filters the queryset to return only sessions belonging to the authenticated user.
-        Optionally, filters to only show 'COMPLETED' sessions for history.
+        Filters the queryset to return only sessions belonging to the authenticated user,
+        joining in just the columns the list serializer needs.
         """
         user = self.request.user
-        # For history, typically you only want to show completed sessions.
-        # Remove .filter(status='COMPLETED') if you want to show all statuses.
-        return self.queryset.filter(user=user).order_by('upload_timestamp')    
+        return (
+            self.queryset
+            .filter(user=user)
+            .select_related('user', 'analysis_result')
+            .only(
+                'id', 'title', 'original_file_name', 'file_type', 'duration_seconds',
+                'audio_codec', 'sample_rate', 'channels',
+                'upload_timestamp', 'processing_mode', 'status', 'checkpoint',
+                'user', 'user__username', 'analysis_result__summary_preview',
+            )
+        )
     
     
 class SessionStatsView(APIView):
@@ -378,16 +1008,19 @@ class SessionStatsView(APIView):
 
     def get(self, request, *args, **kwargs):
         user = request.user
-        all_sessions = Session.objects.filter(user=user)
-
-        total_sessions = all_sessions.count()
-        completed_sessions = all_sessions.filter(status='COMPLETED').count()
-        failed_sessions = all_sessions.filter(status='FAILED').count()
-        pending_sessions = all_sessions.filter(status='PENDING').count()
-        transcribing_sessions = all_sessions.filter(status='TRANSCRIBING').count()
-        analyzing_sessions = all_sessions.filter(status='ANALYZING').count()
+        stage_timings = {}
+        if settings.SESSION_STATS_COUNTERS_ENABLED:
+            # Single-row read of the counters maintained on every status transition
+            stats = UserSessionStats.objects.select_related('last_session').filter(user=user).first()
+            if stats is None:
+                stats = rebuild_user_stats(user.id)
+            counts = stats.status_counts
+            last_session = stats.last_session
+            stage_timings = stats.stage_timings
+        else:
+            counts = aggregate_user_stats(user.id)
+            last_session = Session.objects.filter(user=user).order_by('-upload_timestamp').first()
 
-        last_session = all_sessions.order_by('-upload_timestamp').first()
         last_session_info = None
         if last_session:
             last_session_info = {
@@ -398,19 +1031,24 @@ class SessionStatsView(APIView):
             }
 
         return Response({
-            'total_sessions': total_sessions,
-            'completed_sessions': completed_sessions,
-            'failed_sessions': failed_sessions,
-            'pending_sessions': pending_sessions,
-            'transcribing_sessions': transcribing_sessions,
-            'analyzing_sessions': analyzing_sessions,
+            'total_sessions': sum(counts.values()),
+            'completed_sessions': counts.get('COMPLETED', 0),
+            'failed_sessions': counts.get('FAILED', 0),
+            'pending_sessions': counts.get('PENDING', 0),
+            'transcribing_sessions': counts.get('TRANSCRIBING', 0),
+            'transcribed_sessions': counts.get('TRANSCRIBED', 0), # Waiting for the LLM stage
+            'analyzing_sessions': counts.get('ANALYZING', 0),
             'last_session': last_session_info,
+            'stage_timings': summarize_stage_timings(stage_timings),
         }, status=status.HTTP_200_OK)
 
 # --- NEW: SessionRetryView ---
 class SessionRetryView(APIView):
     """
     API endpoint to retry processing for a specific session.
+    Processing resumes at the first stage whose output isn't stored (e.g. only the LLM analysis
+    after an LLM outage). POST {"reanalyze": true} re-runs only the analysis on the stored
+    transcript, bypassing the LLM cache; completed sessions can be re-analyzed too.
     Requires authentication.
     """
     permission_classes = [IsAuthenticated]
@@ -427,19 +1065,64 @@ class SessionRetryView(APIView):
                 status=status.HTTP_403_FORBIDDEN
             )
 
-        # Only allow retry if session is in a retryable state
-        if session.status not in ['PENDING', 'FAILED', 'TRANSCRIBING']:
-            return Response(
-                {"detail": f"Session status '{session.status}' is not retryable."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        reanalyze = str(request.data.get('reanalyze', '')).lower() in ('1', 'true', 'yes')
+
+        with transaction.atomic():
+            session = Session.objects.select_for_update().get(pk=session.pk)
+
+            if reanalyze:
+                if session.checkpoint not in ('TRANSCRIBED', 'ANALYZED'):
+                    return Response(
+                        {"detail": "Session has no stored transcript to re-analyze."},
+                        status=status.HTTP_400_BAD_REQUEST
+                    )
+            # Only allow retry if session is in a retryable state
+            elif session.status not in ['PENDING', 'FAILED', 'TRANSCRIBING', 'TRANSCRIBED', 'ANALYZING']:
+                return Response(
+                    {"detail": f"Session status '{session.status}' is not retryable."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
 
-        # Reset status to PENDING and re-enqueue the task
-        session.status = 'PENDING'
-        session.save(update_fields=['status'])
-        process_session_task.delay(session.id)
+            # A live lease means a worker is still on it; a second run would repeat the transcription
+            # and race on the results. Lapsed leases are re-queued by the reaper anyway.
+            if session.lease_expires and session.lease_expires > timezone.now():
+                return Response(
+                    {"detail": "Session is already being processed."},
+                    status=status.HTTP_409_CONFLICT
+                )
+
+            # Reset status to PENDING and queue it with the scheduler again
+            session.status = 'PENDING'
+            session.dispatched_timestamp = None
+            session.lease_owner = ''
+            session.lease_expires = None
+            session.processing_attempts = 0
+            if reanalyze:
+                session.checkpoint = 'TRANSCRIBED'
+                session.reanalyze_requested = True
+            session.save(update_fields=[
+                'status', 'dispatched_timestamp', 'lease_owner', 'lease_expires', 'processing_attempts',
+                'checkpoint', 'reanalyze_requested',
+            ])
+        request_dispatch()
 
         return Response(
-            {"detail": "Session processing re-enqueued.", "session_status": session.status},
+            {
+                "detail": "Session queued for re-analysis." if reanalyze else "Session processing re-enqueued.",
+                "session_status": session.status,
+                "checkpoint": session.checkpoint,
+            },
             status=status.HTTP_200_OK
-        )
\ No newline at end of file
+        )
+
+
+# --- Admin: LLM cache counters ---
+class LLMCacheStatsView(APIView):
+    """
+    API endpoint reporting LLM response cache hits and misses.
+    Requires a staff user.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response(cache_stats(), status=status.HTTP_200_OK)
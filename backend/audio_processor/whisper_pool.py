@@ -0,0 +1,129 @@
+# audio_processor/whisper_pool.py
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+# Rough resident size (MB) of each Whisper checkpoint when loaded as int8 on CPU.
+# Used only to decide when to evict, so approximate figures are good enough.
+MODEL_MEMORY_MB = {
+    'tiny': 75,
+    'tiny.en': 75,
+    'base': 145,
+    'base.en': 145,
+    'small': 480,
+    'small.en': 480,
+    'medium': 1500,
+    'medium.en': 1500,
+    'large-v1': 3100,
+    'large-v2': 3100,
+    'large-v3': 3100,
+    'distil-large-v3': 1600,
+}
+DEFAULT_MODEL_MEMORY_MB = 1500
+
+# Multiplier relative to int8 for the other CTranslate2 compute types.
+COMPUTE_TYPE_MEMORY_FACTOR = {
+    'int8': 1,
+    'int8_float16': 1.5,
+    'int8_float32': 1.5,
+    'float16': 2,
+    'float32': 4,
+}
+
+
+def estimate_model_memory_mb(size, compute_type):
+    """
+    Returns an estimate of how much memory a model of this size/compute type will hold.
+    """
+    base_mb = MODEL_MEMORY_MB.get(size, DEFAULT_MODEL_MEMORY_MB)
+    return base_mb * COMPUTE_TYPE_MEMORY_FACTOR.get(compute_type, 1)
+
+
+class WhisperModelPool:
+    """
+    Keeps several faster-whisper models resident in one worker process.
+    Models are keyed by (size, compute_type, cpu_threads), loaded on first use and
+    evicted least-recently-used first once the memory budget would be exceeded.
+    """
+
+    def __init__(self, device='cpu', memory_budget_mb=2048):
+        self.device = device
+        self.memory_budget_mb = memory_budget_mb
+        self._models = OrderedDict() # key -> (model, estimated_mb), oldest first
+        self._lock = threading.Lock()
+
+    @property
+    def resident_memory_mb(self):
+        return sum(mb for _, mb in self._models.values())
+
+    def keys(self):
+        with self._lock:
+            return list(self._models.keys())
+
+    def get(self, size, compute_type, cpu_threads=0):
+        key = (size, compute_type, cpu_threads)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key) # Mark as most recently used
+                return self._models[key][0]
+
+            estimated_mb = estimate_model_memory_mb(size, compute_type)
+            self._evict_for(estimated_mb)
+
+            # Loading happens under the lock so concurrent threads never load the same model twice.
+            model = self._load(size, compute_type, cpu_threads)
+            self._models[key] = (model, estimated_mb)
+            return model
+
+    def evict(self, size, compute_type, cpu_threads=0):
+        with self._lock:
+            return self._models.pop((size, compute_type, cpu_threads), None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def _evict_for(self, needed_mb):
+        # Always keep room for the model being loaded, even if it alone exceeds the budget.
+        while self._models and self.resident_memory_mb + needed_mb > self.memory_budget_mb:
+            evicted_key, _ = self._models.popitem(last=False)
+            print(f"Evicting Whisper model {evicted_key} to stay within {self.memory_budget_mb} MB budget.")
+
+    def _load(self, size, compute_type, cpu_threads):
+        # Imported here so web processes that never transcribe don't pay for ctranslate2.
+        from faster_whisper import WhisperModel
+
+        print(f"Loading Whisper model '{size}' on {self.device} with {compute_type} compute type (cpu_threads={cpu_threads}).")
+        return WhisperModel(size, device=self.device, compute_type=compute_type, cpu_threads=cpu_threads)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_model_pool():
+    """
+    Returns the process-wide model pool, creating it on first use.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = WhisperModelPool(
+                    device=settings.WHISPER_DEVICE,
+                    memory_budget_mb=settings.WHISPER_POOL_MEMORY_BUDGET_MB,
+                )
+    return _pool
+
+
+def get_whisper_model(size=None, compute_type=None, cpu_threads=None):
+    """
+    Returns a loaded Whisper model, falling back to the configured defaults.
+    """
+    return get_model_pool().get(
+        size or settings.WHISPER_MODEL_SIZE,
+        compute_type or settings.WHISPER_COMPUTE_TYPE,
+        settings.WHISPER_CPU_THREADS if cpu_threads is None else cpu_threads,
+    )
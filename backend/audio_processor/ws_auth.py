@@ -0,0 +1,36 @@
+# audio_processor/ws_auth.py
+
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+User = get_user_model()
+
+
+@database_sync_to_async
+def get_user_for_token(raw_token):
+    if not raw_token:
+        return AnonymousUser()
+    try:
+        token = AccessToken(raw_token)
+        return User.objects.get(**{api_settings.USER_ID_FIELD: token[api_settings.USER_ID_CLAIM]})
+    except (TokenError, KeyError, User.DoesNotExist):
+        return AnonymousUser()
+
+
+class JWTAuthMiddleware(BaseMiddleware):
+    """
+    Authenticates WebSocket connections with the same Simple JWT access tokens as the REST API.
+    Browsers can't set headers on WebSocket requests, so the token is read from ?token=.
+    """
+
+    async def __call__(self, scope, receive, send):
+        query = parse_qs(scope.get('query_string', b'').decode())
+        scope['user'] = await get_user_for_token(query.get('token', [None])[0])
+        return await super().__call__(scope, receive, send)
@@ -12,6 +12,10 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 import os
+import sys
+
+from corsheaders.defaults import default_headers
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -31,6 +35,7 @@ ALLOWED_HOSTS = []
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne', # ASGI server for runserver (WebSocket status push); must come before staticfiles
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -39,6 +44,7 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'corsheaders',
     'rest_framework',
+    'channels',
      
     'rest_framework_simplejwt',
     'rest_framework_simplejwt.token_blacklist',
@@ -80,6 +86,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
 
 # Database
@@ -159,6 +166,8 @@ SIMPLE_JWT = {
 
 
 CORS_ALLOW_ALL_ORIGINS = True # Set to False in production!
+CORS_ALLOW_HEADERS = (*default_headers, 'if-none-match', 'upload-offset', 'upload-checksum') # Conditional polling, resumable uploads
+CORS_EXPOSE_HEADERS = ['ETag', 'Retry-After', 'Content-Disposition', 'Upload-Offset', 'Upload-Length', 'Location'] # Headers the frontend reads
 # Media files (user uploads)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
@@ -171,4 +180,157 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'Asia/Kolkata' # Or your desired timezone
-CELERY_TASK_TRACK_STARTED = True # Track task status as 'STARTED'
\ No newline at end of file
+CELERY_TASK_TRACK_STARTED = True # Track task status as 'STARTED'
+# Processing stages run on separate queues so CPU (ffmpeg/Whisper) and LLM workers scale independently:
+#   celery -A config worker -Q transcribe --concurrency=2
+#   celery -A config worker -Q llm,celery --concurrency=8
+#   celery -A config worker -Q live --concurrency=2
+# Live recordings are transcribed in short steps on a queue of their own, so they never wait behind whole files.
+# Stages hand over through the database and MEDIA_ROOT, so workers on other nodes need shared media storage.
+PIPELINE_TRANSCRIBE_QUEUE = 'transcribe'
+PIPELINE_LLM_QUEUE = 'llm'
+PIPELINE_LIVE_QUEUE = 'live'
+CELERY_TASK_ROUTES = {
+    'audio_processor.tasks.extract_audio_task': {'queue': PIPELINE_TRANSCRIBE_QUEUE},
+    'audio_processor.tasks.transcribe_session_task': {'queue': PIPELINE_TRANSCRIBE_QUEUE},
+    'audio_processor.tasks.transcribe_batch_task': {'queue': PIPELINE_TRANSCRIBE_QUEUE},
+    'audio_processor.tasks.analyze_session_task': {'queue': PIPELINE_LLM_QUEUE},
+    'audio_processor.tasks.transcribe_live_window_task': {'queue': PIPELINE_LIVE_QUEUE},
+}
+# Sessions are admitted to the pipeline by the scheduler (audio_processor/scheduler.py); run celery beat
+# for the periodic dispatch pass, which also applies aging to sessions still waiting.
+SCHEDULER_MAX_TRANSCRIBING = 4 # Sessions in the transcribe stage at once; match the transcribe workers' total concurrency
+SCHEDULER_MAX_IN_FLIGHT_PER_USER = 2 # A user's sessions being processed at once; the rest wait their turn
+SCHEDULER_LANE_BOUNDS_SECONDS = [600, 3600] # Priority lanes by duration: up to 10 min, up to 1 h, longer
+SCHEDULER_AGING_SECONDS = 900 # Waiting this long moves a session up one lane
+SCHEDULER_DISPATCH_INTERVAL_SECONDS = 30 # Periodic dispatch pass (catches missed triggers, applies aging)
+SCHEDULER_DISPATCH_LOCK_SECONDS = 60 # Expiry of the dispatcher's database lock, in case the worker holding it dies
+SCHEDULER_CANDIDATE_LIMIT = 2000 # Oldest waiting sessions considered per pass
+BATCH_TRANSCRIBE_ENABLED = False # Start short sessions in groups transcribed in one batched Whisper pass
+BATCH_TRANSCRIBE_MAX_SECONDS = 180 # Sessions up to this long (probed duration) can join a batch
+BATCH_TRANSCRIBE_MAX_SESSIONS = 16 # Sessions per batch; a batch takes one SCHEDULER_MAX_TRANSCRIBING slot
+BATCH_TRANSCRIBE_WINDOW_SECONDS = 5 # Longest a batch that isn't full waits for more short uploads
+BATCH_TRANSCRIBE_SIZE = 8 # 30-second clips decoded per forward pass (BatchedInferencePipeline batch_size)
+BATCH_TRANSCRIBE_LANGUAGE = None # e.g. 'en' to skip per-recording language detection when all uploads share it
+SESSION_LEASE_SECONDS = 120 # Lease of a running stage; lapses this long after its worker stops renewing it
+SESSION_LEASE_HEARTBEAT_SECONDS = 30 # How often a running stage renews its lease
+SESSION_LEASE_QUEUED_SECONDS = 3600 # Lease kept while a session waits in a stage's queue
+SESSION_LEASE_REAP_INTERVAL_SECONDS = 60 # Periodic pass re-queuing sessions with lapsed leases
+SESSION_PROCESSING_MAX_ATTEMPTS = 3 # Runs started before a session with lapsed leases is marked FAILED
+CELERY_BEAT_SCHEDULE = {
+    'dispatch-pending-sessions': {
+        'task': 'audio_processor.tasks.dispatch_sessions_task',
+        'schedule': SCHEDULER_DISPATCH_INTERVAL_SECONDS,
+    },
+    'reap-expired-session-leases': {
+        'task': 'audio_processor.tasks.reap_expired_leases_task',
+        'schedule': SESSION_LEASE_REAP_INTERVAL_SECONDS,
+    },
+}
+# Whisper transcription (models are loaded lazily inside Celery workers only)
+WHISPER_MODEL_SIZE = 'base'
+WHISPER_DEVICE = 'cpu'
+WHISPER_COMPUTE_TYPE = 'int8'
+WHISPER_CPU_THREADS = 0 # 0 lets CTranslate2 pick the thread count
+WHISPER_POOL_MEMORY_BUDGET_MB = 2048 # Least recently used models are evicted past this
+WHISPER_PRELOAD_ON_WORKER_INIT = True # Load the default model when a worker process starts
+TRANSCRIBE_WINDOW_SECONDS = 600 # Decoded audio is transcribed in windows of about this length, cut at quiet points
+TRANSCRIBE_PARALLEL_WORKERS = 0 # >1 transcribes chunks of long recordings concurrently in a process pool
+TRANSCRIBE_PARALLEL_CHUNK_SECONDS = 300 # Chunk length in parallel mode, cut at quiet points
+TRANSCRIBE_CHUNK_OVERLAP_SECONDS = 2 # Audio repeated between chunks; duplicate words are removed when stitching
+TRANSCRIPT_SEGMENT_BATCH_SIZE = 20 # Segments are written to the database in batches of this size
+TRANSCRIPT_SEGMENTS_PAGE_SIZE = 500 # Max segments returned per partial-transcript request
+SESSION_STATUS_BATCH_MAX_IDS = 100 # Max session ids per batch status request
+SESSION_LIST_PAGE_SIZE = 50 # Sessions per page in the history list (cursor paginated)
+SESSION_LIST_MAX_PAGE_SIZE = 200 # Upper bound for ?page_size= on the history list
+SESSION_STATS_COUNTERS_ENABLED = True # Keep per-user stats counters on status transitions (False: aggregate on every request)
+PDF_EXPORT_DIR = 'exports/pdf' # Rendered notes PDFs, stored under MEDIA_ROOT by content hash
+PDF_RENDER_LOCK_SECONDS = 300 # One background render per content hash within this window
+PDF_RETRY_AFTER_SECONDS = 2 # Retry-After sent with 202 while a PDF is being rendered
+TRANSCRIPT_EXPORT_LENGTH_CACHE_SECONDS = 3600 # How long export byte lengths (for range requests) are cached
+RESUMABLE_UPLOAD_MAX_BYTES = 5 * 1024 ** 3 # Largest file accepted through resumable uploads (5 GB)
+RESUMABLE_UPLOAD_MAX_CHUNK_BYTES = 64 * 1024 ** 2 # Largest single PATCH chunk (64 MB)
+RESUMABLE_UPLOAD_LOCK_SECONDS = 600 # Expiry of the per-upload writer lock, in case a worker dies mid-chunk
+MEDIA_PROBE_TIMEOUT_SECONDS = 30 # Limit for ffprobe / the test decode when validating an upload
+MEDIA_PROBE_TEST_DECODE_SECONDS = 1 # Seconds of audio decoded at upload to reject corrupt files early
+INGEST_AUDIO_ONLY = False # Replace uploaded videos with a compressed mono audio track before transcription
+INGEST_AUDIO_BITRATE = '32k' # Opus bitrate for the audio-only track (speech quality)
+
+# Live transcription (LIVE sessions streamed over ws/sessions/<id>/live/)
+LIVE_STEP_SECONDS = 2 # New audio needed before the window is transcribed again
+LIVE_WINDOW_SECONDS = 30 # Uncommitted audio after which text is committed at the quietest point, pause or not
+LIVE_MIN_SILENCE_SECONDS = 0.5 # Shortest pause (VAD) where text before it is committed
+LIVE_COMMIT_MARGIN_SECONDS = 1.0 # Pauses this close to the end of the audio may still be mid-word
+LIVE_BEAM_SIZE = 1 # Greedy decoding keeps each step short; the file is not re-transcribed afterwards
+LIVE_TRANSCRIBE_THREADS = 2 # Live steps awaited at once per ASGI process; match the live workers' total concurrency
+LIVE_STEP_TIMEOUT_SECONDS = 30 # Longest wait for a live step; after that the pipeline transcribes the recording instead
+LIVE_MAX_SECONDS = 4 * 3600 # Longest live recording; the socket is finalized after this
+LIVE_MAX_BYTES = 1024 ** 3 # Largest live recording file (1 GB)
+
+# Ollama (shared by the processing tasks and the Q&A endpoints)
+OLLAMA_BASE_URL = 'http://localhost:11434'
+OLLAMA_MODEL_NAME = 'deepseek-r1:1.5b'
+OLLAMA_CONNECT_TIMEOUT = 5 # seconds
+OLLAMA_READ_TIMEOUT = 300 # seconds between bytes; CPU models can take minutes on long prompts
+OLLAMA_MAX_RETRIES = 3 # Retries on 5xx and connection errors, with jittered exponential backoff
+OLLAMA_RETRY_BACKOFF = 1.0 # seconds
+OLLAMA_MAX_CONCURRENT_REQUESTS = 2 # In-flight generations per process
+OLLAMA_POOL_SIZE = 10 # Keep-alive connections kept open to Ollama
+
+# LLM analysis
+ANALYSIS_CHUNK_TOKENS = 3000 # Longer transcripts are analysed in chunks of this size and then merged
+ANALYSIS_REDUCE_TOKENS = 3000 # Max partial-analysis tokens combined in one merge prompt
+ANALYSIS_MAX_CONCURRENCY = 2 # Chunk prompts sent to Ollama at the same time per task
+
+# Q&A retrieval (BM25 over transcript chunks)
+RETRIEVAL_CHUNK_TOKENS = 150 # Size of the transcript chunks that get indexed
+RETRIEVAL_TOP_K = 8 # Best-matching chunks considered per question
+RETRIEVAL_CONTEXT_TOKENS = 1500 # Transcript budget in a Q&A prompt; shorter transcripts are sent whole
+
+# LLM response cache (analysis prompts and Q&A answers)
+LLM_CACHE_ENABLED = True
+LLM_CACHE_ALIAS = 'llm'
+LLM_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60 # Every entry expires, so Redis can evict them under volatile-lru
+LLM_CACHE_REDIS_URL = 'redis://localhost:6379/1' # Shared by web and worker processes (broker is db 0, channels db 2)
+LLM_CACHE_MAX_ENTRIES = 5000 # Only for the in-process cache used by tests
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+}
+# Web and worker processes share one LLM cache, so an analysis cached by a worker answers the
+# same prompt anywhere. Bound it with the Redis instance's maxmemory: maxmemory-policy allkeys-lru
+# on a Redis of its own, volatile-lru when it shares the broker's instance (the Celery queues have
+# no TTL, so they are never evicted). Tests use a per-process cache.
+if 'test' in sys.argv:
+    CACHES['llm'] = {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'llm-responses',
+        'TIMEOUT': LLM_CACHE_TTL_SECONDS,
+        'OPTIONS': {
+            'MAX_ENTRIES': LLM_CACHE_MAX_ENTRIES,
+            'CULL_FREQUENCY': 10, # Drop 1/10 of the entries (oldest first) when full
+        },
+    }
+else:
+    CACHES['llm'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': LLM_CACHE_REDIS_URL,
+        'TIMEOUT': LLM_CACHE_TTL_SECONDS,
+    }
+
+# Channel layer for pushing session status changes from Celery workers to WebSocket clients.
+# Redis lets workers and ASGI processes talk to each other; the in-memory layer only works inside
+# one process, which is enough for tests (or set CHANNEL_LAYER=memory).
+if 'test' in sys.argv or os.environ.get('CHANNEL_LAYER') == 'memory':
+    CHANNEL_LAYERS = {
+        'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'},
+    }
+else:
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': ['redis://localhost:6379/2']},
+        },
+    }
@@ -1,12 +1,12 @@
 // src/AppContext.jsx
 
-import React, { createContext, useState, useCallback, useEffect } from 'react';
+import React, { createContext, useState, useCallback, useEffect, useRef } from 'react';
 import { AuthContext } from './auth/AuthContext.jsx'; // Correctly imported AuthContext
-import { getAllSessions, getSessionStatus } from './api/audio_processing.js'; // Import API functions
+import { getAllSessions, getSessionStatuses, openSessionStatusSocket } from './api/audio_processing.js'; // Import API functions
 
 export const AppContext = createContext(null);
 
-const POLLING_INTERVAL = 3000; // Define polling interval globally
+const POLLING_INTERVAL = 3000; // Fallback polling interval, used only while the status socket is down
 
 // AppProvider now receives auth-related values as props
 export const AppProvider = ({ children, accessToken, isAuthenticated, loadingAuth, showMessage }) => {
@@ -48,79 +48,147 @@ export const AppProvider = ({ children, accessToken, isAuthenticated, loadingAut
     }, []);
 
 
-    // --- Centralized Polling Effect ---
+    // Latest sessions for the socket handler and the fallback poller, without re-subscribing on every change
+    const activeSessionsRef = useRef(activeSessions);
     useEffect(() => {
-        let pollingIntervalId;
+        activeSessionsRef.current = activeSessions;
+    }, [activeSessions]);
+
+    const [isStatusSocketConnected, setIsStatusSocketConnected] = useState(false);
+
+    // Applies a status update and tells the user when a session finishes
+    const applySessionStatus = useCallback((data) => {
+        const previous = activeSessionsRef.current.find(s => s.id === data.id);
+        updateActiveSessions(data);
+        const finished = data.status === 'COMPLETED' || data.status === 'FAILED';
+        if (finished && (!previous || previous.status !== data.status)) {
+            showMessage(`Session "${data.title || data.original_file_name}" ${data.status.toLowerCase()}!`, data.status === 'COMPLETED' ? 'success' : 'error');
+        }
+    }, [updateActiveSessions, showMessage]);
 
-        const startPolling = async () => {
-            if (!accessToken || !isAuthenticated || loadingAuth) {
-                // Don't poll if not authenticated or still loading auth
-                return;
-            }
+    // --- Initial Session Fetch ---
+    useEffect(() => {
+        if (!accessToken || !isAuthenticated || loadingAuth) {
+            return;
+        }
 
-            // Fetch all sessions initially to populate the global state
+        const fetchSessions = async () => {
             try {
                 const response = await getAllSessions(accessToken);
                 if (response.ok) {
+                    // First page only; older sessions are loaded on demand by the history page
                     const data = await response.json();
-                    data.forEach(session => updateActiveSessions(session));
+                    data.results.forEach(session => updateActiveSessions(session));
                 } else {
-                    console.error('Failed to initially fetch all sessions for polling:', await response.text());
+                    console.error('Failed to initially fetch all sessions:', await response.text());
                 }
             } catch (error) {
-                console.error('Network error during initial session fetch for polling:', error);
+                console.error('Network error during initial session fetch:', error);
             }
+        };
+        fetchSessions();
+    }, [accessToken, isAuthenticated, loadingAuth, updateActiveSessions]);
+
+    // --- Status Push over WebSocket ---
+    // The server pushes every status transition; on (re)connect it also sends the current
+    // status of all in-progress sessions, so nothing is missed while disconnected.
+    useEffect(() => {
+        if (!accessToken || !isAuthenticated || loadingAuth) {
+            return;
+        }
 
-            // Set up interval for ongoing polling of processing sessions
-            pollingIntervalId = setInterval(async () => {
-                // Filter for sessions that are currently in a processing state
-                const sessionsToPoll = activeSessions.filter(s =>
-                    s.status === 'PENDING' || s.status === 'TRANSCRIBING' || s.status === 'ANALYZING'
-                );
-
-                for (const session of sessionsToPoll) {
-                    try {
-                        const response = await getSessionStatus(session.id, accessToken);
-                        if (response.ok) {
-                            const data = await response.json();
-                            updateActiveSessions(data); // Update global state with new status
-                            if (data.status === 'COMPLETED' || data.status === 'FAILED') {
-                                showMessage(`Session "${data.title || data.original_file_name}" ${data.status.toLowerCase()}!`, data.status === 'COMPLETED' ? 'success' : 'error');
-                            }
-                        } else {
-                            console.error(`Failed to get status for session ${session.id}:`, await response.text());
-                            // If status check fails, assume it might be stuck or failed
-                            updateActiveSessions({ id: session.id, status: 'FAILED' }); // Mark as failed
-                            showMessage(`Failed to get status for session "${session.title || session.original_file_name}". Marking as FAILED.`, 'error');
-                        }
-                    } catch (error) {
-                        console.error(`Network error during polling for session ${session.id}:`, error);
-                        updateActiveSessions({ id: session.id, status: 'FAILED' }); // Mark as failed
-                        showMessage(`Network error during polling for session "${session.title || session.original_file_name}". Marking as FAILED.`, 'error');
-                    }
+        let socket;
+        let reconnectTimeoutId;
+        let reconnectDelay = 1000;
+        let closedByUs = false;
+
+        const connect = () => {
+            socket = openSessionStatusSocket(accessToken);
+
+            socket.onopen = () => {
+                reconnectDelay = 1000;
+                setIsStatusSocketConnected(true);
+            };
+
+            socket.onmessage = (event) => {
+                const data = JSON.parse(event.data);
+                if (data.id) {
+                    applySessionStatus(data);
+                }
+            };
+
+            socket.onclose = () => {
+                setIsStatusSocketConnected(false);
+                if (!closedByUs) {
+                    // Back off up to 30s; polling covers the gap meanwhile
+                    reconnectTimeoutId = setTimeout(connect, reconnectDelay);
+                    reconnectDelay = Math.min(reconnectDelay * 2, 30000);
                 }
-            }, POLLING_INTERVAL);
+            };
         };
+        connect();
 
-        // Start polling when authenticated and not loading
-        if (isAuthenticated && !loadingAuth) {
-            startPolling();
+        return () => {
+            closedByUs = true;
+            clearTimeout(reconnectTimeoutId);
+            socket?.close();
+        };
+    }, [accessToken, isAuthenticated, loadingAuth, applySessionStatus]);
+
+    // --- Fallback Polling (only while the status socket is down) ---
+    useEffect(() => {
+        if (!accessToken || !isAuthenticated || loadingAuth || isStatusSocketConnected) {
+            return;
         }
 
-        // Cleanup: Clear interval when component unmounts or auth state changes
-        return () => {
-            if (pollingIntervalId) {
-                clearInterval(pollingIntervalId);
+        let etag = null;
+        let polledIds = '';
+
+        const pollingIntervalId = setInterval(async () => {
+            // Filter for sessions that are currently in a processing state
+            const sessionsToPoll = activeSessionsRef.current.filter(s =>
+                s.status === 'PENDING' || s.status === 'TRANSCRIBING' || s.status === 'TRANSCRIBED' || s.status === 'ANALYZING'
+            );
+            if (sessionsToPoll.length === 0) {
+                return;
             }
-        };
-    }, [accessToken, isAuthenticated, loadingAuth, updateActiveSessions, showMessage, activeSessions]); // activeSessions is a dependency to ensure polling loop has latest list
+
+            const ids = sessionsToPoll.map(s => s.id);
+            if (ids.join(',') !== polledIds) {
+                etag = null; // The ETag only applies to the same set of ids
+                polledIds = ids.join(',');
+            }
+
+            try {
+                // One request for all processing sessions; 304 means nothing changed
+                const response = await getSessionStatuses(ids, etag, accessToken);
+                if (response.status === 304) {
+                    return;
+                }
+                if (response.ok) {
+                    etag = response.headers.get('ETag');
+                    const data = await response.json();
+                    data.sessions.forEach(session => applySessionStatus(session));
+                    data.missing.forEach(sessionId => removeActiveSession(sessionId));
+                } else {
+                    console.error('Failed to get session statuses:', await response.text());
+                }
+            } catch (error) {
+                // Network errors are transient here; the next poll or the socket will catch up
+                console.error('Network error during status polling:', error);
+            }
+        }, POLLING_INTERVAL);
+
+        return () => clearInterval(pollingIntervalId);
+    }, [accessToken, isAuthenticated, loadingAuth, isStatusSocketConnected, applySessionStatus, removeActiveSession]);
 
     const contextValue = {
         currentPage,
         navigate,
         activeSessions,
         updateActiveSessions,
-        removeActiveSession
+        removeActiveSession,
+        isStatusSocketConnected
     };
 
     return (
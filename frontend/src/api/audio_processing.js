@@ -1,6 +1,7 @@
 // src/api/audio_processing.js
 
 const API_BASE_URL = 'http://127.0.0.1:8000/api/'; // Base URL for your Django backend API
+const WS_BASE_URL = 'ws://127.0.0.1:8000/ws/'; // Base URL for WebSocket endpoints (status push, live transcription)
 
 export const uploadSessionFile = async (file, mode, title, accessToken) => {
     const formData = new FormData();
@@ -18,6 +19,92 @@ export const uploadSessionFile = async (file, mode, title, accessToken) => {
     return response;
 };
 
+const UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024; // Bytes per PATCH request for resumable uploads
+const UPLOAD_MAX_RETRIES = 5; // Consecutive failed chunk attempts before giving up
+
+const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+// Uploads a file in chunks through the resumable upload API and returns the finalize response
+// (the new session, like uploadSessionFile). Dropped chunks are retried from the server's offset,
+// and an upload interrupted by a page reload resumes where it stopped when the same file is chosen again.
+export const uploadSessionFileResumable = async (file, mode, title, accessToken, onProgress = () => {}) => {
+    const authHeader = { 'Authorization': `Bearer ${accessToken}` };
+    const resumeKey = `resumable-upload:${file.name}:${file.size}:${file.lastModified}`;
+
+    const getUploadOffset = async (uploadUrl) => {
+        const response = await fetch(uploadUrl, { method: 'GET', headers: authHeader });
+        if (!response.ok) {
+            return null;
+        }
+        const data = await response.json();
+        return data.session_id ? null : data.upload_offset;
+    };
+
+    let uploadUrl = localStorage.getItem(resumeKey);
+    let offset = uploadUrl ? await getUploadOffset(uploadUrl) : null;
+    if (offset === null) {
+        const response = await fetch(`${API_BASE_URL}uploads/`, {
+            method: 'POST',
+            headers: { ...authHeader, 'Content-Type': 'application/json' },
+            body: JSON.stringify({
+                file_name: file.name,
+                file_size: file.size,
+                content_type: file.type,
+                processing_mode: mode,
+                title: title,
+            }),
+        });
+        if (!response.ok) {
+            return response;
+        }
+        const data = await response.json();
+        uploadUrl = `${API_BASE_URL}uploads/${data.id}/`;
+        offset = data.upload_offset;
+        localStorage.setItem(resumeKey, uploadUrl);
+    }
+
+    let failures = 0;
+    while (offset < file.size) {
+        onProgress(offset / file.size);
+        try {
+            const response = await fetch(uploadUrl, {
+                method: 'PATCH',
+                headers: {
+                    ...authHeader,
+                    'Content-Type': 'application/offset+octet-stream',
+                    'Upload-Offset': String(offset),
+                },
+                body: file.slice(offset, offset + UPLOAD_CHUNK_SIZE),
+            });
+            if (response.status === 204) {
+                offset = Number(response.headers.get('Upload-Offset'));
+                failures = 0;
+                continue;
+            }
+            // 409 means our offset is out of date (or another chunk is in flight); anything else is fatal
+            if (response.status !== 409 || ++failures > UPLOAD_MAX_RETRIES) {
+                return response;
+            }
+        } catch (error) {
+            if (++failures > UPLOAD_MAX_RETRIES) {
+                throw error;
+            }
+        }
+        await sleep(1000 * 2 ** (failures - 1));
+        const serverOffset = await getUploadOffset(uploadUrl).catch(() => null);
+        if (serverOffset !== null) {
+            offset = serverOffset;
+        }
+    }
+    onProgress(1);
+
+    const response = await fetch(`${uploadUrl}finalize/`, { method: 'POST', headers: authHeader });
+    if (response.ok) {
+        localStorage.removeItem(resumeKey);
+    }
+    return response;
+};
+
 export const getSessionStatus = async (sessionId, accessToken) => {
     const response = await fetch(`${API_BASE_URL}sessions/${sessionId}/status/`, {
         method: 'GET',
@@ -29,6 +116,23 @@ export const getSessionStatus = async (sessionId, accessToken) => {
     return response;
 };
 
+// Status of many sessions in one request. Pass the ETag from the previous response to get a
+// 304 (no body) when nothing changed.
+export const getSessionStatuses = async (sessionIds, etag, accessToken) => {
+    const headers = {
+        'Authorization': `Bearer ${accessToken}`,
+        'Content-Type': 'application/json',
+    };
+    if (etag) {
+        headers['If-None-Match'] = etag;
+    }
+    const response = await fetch(`${API_BASE_URL}sessions/status/?ids=${sessionIds.join(',')}`, {
+        method: 'GET',
+        headers,
+    });
+    return response;
+};
+
 export const getSessionResults = async (sessionId, accessToken) => {
     const response = await fetch(`${API_BASE_URL}sessions/${sessionId}/results/`, {
         method: 'GET',
@@ -40,8 +144,26 @@ export const getSessionResults = async (sessionId, accessToken) => {
     return response;
 };
 
-export const downloadNotesPdf = async (sessionId, accessToken) => {
-    const response = await fetch(`${API_BASE_URL}sessions/${sessionId}/pdf/`, {
+// The server answers 202 while the PDF is rendered in the background; wait and retry until it's ready.
+export const downloadNotesPdf = async (sessionId, accessToken, maxAttempts = 30) => {
+    for (let attempt = 1; ; attempt++) {
+        const response = await fetch(`${API_BASE_URL}sessions/${sessionId}/pdf/`, {
+            method: 'GET',
+            headers: {
+                'Authorization': `Bearer ${accessToken}`,
+            },
+        });
+        if (response.status !== 202 || attempt >= maxAttempts) {
+            return response;
+        }
+        const retryAfterSeconds = Number(response.headers.get('Retry-After')) || 2;
+        await new Promise(resolve => setTimeout(resolve, retryAfterSeconds * 1000));
+    }
+};
+
+// Timestamped transcript export: format is 'srt', 'vtt' or 'jsonl'.
+export const downloadTranscriptExport = async (sessionId, format, accessToken) => {
+    const response = await fetch(`${API_BASE_URL}sessions/${sessionId}/transcript/export/${format}/`, {
         method: 'GET',
         headers: {
             'Authorization': `Bearer ${accessToken}`,
@@ -73,8 +195,10 @@ export const askLlMAboutSession = async (sessionId, question, context = '', acce
     return response;
 };
 
-export const getAllSessions = async (accessToken) => {
-    const response = await fetch(`${API_BASE_URL}sessions/`, {
+// Returns one page of sessions ({ next, previous, results }), newest first.
+// Pass the "next" URL from a previous page to load older sessions.
+export const getAllSessions = async (accessToken, pageUrl = null) => {
+    const response = await fetch(pageUrl || `${API_BASE_URL}sessions/`, {
         method: 'GET',
         headers: {
             'Authorization': `Bearer ${accessToken}`,
@@ -96,13 +220,42 @@ export const getSessionStats = async (accessToken) => {
 };
 
 
-export const retrySession = async (sessionId, accessToken) => {
+// Retries resume at the first unfinished stage; { reanalyze: true } re-runs only the LLM analysis.
+export const retrySession = async (sessionId, accessToken, { reanalyze = false } = {}) => {
     const response = await fetch(`${API_BASE_URL}sessions/${sessionId}/retry/`, {
         method: 'POST',
         headers: {
             'Authorization': `Bearer ${accessToken}`,
             'Content-Type': 'application/json',
         },
+        body: JSON.stringify({ reanalyze }),
     });
     return response;
-};
\ No newline at end of file
+};
+
+// Opens the WebSocket that pushes status changes for all of the user's sessions.
+// Browsers can't send an Authorization header on WebSockets, so the token goes in the query string.
+export const openSessionStatusSocket = (accessToken) => {
+    return new WebSocket(`${WS_BASE_URL}sessions/status/?token=${encodeURIComponent(accessToken)}`);
+};
+
+// Creates a LIVE session; stream the recording to the returned websocket_path with openLiveTranscriptionSocket.
+export const createLiveSession = async (title, mode, container, accessToken) => {
+    const response = await fetch(`${API_BASE_URL}sessions/live/`, {
+        method: 'POST',
+        headers: {
+            'Authorization': `Bearer ${accessToken}`,
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({ title, processing_mode: mode, container }),
+    });
+    return response;
+};
+
+// Opens the WebSocket a live recording is streamed to; it answers with partial and committed transcript text.
+export const openLiveTranscriptionSocket = (websocketPath, accessToken) => {
+    const separator = websocketPath.includes('?') ? '&' : '?';
+    const socket = new WebSocket(`${WS_BASE_URL}${websocketPath}${separator}token=${encodeURIComponent(accessToken)}`);
+    socket.binaryType = 'arraybuffer';
+    return socket;
+};
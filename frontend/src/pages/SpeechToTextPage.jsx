@@ -4,7 +4,7 @@ import React, { useState, useContext, useEffect, useCallback, useRef, useMemo }
 import { AuthContext } from '../auth/AuthContext.jsx';
 import { AppContext } from '../AppContext.jsx';
 import { LoadingSpinner } from '../components/LoadingSpinner.jsx';
-import { uploadSessionFile, getSessionStatus, getSessionResults, downloadNotesPdf, searchSession, askLlMAboutSession } from '../api/audio_processing.js';
+import { uploadSessionFileResumable, createLiveSession, openLiveTranscriptionSocket, getSessionResults, downloadNotesPdf, downloadTranscriptExport, searchSession, askLlMAboutSession } from '../api/audio_processing.js';
 
 export const SpeechToTextPage = ({ initialSessionId }) => {
     const { accessToken, showMessage, user } = useContext(AuthContext);
@@ -14,6 +14,7 @@ export const SpeechToTextPage = ({ initialSessionId }) => {
     const [sessionTitle, setSessionTitle] = useState('');
     const [processingMode, setProcessingMode] = useState('LECTURE');
     const [isUploading, setIsUploading] = useState(false);
+    const [uploadProgress, setUploadProgress] = useState(0);
     const [selectedSessionForView, setSelectedSessionForView] = useState(null);
     const [analysisResult, setAnalysisResult] = useState(null);
     const [isLoadingResults, setIsLoadingResults] = useState(false);
@@ -26,6 +27,9 @@ export const SpeechToTextPage = ({ initialSessionId }) => {
     const displayStreamRef = useRef(null);
     const audioContextRef = useRef(null);
     const [recordedBlob, setRecordedBlob] = useState(null);
+    // Live transcription: the recording is streamed to the server and transcribed while it runs
+    const [liveTranscript, setLiveTranscript] = useState('');
+    const [livePartial, setLivePartial] = useState('');
 
     // Search state
     const [searchQuery, setSearchQuery] = useState('');
@@ -40,8 +44,7 @@ export const SpeechToTextPage = ({ initialSessionId }) => {
 
     // State for PDF download loading
     const [isDownloadingPdf, setIsDownloadingPdf] = useState(false);
-
-    const POLLING_INTERVAL = 3000;
+    const [downloadingTranscriptFormat, setDownloadingTranscriptFormat] = useState(null);
 
     const fetchAndDisplayResults = useCallback(async (sessionId) => {
         setIsLoadingResults(true);
@@ -73,47 +76,24 @@ export const SpeechToTextPage = ({ initialSessionId }) => {
         }
     }, [initialSessionId, accessToken, fetchAndDisplayResults]);
 
-    useEffect(() => {
-        const intervals = {};
-
-        const sessionsToPoll = activeSessions.filter(session =>
-            session.status !== 'COMPLETED' && session.status !== 'FAILED'
-        );
+    // Status updates arrive through AppContext (WebSocket push, polling fallback);
+    // load the results once the session being viewed finishes.
+    const selectedSessionStatus = selectedSessionForView
+        ? activeSessions.find(s => s.id === selectedSessionForView.id)?.status
+        : undefined;
 
-        sessionsToPoll.forEach(session => {
-            intervals[session.id] = setInterval(async () => {
-                try {
-                    const response = await getSessionStatus(session.id, accessToken);
-                    if (response.ok) {
-                        const data = await response.json();
-                        updateActiveSessions(data);
-
-                        if (data.status === 'COMPLETED' || data.status === 'FAILED') {
-                            clearInterval(intervals[session.id]);
-                            showMessage(`Session "${data.title || data.original_file_name}" ${data.status.toLowerCase()}!`, data.status === 'COMPLETED' ? 'success' : 'error');
-                            if (selectedSessionForView && selectedSessionForView.id === data.id && data.status === 'COMPLETED') {
-                                fetchAndDisplayResults(data.id);
-                            }
-                        }
-                    } else {
-                        console.error(`Failed to get status for session ${session.id}:`, await response.text());
-                        clearInterval(intervals[session.id]);
-                        updateActiveSessions({ id: session.id, status: 'FAILED' });
-                        showMessage(`Failed to get status for session "${session.title || session.original_file_name}". Marking as FAILED.`, 'error');
-                    }
-                } catch (error) {
-                    console.error(`Network error getting status for session ${session.id}:`, error);
-                    clearInterval(intervals[session.id]);
-                    updateActiveSessions({ id: session.id, status: 'FAILED' });
-                    showMessage(`Network error for session "${session.title || session.original_file_name}". Marking as FAILED.`, 'error');
-                }
-            }, POLLING_INTERVAL);
-        });
+    const resultsFetchedForRef = useRef(null);
 
-        return () => {
-            Object.values(intervals).forEach(clearInterval);
-        };
-    }, [activeSessions, accessToken, showMessage, selectedSessionForView, fetchAndDisplayResults, initialSessionId, updateActiveSessions]);
+    useEffect(() => {
+        if (selectedSessionStatus !== 'COMPLETED' || !selectedSessionForView || analysisResult) {
+            return;
+        }
+        if (resultsFetchedForRef.current === selectedSessionForView.id) {
+            return; // Already fetched once for this session; don't loop if it has no analysis
+        }
+        resultsFetchedForRef.current = selectedSessionForView.id;
+        fetchAndDisplayResults(selectedSessionForView.id);
+    }, [selectedSessionStatus, selectedSessionForView, analysisResult, fetchAndDisplayResults]);
 
 
     const handleFileChange = (event) => {
@@ -154,7 +134,9 @@ export const SpeechToTextPage = ({ initialSessionId }) => {
 
         setIsUploading(true);
         try {
-            const response = await uploadSessionFile(fileToUpload, processingMode, sessionTitle || fileToUpload.name, accessToken);
+            setUploadProgress(0);
+            // Chunked, resumable upload: large videos survive dropped connections
+            const response = await uploadSessionFileResumable(fileToUpload, processingMode, sessionTitle || fileToUpload.name, accessToken, setUploadProgress);
             const data = await response.json();
 
             if (response.ok) {
@@ -183,6 +165,60 @@ export const SpeechToTextPage = ({ initialSessionId }) => {
         }
     };
 
+    // Creates a LIVE session and connects its transcription socket. Returns null when that isn't
+    // possible; the recording is then kept in the browser and uploaded afterwards as before.
+    const startLiveTranscription = async () => {
+        try {
+            const response = await createLiveSession(sessionTitle, processingMode, 'webm', accessToken);
+            if (!response.ok) {
+                return null;
+            }
+            const session = await response.json();
+            const socket = openLiveTranscriptionSocket(session.websocket_path, accessToken);
+            await new Promise((resolve, reject) => {
+                socket.onopen = resolve;
+                socket.onerror = reject;
+                socket.onclose = reject;
+            });
+
+            let finalized = false;
+            socket.onmessage = (event) => {
+                const message = JSON.parse(event.data);
+                if (message.type === 'committed') {
+                    setLiveTranscript(previous => [previous, ...message.segments.map(segment => segment.text)].join(' ').trim());
+                } else if (message.type === 'partial') {
+                    setLivePartial(message.text);
+                } else if (message.type === 'finalized') {
+                    finalized = true;
+                    setLivePartial('');
+                    updateActiveSessions({
+                        ...message.session,
+                        title: message.session.title || message.session.original_file_name,
+                    });
+                    showMessage('Transcript complete. Analysis started.', 'success');
+                }
+            };
+            socket.onerror = null;
+            socket.onclose = () => {
+                if (!finalized) {
+                    // The server processes what it received; the full recording stays available for upload
+                    showMessage('Live transcription disconnected. The part recorded so far is being processed.', 'error');
+                }
+            };
+            updateActiveSessions({
+                id: session.id,
+                title: session.title || session.original_file_name,
+                original_file_name: session.original_file_name,
+                status: session.status,
+                upload_timestamp: session.upload_timestamp,
+            });
+            return socket;
+        } catch (error) {
+            console.error('Live transcription unavailable, recording for upload instead:', error);
+            return null;
+        }
+    };
+
     const handleStartLiveRecording = async () => {
         try {
             showMessage('Please select a "Browser Tab" and check "Share tab audio" in the next prompt for best results.', 'info', 10000);
@@ -208,23 +244,36 @@ export const SpeechToTextPage = ({ initialSessionId }) => {
             const recorder = new MediaRecorder(destination.stream, { mimeType: 'audio/webm' });
             mediaRecorderRef.current = recorder;
             audioChunksRef.current = [];
+            setLiveTranscript('');
+            setLivePartial('');
+            const liveSocket = await startLiveTranscription();
 
             recorder.ondataavailable = (event) => {
                 if (event.data.size > 0) {
                     audioChunksRef.current.push(event.data);
+                    if (liveSocket && liveSocket.readyState === WebSocket.OPEN) {
+                        liveSocket.send(event.data);
+                    }
                 }
             };
 
             recorder.onstop = () => {
-                const blob = new Blob(audioChunksRef.current, { type: 'audio/webm' });
-                setRecordedBlob(blob);
-                showMessage('Live recording stopped. Ready for upload!', 'success');
                 micStreamRef.current?.getTracks().forEach(track => track.stop());
                 displayStreamRef.current?.getTracks().forEach(track => track.stop());
                 audioContextRef.current?.close();
+                if (liveSocket && liveSocket.readyState === WebSocket.OPEN) {
+                    // The server finishes the transcript and queues the analysis; no upload needed
+                    liveSocket.send(JSON.stringify({ type: 'stop' }));
+                    showMessage('Live recording stopped. Finishing the transcript...', 'info');
+                    return;
+                }
+                const blob = new Blob(audioChunksRef.current, { type: 'audio/webm' });
+                setRecordedBlob(blob);
+                showMessage('Live recording stopped. Ready for upload!', 'success');
             };
 
-            recorder.start();
+            // Timeslice: chunks are delivered (and streamed) every second instead of only at the end
+            recorder.start(1000);
             setIsRecordingLive(true);
             setRecordedBlob(null);
             setSelectedFile(null);
@@ -263,6 +312,44 @@ export const SpeechToTextPage = ({ initialSessionId }) => {
         }
     };
 
+    const handleDownloadTranscript = async (format) => {
+        if (!selectedSessionForView) {
+            return;
+        }
+        setDownloadingTranscriptFormat(format);
+        try {
+            const response = await downloadTranscriptExport(selectedSessionForView.id, format, accessToken);
+            if (response.ok) {
+                const contentDisposition = response.headers.get('Content-Disposition');
+                let filename = `transcript.${format}`;
+                if (contentDisposition) {
+                    const match = contentDisposition.match(/filename="([^"]+)"/);
+                    if (match && match[1]) {
+                        filename = match[1];
+                    }
+                }
+
+                const blob = await response.blob();
+                const url = window.URL.createObjectURL(blob);
+                const a = document.createElement('a');
+                a.href = url;
+                a.download = filename;
+                document.body.appendChild(a);
+                a.click();
+                a.remove();
+                window.URL.revokeObjectURL(url);
+            } else {
+                const errorData = await response.json();
+                showMessage(`Failed to download transcript: ${errorData.detail || response.statusText}`, 'error');
+            }
+        } catch (error) {
+            console.error('Network error downloading transcript:', error);
+            showMessage('Network error downloading transcript. Please try again.', 'error');
+        } finally {
+            setDownloadingTranscriptFormat(null);
+        }
+    };
+
     const handleDownloadPdf = async () => {
         if (!selectedSessionForView || !analysisResult || !analysisResult.notes_text) {
             showMessage('No notes available to download.', 'error');
@@ -271,7 +358,9 @@ export const SpeechToTextPage = ({ initialSessionId }) => {
         setIsDownloadingPdf(true);
         try {
             const response = await downloadNotesPdf(selectedSessionForView.id, accessToken);
-            if (response.ok) {
+            if (response.status === 202) {
+                showMessage('The PDF is still being generated. Please try again in a moment.', 'info');
+            } else if (response.ok) {
                 const contentDisposition = response.headers.get('Content-Disposition');
                 let filename = 'notes.pdf';
                 if (contentDisposition) {
@@ -450,6 +539,16 @@ export const SpeechToTextPage = ({ initialSessionId }) => {
                             </div>
                         )}
 
+                        {(liveTranscript || livePartial) && (
+                            <div className="mt-4 p-4 border rounded-lg bg-gray-50 max-h-64 overflow-y-auto">
+                                <p className="text-gray-700 font-semibold mb-2">Live Transcript</p>
+                                <p className="text-gray-800 whitespace-pre-wrap">
+                                    {liveTranscript}
+                                    <span className="text-gray-400"> {livePartial}</span>
+                                </p>
+                            </div>
+                        )}
+
                         <div className="mt-6 space-y-4">
                             <div>
                                 <label className="block text-gray-700 text-sm font-bold mb-2" htmlFor="sessionTitle">
@@ -503,7 +602,7 @@ export const SpeechToTextPage = ({ initialSessionId }) => {
                                 className="bg-green-600 hover:bg-green-700 text-white font-bold py-3 px-6 rounded-lg focus:outline-none focus:shadow-outline transition duration-200 ease-in-out w-full flex items-center justify-center"
                                 disabled={(!selectedFile && !recordedBlob) || isUploading || isRecordingLive}
                             >
-                                {isUploading ? <LoadingSpinner /> : 'Process File / Upload Recording'}
+                                {isUploading ? `Uploading... ${Math.round(uploadProgress * 100)}%` : 'Process File / Upload Recording'}
                             </button>
                         </div>
                     </div>
@@ -538,7 +637,10 @@ export const SpeechToTextPage = ({ initialSessionId }) => {
                                                     <LoadingSpinner />
                                                     <span className="ml-2">
                                                         {session.status === 'PENDING' && 'Pending...'}
-                                                        {session.status === 'TRANSCRIBING' && 'Transcribing...'}
+                                                        {session.status === 'TRANSCRIBING' && (session.transcription_progress != null
+                                                            ? `Transcribing... ${Math.round(session.transcription_progress * 100)}%`
+                                                            : 'Transcribing...')}
+                                                        {session.status === 'TRANSCRIBED' && 'Waiting for analysis...'}
                                                         {session.status === 'ANALYZING' && 'Analyzing...'}
                                                         {session.status === 'FAILED' && 'Failed'}
                                                     </span>
@@ -559,7 +661,17 @@ export const SpeechToTextPage = ({ initialSessionId }) => {
                     ) : (
                         analysisResult && (
                             <div className="space-y-6">
-                                <div className="flex justify-end">
+                                <div className="flex justify-end space-x-2">
+                                    {['srt', 'vtt', 'jsonl'].map(format => (
+                                        <button
+                                            key={format}
+                                            onClick={() => handleDownloadTranscript(format)}
+                                            className="bg-gray-500 hover:bg-gray-600 text-white font-bold py-2 px-4 rounded-lg"
+                                            disabled={downloadingTranscriptFormat !== null}
+                                        >
+                                            {downloadingTranscriptFormat === format ? <LoadingSpinner /> : format.toUpperCase()}
+                                        </button>
+                                    ))}
                                     <button
                                         onClick={handleDownloadPdf}
                                         className="bg-red-500 hover:bg-red-600 text-white font-bold py-2 px-4 rounded-lg flex items-center"
@@ -11,7 +11,7 @@ const STALENESS_THRESHOLD_MS = 2 * 60 * 1000; // 5 minutes
 
 // --- Memoized Session Card Component ---
 const SessionCard = memo(({ session, handleViewAnalysis, handleRetrySession, isRetryingApiCallId }) => {
-    const isProcessing = session.status === 'PENDING' || session.status === 'TRANSCRIBING' || session.status === 'ANALYZING';
+    const isProcessing = session.status === 'PENDING' || session.status === 'TRANSCRIBING' || session.status === 'TRANSCRIBED' || session.status === 'ANALYZING';
     const isFailed = session.status === 'FAILED';
     const isCompleted = session.status === 'COMPLETED';
 
@@ -23,6 +23,8 @@ const SessionCard = memo(({ session, handleViewAnalysis, handleRetrySession, isR
     const showRetryButton = isFailed || isStale;
     // Determine if the processing indicator should be visible
     const showProcessingIndicator = isProcessing && !isStale;
+    // A stored transcript can be analysed again without transcribing
+    const canReanalyze = (isCompleted || isFailed) && (session.checkpoint === 'TRANSCRIBED' || session.checkpoint === 'ANALYZED');
 
 
     return (
@@ -50,8 +52,20 @@ const SessionCard = memo(({ session, handleViewAnalysis, handleRetrySession, isR
                 <p className="text-xs text-gray-500">
                     Uploaded: {new Date(session.upload_timestamp).toLocaleDateString()}
                 </p>
+                {session.summary_preview && (
+                    <p className="text-sm text-gray-700 mt-2 line-clamp-3">{session.summary_preview}</p>
+                )}
             </div>
             <div className="mt-4 flex justify-end space-x-2">
+                {canReanalyze && (
+                    <button
+                        onClick={() => handleRetrySession(session.id, { reanalyze: true })}
+                        className="bg-gray-200 hover:bg-gray-300 text-gray-800 text-sm py-2 px-4 rounded-lg"
+                        disabled={isRetryingApiCallId === session.id}
+                    >
+                        Re-analyze
+                    </button>
+                )}
                 {isCompleted ? (
                     <button
                         onClick={() => handleViewAnalysis(session.id)}
@@ -98,6 +112,8 @@ export const VoicesPage = ({ navigate }) => {
 
     const [isLoadingInitialFetch, setIsLoadingInitialFetch] = useState(true);
     const [isRetryingApiCallId, setIsRetryingApiCallId] = useState(null);
+    const [nextPageUrl, setNextPageUrl] = useState(null);
+    const [isLoadingMore, setIsLoadingMore] = useState(false);
 
     const fetchAllSessionsAndUpdateGlobal = React.useCallback(async () => {
         if (!accessToken) {
@@ -110,7 +126,8 @@ export const VoicesPage = ({ navigate }) => {
             const response = await getAllSessions(accessToken);
             if (response.ok) {
                 const data = await response.json();
-                data.forEach(session => updateActiveSessions(session));
+                data.results.forEach(session => updateActiveSessions(session));
+                setNextPageUrl(data.next);
             } else {
                 const errorData = await response.json();
                 showMessage(`Failed to load sessions: ${errorData.detail || 'Unknown error'}`, 'error');
@@ -124,6 +141,30 @@ export const VoicesPage = ({ navigate }) => {
     }, [accessToken, showMessage, updateActiveSessions]);
 
 
+    const handleLoadMore = React.useCallback(async () => {
+        if (!nextPageUrl) {
+            return;
+        }
+        setIsLoadingMore(true);
+        try {
+            const response = await getAllSessions(accessToken, nextPageUrl);
+            if (response.ok) {
+                const data = await response.json();
+                data.results.forEach(session => updateActiveSessions(session));
+                setNextPageUrl(data.next);
+            } else {
+                const errorData = await response.json();
+                showMessage(`Failed to load more sessions: ${errorData.detail || 'Unknown error'}`, 'error');
+            }
+        } catch (error) {
+            console.error('Network error loading more sessions:', error);
+            showMessage('Network error loading more sessions. Please try again.', 'error');
+        } finally {
+            setIsLoadingMore(false);
+        }
+    }, [accessToken, nextPageUrl, showMessage, updateActiveSessions]);
+
+
     useEffect(() => {
         if (accessToken && !loadingAuth) {
             fetchAllSessionsAndUpdateGlobal();
@@ -138,12 +179,12 @@ export const VoicesPage = ({ navigate }) => {
     }, [navigate]);
 
 
-    const handleRetrySession = React.useCallback(async (sessionToRetryId) => {
+    const handleRetrySession = React.useCallback(async (sessionToRetryId, options = {}) => {
         setIsRetryingApiCallId(sessionToRetryId);
         try {
-            const response = await retrySession(sessionToRetryId, accessToken);
+            const response = await retrySession(sessionToRetryId, accessToken, options);
             if (response.ok) {
-                showMessage('Session re-enqueued for processing!', 'success');
+                showMessage(options.reanalyze ? 'Session queued for re-analysis!' : 'Session re-enqueued for processing!', 'success');
                 updateActiveSessions({ id: sessionToRetryId, status: 'PENDING' });
             } else {
                 const errorData = await response.json();
@@ -197,6 +238,18 @@ export const VoicesPage = ({ navigate }) => {
                     ))}
                 </div>
             )}
+
+            {nextPageUrl && (
+                <div className="mt-8 text-center">
+                    <button
+                        onClick={handleLoadMore}
+                        disabled={isLoadingMore}
+                        className="bg-indigo-500 hover:bg-indigo-600 text-white text-sm py-2 px-4 rounded-lg disabled:opacity-50"
+                    >
+                        {isLoadingMore ? 'Loading...' : 'Load older sessions'}
+                    </button>
+                </div>
+            )}
         </div>
     );
 };
\ No newline at end of file